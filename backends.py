@@ -0,0 +1,272 @@
+"""
+Interchangeable engines for the DataProcessor pipeline (normalization, For Profit filter,
+rules-based classification, geocoding and stats), selected by name:
+
+    backend = get_backend('duckdb', memory_limit='2GB', temp_directory='/scratch/duckdb')
+    processed_df, stats = backend.process('cohort.csv')
+    stats = backend.process_to_parquet('cohort.csv', 'processed/cohort.parquet')
+
+Every backend returns a pandas frame and a stats dict (with the data-quality report)
+matching the pandas backend. process_to_parquet writes the processed rows to a file
+instead; on DuckDB they never pass through pandas, so files larger than memory work.
+DuckDB is optional; available_backends() lists what this environment can run.
+"""
+import importlib.util
+import os
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from data_processor import DataProcessor
+from data_quality import get_memo, resolve_counts
+
+# Strings read_csv treats as missing by default; other engines are told to do the same
+PANDAS_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def finish(processed_df: pd.DataFrame, stats: dict, compact: bool) -> Tuple[pd.DataFrame, dict]:
+    """Apply compact mode the way process_csv does, after the stats are computed."""
+    if compact:
+        bytes_before = DataProcessor.memory_usage_bytes(processed_df)
+        processed_df = DataProcessor.compact_frame(processed_df)
+        stats['memory'] = {'before_bytes': bytes_before, 'after_bytes': DataProcessor.memory_usage_bytes(processed_df)}
+    return processed_df, stats
+
+
+class PandasBackend:
+    """The reference implementation: read the whole file, then DataProcessor.process_csv."""
+
+    name = 'pandas'
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def process(self, source, compact: bool = False) -> Tuple[pd.DataFrame, dict]:
+        return DataProcessor.process_csv(DataProcessor.read_input(source), compact=compact)
+
+    def process_to_parquet(self, source, path: str, compact: bool = False) -> dict:
+        """Process a file and write the rows to a zstd Parquet file; returns the stats."""
+        processed_df, stats = self.process(source, compact=compact)
+        processed_df.to_parquet(path, index=False, compression='zstd')
+        return stats
+
+
+class DuckDBBackend:
+    """
+    The pipeline on DuckDB, for files larger than memory. The file is read once into a
+    temporary table, which DuckDB spills to temp_directory once memory_limit is reached.
+    Normalization, the rules and the geocoder only see the distinct values of the columns
+    they need, and their results are joined back onto the rows, kept in file order.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, memory_limit: Optional[str] = None, temp_directory: Optional[str] = None):
+        self.memory_limit = memory_limit
+        self.temp_directory = temp_directory
+
+    @staticmethod
+    def available() -> bool:
+        # Lookup tables go to DuckDB as Arrow tables
+        return all(importlib.util.find_spec(package) is not None for package in ('duckdb', 'pyarrow'))
+
+    @staticmethod
+    def quote(column: str) -> str:
+        return '"' + str(column).replace('"', '""') + '"'
+
+    def connect(self):
+        import duckdb
+        config = {'preserve_insertion_order': True}
+        if self.memory_limit:
+            config['memory_limit'] = self.memory_limit
+        if self.temp_directory:
+            config['temp_directory'] = self.temp_directory
+        return duckdb.connect(config=config)
+
+    def load(self, con, source) -> List[str]:
+        """
+        Read the file into the temporary table raw, whose rowid is the row's position in the
+        file; returns its columns. CSV text columns are read as text, as read_input does with
+        the pipeline's columns, and Parquet is projected onto them.
+        """
+        if not isinstance(source, (str, os.PathLike)):
+            raise ValueError("The duckdb backend reads files by path")
+        source = os.fspath(source)
+        fmt = DataProcessor.detect_format(source)
+        if fmt == 'csv':
+            columns = [column[0] for column in
+                       con.execute("SELECT * FROM read_csv(?, all_varchar = true) LIMIT 0", [source]).description]
+            types = {column: 'VARCHAR' for column in DataProcessor.text_input_dtypes() if column in columns}
+            con.execute("CREATE TEMP TABLE raw AS SELECT * FROM read_csv(?, nullstr = ?, types = ?)",
+                        [source, PANDAS_NA_VALUES, types])
+        elif fmt == 'parquet':
+            wanted = set(DataProcessor.INPUT_COLUMNS) | set(DataProcessor.load_rules().columns)
+            columns = [column[0] for column in
+                       con.execute("SELECT * FROM read_parquet(?) LIMIT 0", [source]).description]
+            selected = [column for column in columns if column in wanted] or columns
+            con.execute(f"CREATE TEMP TABLE raw AS SELECT {', '.join(map(self.quote, selected))} "
+                        f"FROM read_parquet(?)", [source])
+        else:
+            raise ValueError(f"The duckdb backend reads CSV and Parquet files, not {fmt}")
+        return [column[0] for column in con.execute("SELECT * FROM raw LIMIT 0").description]
+
+    def lookup(self, con, name: str, column: str, relation: str) -> dict:
+        """
+        Resolve the distinct values of a column of relation against its vocabulary into the
+        lookup table name (value -> target); returns the column report.
+        """
+        import pyarrow as pa
+        counts = con.execute(f"SELECT CAST({self.quote(column)} AS VARCHAR), count(*) "
+                             f"FROM {relation} GROUP BY ALL").fetchall()
+        values, totals, missing = [], [], 0
+        for value, count in counts:
+            if value is None:
+                missing += count
+            else:
+                values.append(value)
+                totals.append(count)
+        targets, report = resolve_counts(DataProcessor.load_vocabularies()[column], values, totals, missing,
+                                         get_memo(DataProcessor.MEMO_PATH or None))
+        con.register(name, pa.table({'value': pa.array(values, pa.string()),
+                                     'target': pa.array(targets, pa.string())}))
+        return report
+
+    def prepare(self, con, columns: List[str]) -> Tuple[str, dict]:
+        """
+        prepare_frame in SQL: a view named final with the processed rows, numbered by __row,
+        and the data-quality report. Type is normalized on every row, the other columns
+        only on the rows the For Profit filter keeps.
+        """
+        import pyarrow as pa
+        vocabularies = DataProcessor.load_vocabularies()
+        quality = {}
+        if 'Type' in columns:
+            quality['Type'] = self.lookup(con, 'lookup_type', 'Type', 'raw')
+            # The filter keeps the rows whose normalized Type passes filter_for_profit
+            con.execute("CREATE TEMP VIEW kept AS SELECT raw.rowid AS __row, raw.* EXCLUDE (\"Type\"), "
+                        "lookup_type.target AS \"Type\" "
+                        "FROM raw JOIN lookup_type ON CAST(raw.\"Type\" AS VARCHAR) = lookup_type.value "
+                        "WHERE lower(trim(lookup_type.target)) = 'for profit'")
+        else:
+            con.execute("CREATE TEMP VIEW kept AS SELECT rowid AS __row, * FROM raw")
+
+        selections, joins = {column: f"kept.{self.quote(column)}" for column in columns}, []
+        for position, column in enumerate(col for col in vocabularies if col != 'Type' and col in columns):
+            table = f"lookup_{position}"
+            quality[column] = self.lookup(con, table, column, 'kept')
+            selections[column] = f"{table}.target"
+            joins.append(f"LEFT JOIN {table} ON CAST(kept.{self.quote(column)} AS VARCHAR) = {table}.value")
+        con.execute(f"CREATE TEMP TABLE normalized AS SELECT kept.__row, "
+                    f"{', '.join(f'{expr} AS {self.quote(column)}' for column, expr in selections.items())} "
+                    f"FROM kept {' '.join(joins)}")
+
+        # Rules are evaluated once per distinct combination of the columns they refer to
+        joins, added = [], {}
+        rules = DataProcessor.load_rules()
+        rule_columns = [column for column in rules.columns if column in columns]
+        if rule_columns:
+            distinct = con.execute(f"SELECT DISTINCT {', '.join(map(self.quote, rule_columns))} "
+                                   f"FROM normalized").df()
+            labels = distinct.assign(__label=rules.evaluate(distinct).astype(object))
+            con.register('labels', pa.Table.from_pandas(labels.astype(object).where(labels.notna(), None),
+                                                        preserve_index=False))
+            joins.append("LEFT JOIN labels ON " + ' AND '.join(
+                f"normalized.{self.quote(column)} IS NOT DISTINCT FROM labels.{self.quote(column)}"
+                for column in rule_columns))
+            added['rocket_type' if 'Final Label' in columns else 'Final Label'] = 'labels.__label'
+
+        # Each distinct country is resolved once, as geocode_countries does
+        if 'Country' in columns and not ('latitude' in columns and 'longitude' in columns):
+            countries = [row[0] for row in con.execute(
+                "SELECT DISTINCT CAST(\"Country\" AS VARCHAR) FROM normalized WHERE \"Country\" IS NOT NULL").fetchall()]
+            geocodes = DataProcessor.geocode_countries(pd.Series(countries, dtype=object), convert=False)
+            con.register('geocodes', pa.table({
+                'country': pa.array(countries, pa.string()),
+                'iso3': pa.array(geocodes['iso3'].astype(object).where(geocodes['iso3'].notna(), None).tolist(),
+                                 pa.string()),
+                'latitude': pa.array(geocodes['latitude'].to_numpy(dtype=float), pa.float64(), from_pandas=True),
+                'longitude': pa.array(geocodes['longitude'].to_numpy(dtype=float), pa.float64(), from_pandas=True)
+            }))
+            joins.append("LEFT JOIN geocodes ON CAST(normalized.\"Country\" AS VARCHAR) = geocodes.country")
+            added.update({column: f"geocodes.{column}" for column in ('iso3', 'latitude', 'longitude')})
+
+        # New columns replace existing ones in place, as assigning them in pandas does
+        output = {column: f"normalized.{self.quote(column)}" for column in columns}
+        output.update(added)
+        con.execute(f"CREATE TEMP VIEW final AS SELECT normalized.__row, "
+                    f"{', '.join(f'{expr} AS {self.quote(column)}' for column, expr in output.items())} "
+                    f"FROM normalized {' '.join(joins)}")
+        return 'final', quality
+
+    def stats(self, con, columns: List[str]) -> dict:
+        """
+        compute_stats on the final view: DuckDB aggregates the counts and merge_stats, which
+        derives every field from counts, turns them into the stats dict
+        """
+        counts = DataProcessor.empty_stats()
+        counts['total_startups'] = con.execute("SELECT count(*) FROM final").fetchone()[0]
+        if 'Final Label' in columns:
+            counts['rocket_type_distribution'] = dict(con.execute(
+                "SELECT \"Final Label\", count(*) FROM final WHERE \"Final Label\" IS NOT NULL GROUP BY ALL").fetchall())
+            if 'Country' in columns:
+                for label, country, count in con.execute(
+                        "SELECT \"Final Label\", \"Country\", count(*) FROM final "
+                        "WHERE \"Final Label\" IS NOT NULL AND \"Country\" IS NOT NULL GROUP BY ALL").fetchall():
+                    counts['country_distribution'].setdefault(label, {})[country] = count
+        if 'Country' in columns and 'latitude' in columns:
+            counts['unresolved_countries'] = dict(con.execute(
+                "SELECT \"Country\", count(*) FROM final WHERE latitude IS NULL AND \"Country\" IS NOT NULL "
+                "GROUP BY ALL").fetchall())
+        return DataProcessor.merge_stats(DataProcessor.empty_stats(), counts)
+
+    def process(self, source, compact: bool = False) -> Tuple[pd.DataFrame, dict]:
+        with self.connect() as con:
+            columns = self.load(con, source)
+            if con.execute("SELECT count(*) FROM raw").fetchone()[0] == 0:
+                # process_csv hands an empty upload back unchanged
+                return con.execute("SELECT * FROM raw").df(), DataProcessor.empty_stats()
+            final, quality = self.prepare(con, columns)
+            processed_df = con.execute(f"SELECT * FROM {final} ORDER BY __row").df().set_index('__row')
+        processed_df.index = processed_df.index.astype('int64')
+        processed_df.index.name = None
+        stats = DataProcessor.compute_stats(processed_df)
+        stats['quality'] = quality
+        return finish(processed_df, stats, compact)
+
+    def process_to_parquet(self, source, path: str, compact: bool = False) -> dict:
+        """
+        Process a file and write the rows to a zstd Parquet file, in file order; returns the
+        stats. The rows stay in DuckDB, so this is the path for files larger than memory.
+        Parquet carries no pandas categoricals, so compact makes no difference here.
+        """
+        with self.connect() as con:
+            columns = self.load(con, source)
+            if con.execute("SELECT count(*) FROM raw").fetchone()[0] == 0:
+                con.execute("COPY raw TO ? (FORMAT parquet, COMPRESSION zstd)", [os.fspath(path)])
+                return DataProcessor.empty_stats()
+            final, quality = self.prepare(con, columns)
+            con.execute(f"COPY (SELECT * EXCLUDE (__row) FROM {final} ORDER BY __row) "
+                        f"TO ? (FORMAT parquet, COMPRESSION zstd)", [os.fspath(path)])
+            output = [column[0] for column in con.execute(f"SELECT * FROM {final} LIMIT 0").description]
+            stats = self.stats(con, output)
+        stats['quality'] = quality
+        return stats
+
+
+BACKENDS = {backend.name: backend for backend in (PandasBackend, DuckDBBackend)}
+
+
+def available_backends() -> List[str]:
+    """Backends whose engine is installed here."""
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def get_backend(name: str, **options):
+    """A backend by name; options (memory_limit, temp_directory) go to the engines that take them."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}")
+    if not BACKENDS[name].available():
+        raise ValueError(f"The {name} backend needs packages that are not installed (install the '{name}' extra)")
+    return BACKENDS[name](**options)
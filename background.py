@@ -0,0 +1,98 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class ProcessingCancelled(Exception):
+    """Raised inside a job once its cancellation has been requested."""
+
+
+class ProcessingJob:
+    """
+    State of one background run, shared between the worker thread and the session that
+    started it. The worker reports progress through report(), which is also where a
+    requested cancellation takes effect; the session only reads the fields.
+    """
+
+    def __init__(self, description: str, bytes_total: int = 0):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.status = 'queued'
+        self.stage = 'Waiting for a worker'
+        self.rows = 0
+        self.chunks = 0
+        self.bytes_total = bytes_total
+        self.bytes_read = 0
+        self.done: Optional[float] = None
+        self.started = time.time()
+        self.result = None
+        self.error: Optional[str] = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """Share of the work done as reported by the stages, else of the input consumed so far."""
+        if self.done is not None:
+            return min(self.done, 1.0)
+        if not self.bytes_total:
+            return None
+        return min(self.bytes_read / self.bytes_total, 1.0)
+
+    def cancel(self) -> None:
+        """Ask the worker to stop at its next progress report."""
+        self._cancel.set()
+        if self.status == 'queued':
+            self.status = 'cancelled'
+
+    def report(self, stage: Optional[str] = None, rows: Optional[int] = None,
+               chunks: Optional[int] = None, bytes_read: Optional[int] = None, done: Optional[float] = None) -> None:
+        """
+        Update progress from the worker; raises ProcessingCancelled if the job was cancelled.
+        done is the share of the work finished, for stages that know it better than bytes_read.
+        """
+        if stage is not None:
+            self.stage = stage
+        if rows is not None:
+            self.rows = rows
+        if chunks is not None:
+            self.chunks = chunks
+        if bytes_read is not None:
+            self.bytes_read = bytes_read
+        if done is not None:
+            self.done = done
+        if self._cancel.is_set():
+            raise ProcessingCancelled()
+
+
+class JobRunner:
+    """Thread pool shared by every session of the app, running ProcessingJobs."""
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='coiq-job')
+
+    def submit(self, job: ProcessingJob, func: Callable, *args, **kwargs) -> ProcessingJob:
+        """Run func(job, *args, **kwargs) on a worker; its return value becomes job.result."""
+        self._pool.submit(self._run, job, func, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job: ProcessingJob, func: Callable, args: tuple, kwargs: dict) -> None:
+        if job._cancel.is_set():
+            job.status = 'cancelled'
+            return
+        job.status = 'running'
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = 'done'
+        except ProcessingCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
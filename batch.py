@@ -0,0 +1,133 @@
+"""
+Headless batch processing of cohort files with DataProcessor, spread over a process pool.
+Any upload format works (CSV, Parquet, Excel .xlsx, JSON Lines); chunked streaming applies to CSV.
+
+For every input file this writes <name>.parquet (the processed rows) and <name>.stats.json,
+plus a summary.json that merges the stats of all files.
+
+    python batch.py incoming/ processed/ --workers 8
+    python batch.py incoming/ processed/ --pattern "cohort_*.csv" --chunksize 200000 --compact
+    python batch.py incoming/ processed/ --pattern "*.parquet"
+    python batch.py incoming/ processed/ --backend duckdb --memory-limit 4GB --temp-dir /scratch
+
+The duckdb backend writes the processed rows straight from DuckDB, which spills to
+--temp-dir past --memory-limit (per worker), so input files may be larger than memory.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+from backends import available_backends, get_backend
+from data_processor import DataProcessor
+
+
+def write_json(data: dict, path: str) -> None:
+    """Write a stats dict as JSON; numpy scalars and other odd keys fall back to str."""
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, default=str)
+
+
+def process_file(path: str, output_dir: str, chunksize: int, compact: bool, backend: str = 'pandas',
+                 backend_options: Optional[dict] = None) -> dict:
+    """Process one input file and write its Parquet and stats files. Runs inside a worker process."""
+    start = time.perf_counter()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    parquet_path = os.path.join(output_dir, f"{stem}.parquet")
+    stats_path = os.path.join(output_dir, f"{stem}.stats.json")
+
+    fmt = DataProcessor.detect_format(path)
+    if backend != 'pandas':
+        stats = get_backend(backend, **(backend_options or {})).process_to_parquet(path, parquet_path, compact=compact)
+    else:
+        if chunksize and fmt == 'csv':
+            processed_df, stats = DataProcessor.process_csv_chunked(path, chunksize=chunksize, compact=compact)
+        else:
+            processed_df, stats = DataProcessor.process_csv(DataProcessor.read_input(path, fmt), compact=compact)
+        processed_df.to_parquet(parquet_path, index=False, compression='zstd')
+    write_json(stats, stats_path)
+
+    return {
+        'input': path,
+        'parquet': parquet_path,
+        'stats_file': stats_path,
+        'rows': stats['total_startups'],
+        'seconds': time.perf_counter() - start,
+        'stats': stats
+    }
+
+
+def run_batch(paths: list, output_dir: str, workers: int, chunksize: int, compact: bool,
+              backend: str = 'pandas', backend_options: Optional[dict] = None) -> dict:
+    """Process every path in a pool and merge the results into one summary."""
+    os.makedirs(output_dir, exist_ok=True)
+    combined = DataProcessor.empty_stats()
+    files, failed = [], {}
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_file, path, output_dir, chunksize, compact, backend, backend_options): path
+                   for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed[path] = f"{type(e).__name__}: {e}"
+                print(f"FAILED {path}: {failed[path]}", file=sys.stderr)
+                continue
+            stats = result.pop('stats')
+            stats.pop('memory', None)
+            combined = DataProcessor.merge_stats(combined, stats)
+            files.append(result)
+            print(f"{path}: {result['rows']:,} startups in {result['seconds']:.2f}s")
+
+    return {
+        'files': sorted(files, key=lambda result: result['input']),
+        'failed': failed,
+        'workers': workers,
+        'backend': backend,
+        'seconds': time.perf_counter() - start,
+        'combined_stats': combined
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input_dir', help="directory containing the input files")
+    parser.add_argument('output_dir', help="directory for the Parquet, stats and summary files")
+    parser.add_argument('--pattern', default='*.csv', help="glob for input files inside input_dir")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument('--chunksize', type=int, default=0,
+                        help="stream each CSV file in chunks of this many rows (0 reads files whole)")
+    parser.add_argument('--compact', action='store_true', help="use categorical dtypes for processed data")
+    parser.add_argument('--backend', default='pandas', choices=available_backends(),
+                        help="engine; --chunksize only applies to pandas")
+    parser.add_argument('--memory-limit', help="duckdb: memory per worker before spilling, e.g. 4GB")
+    parser.add_argument('--temp-dir', help="duckdb: where to spill past the memory limit")
+    args = parser.parse_args()
+
+    if 'parquet' not in DataProcessor.available_export_formats():
+        parser.error("pyarrow is required to write Parquet output")
+
+    paths = sorted(glob.glob(os.path.join(args.input_dir, args.pattern)))
+    if not paths:
+        parser.error(f"no files matching {args.pattern!r} in {args.input_dir}")
+
+    options = {'memory_limit': args.memory_limit, 'temp_directory': args.temp_dir} if args.backend == 'duckdb' else {}
+    summary = run_batch(paths, args.output_dir, args.workers, args.chunksize, args.compact, args.backend, options)
+    write_json(summary, os.path.join(args.output_dir, 'summary.json'))
+
+    total = summary['combined_stats']['total_startups']
+    print(f"Processed {len(summary['files'])} of {len(paths)} files ({total:,} startups) "
+          f"in {summary['seconds']:.2f}s with {args.workers} workers")
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
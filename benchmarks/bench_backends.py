@@ -0,0 +1,99 @@
+"""
+End-to-end benchmark of the dataframe backends on synthetic CSV files.
+
+For each size a CSV file is written once, then every installed backend processes it from
+disk into a Parquet file, as batch.py does (best of --repeat). The stats of each backend are
+checked against the pandas ones. --memory-limit caps DuckDB, which then spills to --tmpdir.
+
+    python benchmarks/bench_backends.py --sizes 1e5 1e6 --output benchmarks/results/backends.json
+    python benchmarks/bench_backends.py --sizes 1e7 --repeat 1 --memory-limit 512MB
+    python benchmarks/bench_backends.py --baseline benchmarks/results/backends.json
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+
+from common import REPO_ROOT, find_regressions, report_header, write_report
+from synthetic import write_startups_csv
+
+sys.path.insert(0, REPO_ROOT)
+
+from backends import available_backends, get_backend  # noqa: E402
+
+
+def bench_size(n_rows: int, seed: int, repeat: int, memory_limit: str, directory: str) -> dict:
+    """Wall time of every backend on one file, with a parity check against pandas."""
+    path = os.path.join(directory, f"startups_{n_rows}.csv")
+    write_startups_csv(path, n_rows, seed)
+
+    results, reference = {}, None
+    for name in available_backends():
+        options = {'memory_limit': memory_limit, 'temp_directory': directory} if name == 'duckdb' else {}
+        backend = get_backend(name, **options)
+        output = os.path.join(directory, f"processed_{name}.parquet")
+        best = float('inf')
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            stats = backend.process_to_parquet(path, output)
+            best = min(best, time.perf_counter() - start)
+        os.remove(output)
+        if reference is None:
+            reference = stats
+        results[name] = {
+            'seconds': best,
+            'rows_in': n_rows,
+            'rows_per_second': n_rows / best if best else None,
+            'matches_pandas': stats == reference
+        }
+
+    os.remove(path)
+    pandas_seconds = results['pandas']['seconds']
+    for result in results.values():
+        result['speedup'] = pandas_seconds / result['seconds'] if result['seconds'] else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['1e4', '1e5', '1e6'],
+                        help="row counts to benchmark, e.g. 1e5 1e7")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per backend")
+    parser.add_argument('--memory-limit', help="DuckDB memory limit, e.g. 512MB; past it DuckDB spills to --tmpdir")
+    parser.add_argument('--tmpdir', help="where to write the synthetic files and spill (default: system temp)")
+    parser.add_argument('--output', default=os.path.join(REPO_ROOT, 'benchmarks', 'results', 'backends.json'),
+                        help="where to write the JSON results")
+    parser.add_argument('--baseline', help="JSON results of a previous run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    report = report_header('backends', seed=args.seed, repeat=args.repeat, memory_limit=args.memory_limit,
+                           backends=available_backends())
+    report['results'] = {}
+    mismatched = []
+    with tempfile.TemporaryDirectory(dir=args.tmpdir) as directory:
+        for size in args.sizes:
+            n_rows = int(float(size))
+            for name, result in bench_size(n_rows, args.seed, args.repeat, args.memory_limit, directory).items():
+                report['results'][f"{n_rows}/{name}"] = result
+                if not result['matches_pandas']:
+                    mismatched.append(f"{n_rows}/{name}")
+                print(f"{n_rows:>10,} {name:<8} {result['seconds'] * 1000:10.1f} ms  "
+                      f"x{result['speedup']:.2f} vs pandas" + ("" if result['matches_pandas'] else "  STATS DIFFER"))
+
+    write_report(report, args.output)
+    print(f"Results written to {args.output}")
+
+    regressions = find_regressions(report['results'], args.baseline, 'seconds', args.tolerance) if args.baseline else []
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions or mismatched:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
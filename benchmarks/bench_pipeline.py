@@ -0,0 +1,121 @@
+"""
+Stage-by-stage benchmark of DataProcessor.process_csv on synthetic data.
+
+For each size the normalize, filter, classify, geocode and stats stages are timed (best of
+--repeat) and their peak traced memory is measured in a separate run, since tracing slows execution.
+
+    python benchmarks/bench_pipeline.py --sizes 1e3 1e4 1e5 1e6 --output benchmarks/results/pipeline.json
+    python benchmarks/bench_pipeline.py --sizes 1e7 --repeat 1
+    python benchmarks/bench_pipeline.py --baseline benchmarks/results/pipeline.json
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+from common import REPO_ROOT, find_regressions, report_header, write_report
+from synthetic import generate_startups
+
+sys.path.insert(0, REPO_ROOT)
+
+from data_processor import DataProcessor  # noqa: E402
+
+# Each stage takes the output of the previous one; the input is copied outside the timed
+# region because classify and geocode add columns in place
+STAGES = [
+    ('normalize', lambda df: DataProcessor.normalize_frame(df)[0]),
+    ('filter', DataProcessor.filter_for_profit),
+    ('classify', DataProcessor.classify_frame),
+    # As in prepare_frame: normalization already sent unknown countries through country_converter
+    ('geocode', lambda df: DataProcessor.geocode_frame(df, convert=False)),
+    ('stats', DataProcessor.compute_stats)
+]
+
+
+def time_call(func, make_input, repeat: int):
+    """Best wall time of `repeat` calls, plus the result of the last one."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        data = make_input()
+        gc.collect()
+        start = time.perf_counter()
+        result = func(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(func, data) -> int:
+    """Peak bytes allocated while running func, as seen by tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_size(n_rows: int, seed: int, repeat: int) -> dict:
+    """Time and memory per stage for one dataset size."""
+    frame = generate_startups(n_rows, seed)
+    results = {}
+    total_seconds = 0.0
+    for stage, func in STAGES:
+        rows_in = len(frame)
+        seconds, output = time_call(func, frame.copy, repeat)
+        peak = peak_memory(func, frame.copy())
+        total_seconds += seconds
+        results[stage] = {
+            'seconds': seconds,
+            'peak_bytes': peak,
+            'rows_in': rows_in,
+            'rows_per_second': rows_in / seconds if seconds else None
+        }
+        if stage != 'stats':
+            frame = output
+    results['total'] = {'seconds': total_seconds, 'rows_in': n_rows}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', default=['1e3', '1e4', '1e5', '1e6'],
+                        help="row counts to benchmark, e.g. 1e3 1e7")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage")
+    parser.add_argument('--output', default=os.path.join(REPO_ROOT, 'benchmarks', 'results', 'pipeline.json'),
+                        help="where to write the JSON results")
+    parser.add_argument('--baseline', help="JSON results of a previous run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    report = report_header('pipeline', seed=args.seed, repeat=args.repeat,
+                           classifier_version=DataProcessor.classifier_version())
+    report['results'] = {}
+    for size in args.sizes:
+        n_rows = int(float(size))
+        size_results = bench_size(n_rows, args.seed, args.repeat)
+        for stage, result in size_results.items():
+            report['results'][f"{n_rows}/{stage}"] = result
+            peak = result.get('peak_bytes')
+            print(f"{n_rows:>10,} {stage:<9} {result['seconds'] * 1000:10.1f} ms"
+                  + (f"  peak {peak / 1024 ** 2:8.1f} MiB" if peak is not None else ""))
+
+    write_report(report, args.output)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = find_regressions(report['results'], args.baseline, 'seconds', args.tolerance)
+        regressions += find_regressions(report['results'], args.baseline, 'peak_bytes', args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Cold-start benchmark: time `import data_processor` and the first render of the login page,
+each in a fresh interpreter so nothing is already imported.
+
+    python benchmarks/bench_startup.py --repeat 5 --output benchmarks/results/startup.json
+    python benchmarks/bench_startup.py --baseline benchmarks/results/startup.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from common import REPO_ROOT, find_regressions, report_header, write_report
+
+# Each probe prints a JSON object with its timing and which heavy modules ended up loaded
+HEAVY_MODULES = ['pandas', 'numpy', 'plotly.express', 'country_converter']
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import data_processor
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+LOGIN_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+app = AppTest.from_file('main.py', default_timeout=60)
+app.run()
+elapsed = time.perf_counter() - start
+if app.exception:
+    raise SystemExit(str(app.exception))
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+PROBES = {
+    'import_data_processor': IMPORT_PROBE,
+    'login_first_render': LOGIN_PROBE
+}
+
+
+def run_probe(code: str) -> dict:
+    """Run one probe in a fresh interpreter from the repository root."""
+    completed = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT,
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(repeat: int) -> dict:
+    """Median, min and max of each probe over `repeat` cold starts."""
+    results = {}
+    for name, code in PROBES.items():
+        runs = [run_probe(code) for _ in range(repeat)]
+        seconds = [run['seconds'] for run in runs]
+        results[name] = {
+            'median_seconds': statistics.median(seconds),
+            'min_seconds': min(seconds),
+            'max_seconds': max(seconds),
+            'heavy_modules_loaded': runs[-1]['loaded']
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help="cold starts per probe")
+    parser.add_argument('--output', help="write the results as JSON to this path")
+    parser.add_argument('--baseline', help="JSON results of a previous run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before flagging a regression")
+    args = parser.parse_args()
+
+    report = report_header('startup', repeat=args.repeat)
+    report['results'] = run_benchmarks(args.repeat)
+
+    for name, result in report['results'].items():
+        print(f"{name:<24} median {result['median_seconds']:.3f}s  "
+              f"(min {result['min_seconds']:.3f}s, max {result['max_seconds']:.3f}s)  "
+              f"loaded: {', '.join(result['heavy_modules_loaded']) or 'none'}")
+
+    if args.output:
+        write_report(report, args.output)
+
+    if args.baseline:
+        regressions = find_regressions(report['results'], args.baseline, 'median_seconds', args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Shared helpers for the benchmark scripts: report metadata, JSON output and baseline comparison."""
+import json
+import os
+import platform
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def report_header(benchmark: str, **settings) -> dict:
+    """Metadata recorded with every result file so runs can be told apart."""
+    return {
+        'benchmark': benchmark,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        **settings
+    }
+
+
+def write_report(report: dict, path: str) -> None:
+    """Write a report as indented JSON, creating the directory if needed."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def find_regressions(current: dict, baseline_path: str, metric: str, tolerance: float) -> list:
+    """
+    Compare flat {name: {metric: value}} results with those stored in a previous report.
+    Returns a line per entry that got worse by more than `tolerance` (a fraction).
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f).get('results', {})
+    regressions = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if previous and metric in previous and result[metric] > previous[metric] * (1 + tolerance):
+            regressions.append(f"{name} {metric}: {previous[metric]:.4g} -> {result[metric]:.4g}")
+    return regressions
@@ -0,0 +1,87 @@
+"""
+Seeded generator of realistic startup CSVs for benchmarking DataProcessor.
+
+Countries and sectors follow a Zipf-like skew, fund levels and Type values come in the
+dirty spellings seen in real uploads, and a small share of countries is unrecognisable.
+"""
+import numpy as np
+import pandas as pd
+
+# (country, region) pairs, most common first; some are spelled the way exports write them
+COUNTRIES = [
+    ('Nigeria', 'Africa'), ('India', 'Asia'), ('UnitedStates', 'Americas'), ('Indonesia', 'Asia'),
+    ('Pakistan', 'Asia'), ('Egypt', 'Middle East & North Africa'), ('United Kingdom', 'Europe'),
+    ('Malaysia', 'Asia'), ('SaudiArabia', 'Middle East & North Africa'), ('Bangladesh', 'Asia'),
+    ('Kenya', 'Africa'), ('Turkey', 'Europe'), ('UnitedArabEmirates', 'Middle East & North Africa'),
+    ('Morocco', 'Middle East & North Africa'), ('South Africa', 'Africa'), ('Canada', 'Americas'),
+    ('Germany', 'Europe'), ('France', 'Europe'), ('Ghana', 'Africa'), ('Singapore', 'Asia'),
+    ('Palestine', 'Middle East & North Africa'), ('Jordan', 'Middle East & North Africa'),
+    ('Tunisia', 'Middle East & North Africa'), ('Uzbekistan', 'Asia'), ('Brazil', 'Americas'),
+    ('Qatar', 'Middle East & North Africa'), ('Australia', 'Oceania'), ('Zambia', 'Africa'),
+    ('Senegal', 'Africa'), ('Brunei', 'Asia'), ('united states', 'Americas'), ('USA', 'Americas'),
+    ('Remote', 'Unknown'), ('N/A', 'Unknown')
+]
+
+SECTORS = [
+    'Fintech', 'Healthtech', 'Edtech', 'E-commerce', 'Agritech', 'Halal Food', 'Logistics',
+    'Cleantech', 'SaaS', 'Modest Fashion', 'Travel', 'Proptech', 'Media', 'Gaming',
+    'Mobility', 'Biotech', 'HR Tech', 'Insurtech', 'Cybersecurity', 'Social Impact'
+]
+
+# Canonical fund levels mixed with the casing, spacing and typos found in exports
+FUND_LEVELS = [
+    'Pre Seed', 'pre seed', 'Preseed', 'PRE SEED ', 'No Funding', 'no funding', 'No Investment',
+    'Seed', 'seed', ' Seed', 'Seed & Bridge', 'Bridge', 'Series A', 'series a ', 'Series A ',
+    'Seris A', 'Series B', 'SERIES B', 'Pre-Seed', 'Angel', ''
+]
+
+TYPES = ['For Profit', 'for profit', ' For Profit ', 'For profit', 'Non Profit', 'non-profit', 'Hybrid']
+TYPE_WEIGHTS = [0.45, 0.15, 0.08, 0.07, 0.15, 0.05, 0.05]
+
+GENDERS = ['Male', 'Female', 'Mixed', 'Prefer not to say']
+GENDER_WEIGHTS = [0.55, 0.25, 0.17, 0.03]
+
+STAGES = ['Idea', 'Prototype', 'MVP', 'Early Revenue', 'Growth']
+
+
+def zipf_weights(n: int, exponent: float = 1.1) -> np.ndarray:
+    """Normalized Zipf weights for n ranked categories."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_startups(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """A frame with the columns of a real upload; the same seed always gives the same data."""
+    rng = np.random.default_rng(seed)
+
+    country_idx = rng.choice(len(COUNTRIES), n_rows, p=zipf_weights(len(COUNTRIES)))
+    countries = np.array([country for country, _ in COUNTRIES], dtype=object)
+    regions = np.array([region for _, region in COUNTRIES], dtype=object)
+
+    fund_levels = np.array(FUND_LEVELS, dtype=object)[
+        rng.choice(len(FUND_LEVELS), n_rows, p=zipf_weights(len(FUND_LEVELS), 0.6))
+    ]
+    # A few rows have no fund level at all
+    fund_levels[rng.random(n_rows) < 0.01] = np.nan
+
+    def yes_no(p_yes: float) -> np.ndarray:
+        return np.where(rng.random(n_rows) < p_yes, 'Yes', 'No').astype(object)
+
+    return pd.DataFrame({
+        'Name': pd.Series(np.arange(n_rows)).map('Startup {:07d}'.format),
+        'Country': countries[country_idx],
+        'Gender': np.array(GENDERS, dtype=object)[rng.choice(len(GENDERS), n_rows, p=GENDER_WEIGHTS)],
+        'Region': regions[country_idx],
+        'Sector': np.array(SECTORS, dtype=object)[rng.choice(len(SECTORS), n_rows, p=zipf_weights(len(SECTORS)))],
+        'MVP?': yes_no(0.6),
+        '<2 years?': yes_no(0.5),
+        'Stage': np.array(STAGES, dtype=object)[rng.integers(0, len(STAGES), n_rows)],
+        'Fund level': fund_levels,
+        'Have Traction?': yes_no(0.4),
+        'Type': np.array(TYPES, dtype=object)[rng.choice(len(TYPES), n_rows, p=TYPE_WEIGHTS)]
+    })
+
+
+def write_startups_csv(path: str, n_rows: int, seed: int = 0) -> None:
+    """Write a synthetic upload to disk."""
+    generate_startups(n_rows, seed).to_csv(path, index=False)
@@ -1,108 +1,827 @@
+import functools
+import hashlib
+import importlib.util
+import io
+import json
+import os
 import pandas as pd
 import numpy as np
-from typing import Tuple
-import country_converter as coco
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from data_quality import Vocabulary, fold, get_memo, merge_reports, normalize_series
+from profiler import StageProfiler, profile_stage
+from rules import RuleSet
 
 class DataProcessor:
-    # Fund level mapping for rocket type classification
-    FUND_LEVEL_MAPPING = {
-        "Pre Seed": "W",
-        "Preseed": "W",
-        "No Funding": "W",
-        "No Investment": "W",
-        "Seed": "X",
-        "Seed & Bridge": "X",
-        "Bridge": "X",
-        "Series A": "Y",
-        "Series B": "Z"
+    # Bump whenever classification or geocoding output changes so cached results are invalidated;
+    # edits to the rules file are picked up through its hash, see classifier_version()
+    CLASSIFIER_VERSION = "2"
+
+    # Categorical dimensions pre-aggregated into the count cube that feeds the dashboard charts
+    CUBE_DIMENSIONS = ['Country', 'Region', 'Sector', 'Gender', 'Fund level', 'Final Label', 'MVP?']
+
+    # Dimensions offered as dashboard filters; a subset of the cube dimensions
+    FILTER_DIMENSIONS = ['Country', 'Region', 'Sector', 'Gender', 'Final Label']
+
+    # Upload formats and the file extensions that identify them
+    INPUT_FORMATS = {
+        'csv': ['csv', 'txt'],
+        'parquet': ['parquet', 'pq'],
+        'excel': ['xlsx'],
+        'jsonl': ['jsonl', 'ndjson']
     }
-    
-    # Dictionary mapping countries to their approximate center coordinates
-    COUNTRY_COORDS = {
-        'Palestine': {'lat': 31.9522, 'lon': 35.2332},
-        'SaudiArabia': {'lat': 23.8859, 'lon': 45.0792},
-        'Indonesia': {'lat': -0.7893, 'lon': 113.9213},
-        'Malaysia': {'lat': 4.2105, 'lon': 101.9758},
-        'Canada': {'lat': 56.1304, 'lon': -106.3468},
-        'UnitedKingdom': {'lat': 55.3781, 'lon': -3.4360},
-        'UnitedStates': {'lat': 37.0902, 'lon': -95.7129},
-        'Nigeria': {'lat': 9.0820, 'lon': 8.6753},
-        'India': {'lat': 20.5937, 'lon': 78.9629},
-        'UnitedArabEmirates': {'lat': 23.4241, 'lon': 53.8478},
-        'Singapore': {'lat': 1.3521, 'lon': 103.8198},
-        'Namibia': {'lat': -22.9576, 'lon': 18.4904},
-        'Pakistan': {'lat': 30.3753, 'lon': 69.3451},
-        'Uzbekistan': {'lat': 41.3775, 'lon': 64.5853},
-        'Zambia': {'lat': -13.1339, 'lon': 27.8493},
-        'France': {'lat': 46.2276, 'lon': 2.2137},
-        'Malawi': {'lat': -13.2543, 'lon': 34.3015},
-        'Austria': {'lat': 47.5162, 'lon': 14.5501},
-        'SouthAfrica': {'lat': -30.5595, 'lon': 22.9375},
-        'Turkey': {'lat': 38.9637, 'lon': 35.2433},
-        'Bangladesh': {'lat': 23.6850, 'lon': 90.3563},
-        'Switzerland': {'lat': 46.8182, 'lon': 8.2275},
-        'Qatar': {'lat': 25.3548, 'lon': 51.1839},
-        'Egypt': {'lat': 26.8206, 'lon': 30.8025},
-        'Morocco': {'lat': 31.7917, 'lon': -7.0926},
-        'Brunei': {'lat': 4.5353, 'lon': 114.7277},
-        'Germany': {'lat': 51.1657, 'lon': 10.4515},
-        'Australia': {'lat': -25.2744, 'lon': 133.7751},
-        'Tunisia': {'lat': 33.8869, 'lon': 9.5375},
-        'Angola': {'lat': -11.2027, 'lon': 17.8739}
+
+    # Optional packages needed to read some upload formats, with the extra that installs them
+    INPUT_FORMAT_PACKAGES = {
+        'parquet': ('pyarrow', 'parquet'),
+        'excel': ('openpyxl', 'excel')
     }
 
+    # Columns read by the pipeline and the dashboard; Parquet uploads load only these
+    # (plus any column the rules file refers to)
+    INPUT_COLUMNS = ['Name', 'Country', 'Gender', 'Region', 'Sector', 'MVP?', '<2 years?', 'Stage', 'Fund level',
+                     'Have Traction?', 'Type', 'rocket_type', 'Final Label', 'latitude', 'longitude']
+
+    # Download formats offered for processed data: file extension and MIME type
+    EXPORT_FORMATS = {
+        'csv': ('csv', 'text/csv'),
+        'parquet': ('parquet', 'application/vnd.apache.parquet'),
+        'arrow': ('arrow', 'application/vnd.apache.arrow.file')
+    }
+
+    # Low-cardinality columns stored as categoricals in compact mode
+    COMPACT_CATEGORICAL_COLUMNS = ['Country', 'Region', 'Sector', 'Gender', 'Type', 'Fund level', 'Stage',
+                                   'Final Label', 'MVP?', '<2 years?', 'Have Traction?', 'iso3']
+
+    # Columns identifying the same startup across uploads, used to deduplicate appends
+    RECORD_KEY_COLUMNS = ['Name', 'Country']
+
+    # Rows read per chunk when streaming large CSV files
+    DEFAULT_CHUNKSIZE = 100_000
+
+    # Coordinates are the only numeric input columns; every other column the pipeline reads is text
+    NUMERIC_INPUT_COLUMNS = ['latitude', 'longitude']
+
+    # Declarative rocket type rules, compiled by rules.RuleSet; COIQ_RULES_PATH points elsewhere
+    RULES_PATH = os.environ.get('COIQ_RULES_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'data', 'classification_rules.json')
+
+    # Bundled country lookup: ISO3 code, centroid and the aliases each country is known by
+    GEOCODE_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'country_geocodes.csv')
+
+    # Canonical values of the columns cleaned before processing; COIQ_VOCABULARY_PATH points elsewhere
+    VOCABULARY_PATH = os.environ.get('COIQ_VOCABULARY_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'data', 'vocabularies.json')
+
+    # Persistent memo of matched values; an empty COIQ_NORMALIZATION_MEMO keeps it in memory only
+    MEMO_PATH = os.environ.get('COIQ_NORMALIZATION_MEMO',
+                               os.path.join(os.path.expanduser('~'), '.coiq', 'normalization_memo.json'))
+
     @staticmethod
-    def normalize_fund_level(input_value):
-        """Normalize the fund level string to ensure consistency."""
-        return str(input_value).strip().title()
+    def text_input_dtypes() -> Dict[str, str]:
+        """
+        Text dtype for every text column the pipeline reads, so a CSV chunk whose values are
+        all blank is not parsed as float and every chunk gets the dtype of a whole-file read
+        """
+        columns = set(DataProcessor.INPUT_COLUMNS) | set(DataProcessor.load_rules().columns)
+        return {col: 'str' for col in sorted(columns) if col not in DataProcessor.NUMERIC_INPUT_COLUMNS}
 
     @staticmethod
-    def classify_stage(fund_level):
-        """Classify the stage (rocket type) based on the fund level."""
-        normalized = DataProcessor.normalize_fund_level(fund_level)
-        return DataProcessor.FUND_LEVEL_MAPPING.get(normalized, "Unknown")
+    def load_rules() -> RuleSet:
+        """The rocket type rules, recompiled only when the rules file content changes."""
+        return RuleSet.from_file(DataProcessor.RULES_PATH)
 
     @staticmethod
-    def process_csv(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+    def classifier_version() -> str:
+        """CLASSIFIER_VERSION combined with the rules and vocabulary file hashes, for keying cached results."""
+        with open(DataProcessor.VOCABULARY_PATH, 'rb') as f:
+            vocabulary_digest = hashlib.sha256(f.read()).hexdigest()
+        return f"{DataProcessor.CLASSIFIER_VERSION}:{DataProcessor.load_rules().digest[:16]}:{vocabulary_digest[:8]}"
+
+    @staticmethod
+    def normalize_country(value) -> str:
+        """Fold case, accents, spacing and punctuation so 'United States' matches 'UnitedStates'."""
+        return fold(value)
+
+    @staticmethod
+    def load_vocabularies() -> Dict[str, Vocabulary]:
         """
-        Process the CSV data and classify startups according to the required format
+        Vocabularies of the normalized columns: the vocabulary file, extended with every value
+        the rules compare a column against, plus Country from the bundled geocode table.
+        A column's "missing" list names the placeholders that stand for no value; the Country
+        entry of the file only holds those, as its names come from the geocode table.
         """
-        # Use the uploaded data - no fallback to demo data
-        processed_df = df.copy()
-        
-        # Return empty stats if no data is provided
-        if df.empty:
-            return df, {
-                'total_startups': 0,
-                'rocket_type_distribution': {},
-                'percentages': {},
-                'country_distribution': {}
-            }
-        
-        # Filter for only "For Profit" rockets based on the "Type" column
-        if 'Type' in processed_df.columns:
-            processed_df = processed_df[processed_df['Type'].str.strip().str.lower() == "for profit"].copy()
-        
-        # Calculate rocket type based on Fund level if Fund level column exists
-        if 'Fund level' in processed_df.columns:
-            processed_df['rocket_type'] = processed_df['Fund level'].apply(DataProcessor.classify_stage)
+        with open(DataProcessor.VOCABULARY_PATH, 'rb') as f:
+            content = f.read()
+        return DataProcessor._compile_vocabularies(content, DataProcessor.load_rules().digest)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4)
+    def _compile_vocabularies(content: bytes, rules_digest: str) -> Dict[str, Vocabulary]:
+        try:
+            spec = json.loads(content)
+        except ValueError as e:
+            raise ValueError(f"Vocabulary file is not valid JSON: {e}") from e
+        rule_values = {}
+        for conditions in DataProcessor.load_rules().conditions:
+            for column, allowed, _ in conditions:
+                rule_values.setdefault(column, []).extend(sorted(value for value in allowed if value is not None))
+
+        country = spec.pop('Country', {})
+        vocabularies = {}
+        for column, entry in spec.items():
+            values = list(entry['values']) + [value for value in rule_values.get(column, []) if value not in entry['values']]
+            vocabularies[column] = Vocabulary(column, values, entry.get('synonyms'), entry.get('fuzzy', True),
+                                              missing=entry.get('missing'))
+
+        # Countries normalize to their geocode table name, from any name alias or an exact code
+        names = DataProcessor.load_country_names()
+        _, aliases, codes = DataProcessor.load_geocode_table()
+        vocabularies['Country'] = Vocabulary('Country', list(names.values()),
+                                             {alias: names[iso3] for alias, iso3 in aliases.items()},
+                                             resolver=DataProcessor.convert_country_names,
+                                             missing=country.get('missing'),
+                                             exact={code: names[iso3] for code, iso3 in codes.items()})
+        return vocabularies
+
+    @staticmethod
+    def convert_country_names(names: List) -> List[Optional[str]]:
+        """Geocode table names for country names outside its aliases, through country_converter."""
+        country_names = DataProcessor.load_country_names()
+        return [country_names.get(iso3) for iso3 in DataProcessor.convert_to_iso3(names)]
+
+    @staticmethod
+    def normalize_frame(df: pd.DataFrame, columns: Optional[List[str]] = None) -> Tuple[pd.DataFrame, dict]:
+        """
+        Replace dirty spellings in the vocabulary columns (all of them by default) with their
+        canonical values. Returns the frame and the data-quality report of those columns.
+        """
+        vocabularies = DataProcessor.load_vocabularies()
+        memo = get_memo(DataProcessor.MEMO_PATH or None)
+        report = {}
+        for col in columns if columns is not None else list(vocabularies):
+            if col in df.columns and col in vocabularies:
+                df[col], report[col] = normalize_series(df[col], vocabularies[col], memo)
+        return df, report
+
+    @staticmethod
+    def is_code_alias(alias: str) -> bool:
+        """ISO codes and acronyms such as 'NA', 'NOR' or 'UAE', which only match when written exactly."""
+        return 2 <= len(alias) <= 3 and alias.isascii() and alias.isalpha() and alias.isupper()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def load_geocode_table() -> Tuple[pd.DataFrame, Dict[str, str], Dict[str, str]]:
+        """
+        Load the bundled geocode table once: centroids indexed by ISO3, a lookup from every
+        normalized name alias to its ISO3 code, and one from every code alias, unnormalized.
+        Codes are kept apart because folding would let 'N/A' or 'No' pass for NA and NO.
+        """
+        table = pd.read_csv(DataProcessor.GEOCODE_TABLE_PATH, keep_default_na=False, na_values=[''])
+        aliases, codes = {}, {}
+        for iso3, names in zip(table['iso3'], table['aliases']):
+            for name in names.split('|'):
+                if DataProcessor.is_code_alias(name):
+                    codes[name] = iso3
+                else:
+                    aliases[DataProcessor.normalize_country(name)] = iso3
+        return table.set_index('iso3')[['latitude', 'longitude']], aliases, codes
+
+    @staticmethod
+    def convert_to_iso3(names: List) -> List[Optional[str]]:
+        """
+        ISO3 code per name from country_converter, in one batch; None where it finds no single known code.
+        Placeholders and short values other than exact codes are not passed on, as its patterns
+        would read 'No' as Norway and 'na' as Namibia.
+        """
+        names = list(names)
+        country = DataProcessor.load_vocabularies()['Country']
+        candidates = [name for name in names if not country.is_missing(name) and (
+            len(DataProcessor.normalize_country(name)) > 3 or DataProcessor.is_code_alias(str(name).strip()))]
+        if not candidates:
+            return [None] * len(names)
+        # country_converter loads a large classification table, so it is only imported when needed
+        import country_converter as coco
+        converted = coco.convert(names=candidates, to='ISO3', not_found=None)
+        if isinstance(converted, str):
+            converted = [converted]
+        centroids, _, _ = DataProcessor.load_geocode_table()
+        # Ambiguous matches come back as lists; only accept a single known code
+        found = {name: iso3 if isinstance(iso3, str) and iso3 in centroids.index else None
+                 for name, iso3 in zip(candidates, converted)}
+        return [found.get(name) for name in names]
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def load_country_names() -> Dict[str, str]:
+        """Canonical country name per ISO3 code, from the bundled geocode table."""
+        table = pd.read_csv(DataProcessor.GEOCODE_TABLE_PATH, usecols=['iso3', 'name'], keep_default_na=False,
+                            na_values=[''])
+        return dict(zip(table['iso3'], table['name']))
+
+    @staticmethod
+    def resolve_countries(names: List, convert: bool = True) -> Dict[str, Optional[str]]:
+        """
+        Resolve distinct country names to ISO3 codes through the bundled alias table.
+        Names it does not know are passed to country_converter in a single batch unless
+        convert is False; anything still unmatched resolves to None, as do the placeholders
+        of the Country vocabulary ('N/A', 'Unknown').
+        """
+        _, aliases, codes = DataProcessor.load_geocode_table()
+        country = DataProcessor.load_vocabularies()['Country']
+        resolved, placeholders = {}, set()
+        for name in names:
+            if country.is_missing(name):
+                placeholders.add(name)
+                resolved[name] = None
+            else:
+                resolved[name] = codes.get(str(name).strip()) or aliases.get(DataProcessor.normalize_country(name))
+
+        unmatched = [name for name, iso3 in resolved.items() if iso3 is None and name not in placeholders]
+        if unmatched and convert:
+            resolved.update(zip(unmatched, DataProcessor.convert_to_iso3(unmatched)))
+        return resolved
+
+    @staticmethod
+    def geocode_countries(countries: pd.Series, convert: bool = True) -> pd.DataFrame:
+        """
+        Attach ISO3 codes and centroid coordinates to a Country column. Only the distinct
+        values are resolved; unresolved names get missing coordinates rather than (0, 0).
+        Normalized countries are table names already, so they can skip country_converter.
+        """
+        codes, uniques = pd.factorize(countries)
+        resolved = DataProcessor.resolve_countries(list(uniques), convert)
+        centroids, _, _ = DataProcessor.load_geocode_table()
+
+        iso3 = pd.Index([resolved[name] for name in uniques], dtype=object)
+        coords = centroids.reindex(iso3)
+
+        # Missing countries have code -1, which picks the trailing missing value
+        iso3_values = np.append(iso3.to_numpy(dtype=object), None)
+        lat_values = np.append(coords['latitude'].to_numpy(dtype=float), np.nan)
+        lon_values = np.append(coords['longitude'].to_numpy(dtype=float), np.nan)
+        return pd.DataFrame({
+            # Typed as text even when no country resolved, so chunks concatenate without widening to object
+            'iso3': pd.Series(iso3_values[codes], index=countries.index, dtype='str'),
+            'latitude': lat_values[codes],
+            'longitude': lon_values[codes]
+        }, index=countries.index)
+
+    @staticmethod
+    def empty_stats() -> dict:
+        """Statistics for a dataset with no startups."""
+        return {
+            'total_startups': 0,
+            'rocket_type_distribution': {},
+            'percentages': {},
+            'country_distribution': {},
+            'unresolved_countries': {}
+        }
+
+    @staticmethod
+    def filter_for_profit(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
+        """Keep only "For Profit" rockets based on the "Type" column."""
+        if 'Type' not in df.columns:
+            return df
+        keep = df['Type'].str.strip().str.lower() == "for profit"
+        if copy:
+            return df[keep].copy()
+        # take() materializes the kept rows once, without the extra copy after boolean indexing
+        return df.take(np.flatnonzero(keep.to_numpy(dtype=bool, na_value=False)))
+
+    @staticmethod
+    def classify_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """Add the rocket type as 'Final Label', derived through the rules file when its columns are available."""
+        # Calculate rocket type if any column the rules look at exists
+        rules = DataProcessor.load_rules()
+        if any(col in df.columns for col in rules.columns):
+            df['rocket_type'] = rules.evaluate(df)
         
         # Ensure we have the right column names for compatibility
-        if 'rocket_type' in processed_df.columns and 'Final Label' not in processed_df.columns:
-            processed_df = processed_df.rename(columns={'rocket_type': 'Final Label'})
-        
-        # Add latitude and longitude based on country if not already present
-        if 'Country' in processed_df.columns:
-            if 'latitude' not in processed_df.columns or 'longitude' not in processed_df.columns:
-                processed_df['latitude'] = processed_df['Country'].map(lambda x: DataProcessor.COUNTRY_COORDS.get(x, {'lat': 0})['lat'])
-                processed_df['longitude'] = processed_df['Country'].map(lambda x: DataProcessor.COUNTRY_COORDS.get(x, {'lon': 0})['lon'])
-        
-        # Calculate statistics
-        stats = {
+        if 'rocket_type' in df.columns and 'Final Label' not in df.columns:
+            df = df.rename(columns={'rocket_type': 'Final Label'})
+        return df
+
+    @staticmethod
+    def geocode_frame(df: pd.DataFrame, convert: bool = True) -> pd.DataFrame:
+        """Add ISO3 code, latitude and longitude based on country if not already present."""
+        if 'Country' in df.columns:
+            if 'latitude' not in df.columns or 'longitude' not in df.columns:
+                geocodes = DataProcessor.geocode_countries(df['Country'], convert)
+                df['iso3'] = geocodes['iso3']
+                df['latitude'] = geocodes['latitude']
+                df['longitude'] = geocodes['longitude']
+        return df
+
+    @staticmethod
+    def prepare_frame(df: pd.DataFrame, copy: bool = True, profiler: Optional[StageProfiler] = None,
+                      progress: Optional[Callable[[str, float], None]] = None) -> Tuple[pd.DataFrame, dict]:
+        """
+        Apply normalization, the For Profit filter, rocket type classification and geocoding
+        to a frame, returning it with the data-quality report. Type is normalized on every
+        row, the other columns only on the rows the filter keeps.
+        With copy=False the input is only shallow-copied; new columns never touch it.
+        progress(stage, fraction_done) is called before every stage and once at the end;
+        raising from it stops the run.
+        """
+        def advance(stage: str, done: int) -> None:
+            if progress is not None:
+                progress(stage, done / 5)
+
+        processed_df = df.copy(deep=copy)
+        advance('Normalizing types', 0)
+        with profile_stage(profiler, 'normalize', len(processed_df)) as record:
+            processed_df, quality = DataProcessor.normalize_frame(processed_df, ['Type'])
+            record['rows_out'] = len(processed_df)
+        advance('Filtering For Profit', 1)
+        with profile_stage(profiler, 'filter', len(processed_df)) as record:
+            processed_df = DataProcessor.filter_for_profit(processed_df, copy=copy)
+            record['rows_out'] = len(processed_df)
+        advance('Normalizing values', 2)
+        with profile_stage(profiler, 'normalize', len(processed_df)) as record:
+            columns = [col for col in DataProcessor.load_vocabularies() if col != 'Type']
+            processed_df, report = DataProcessor.normalize_frame(processed_df, columns)
+            quality.update(report)
+            record['rows_out'] = len(processed_df)
+        advance('Classifying', 3)
+        with profile_stage(profiler, 'classify', len(processed_df)) as record:
+            processed_df = DataProcessor.classify_frame(processed_df)
+            record['rows_out'] = len(processed_df)
+        advance('Geocoding', 4)
+        with profile_stage(profiler, 'geocode', len(processed_df)) as record:
+            # Unknown countries already went through country_converter during normalization
+            processed_df = DataProcessor.geocode_frame(processed_df, convert=False)
+            record['rows_out'] = len(processed_df)
+        advance('Computing stats', 5)
+        return processed_df, quality
+
+    @staticmethod
+    def memory_usage_bytes(df: pd.DataFrame) -> int:
+        """Deep memory footprint of a frame, including string payloads."""
+        return int(df.memory_usage(deep=True).sum())
+
+    @staticmethod
+    def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Store low-cardinality columns as categoricals and remaining object text columns
+        as Arrow-backed strings (when pyarrow is installed)
+        """
+        arrow_strings = importlib.util.find_spec('pyarrow') is not None
+        conversions = {}
+        for col in df.columns:
+            if col in DataProcessor.COMPACT_CATEGORICAL_COLUMNS:
+                if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                    conversions[col] = 'category'
+            elif arrow_strings and df[col].dtype == object:
+                conversions[col] = 'string[pyarrow]'
+        return df.astype(conversions) if conversions else df
+
+    @staticmethod
+    def concat_compact(chunks: List[pd.DataFrame], ignore_index: bool = False) -> pd.DataFrame:
+        """Concatenate compacted chunks, unifying categories so columns stay categorical."""
+        chunks = list(chunks)
+        for col, dtype in chunks[0].dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                categories = pd.Index(pd.concat([pd.Series(chunk[col].cat.categories, dtype=object) for chunk in chunks]).unique())
+                unified = pd.CategoricalDtype(categories)
+                chunks = [chunk.astype({col: unified}) for chunk in chunks]
+        return pd.concat(chunks, ignore_index=ignore_index)
+
+    @staticmethod
+    def compute_stats(processed_df: pd.DataFrame) -> dict:
+        """Calculate the summary statistics for a processed frame."""
+        return {
             'total_startups': len(processed_df),
             'rocket_type_distribution': processed_df['Final Label'].value_counts().to_dict() if 'Final Label' in processed_df.columns else {},
             'percentages': (processed_df['Final Label'].value_counts(normalize=True) * 100).round(2).to_dict() if 'Final Label' in processed_df.columns else {},
-            'country_distribution': processed_df.groupby('Country')['Final Label'].value_counts().unstack().fillna(0).to_dict() if 'Country' in processed_df.columns and 'Final Label' in processed_df.columns else {}
+            'country_distribution': processed_df.groupby('Country')['Final Label'].value_counts().unstack().fillna(0).to_dict() if 'Country' in processed_df.columns and 'Final Label' in processed_df.columns else {},
+            'unresolved_countries': processed_df.loc[processed_df['latitude'].isna(), 'Country'].value_counts().loc[lambda counts: counts > 0].to_dict() if 'Country' in processed_df.columns and 'latitude' in processed_df.columns else {}
+        }
+
+    @staticmethod
+    def merge_stats(left: dict, right: dict) -> dict:
+        """
+        Combine the statistics of two disjoint sets of startups. Every field is derived
+        from counts, so the result matches compute_stats on the concatenated frames.
+        """
+        label_counts = pd.Series(left['rocket_type_distribution'], dtype='int64').add(
+            pd.Series(right['rocket_type_distribution'], dtype='int64'), fill_value=0).astype('int64')
+        
+        # country_distribution is {label: {country: count}}; stack it back into pair counts
+        pair_counts = [
+            pd.DataFrame(stats['country_distribution']).stack()
+            for stats in (left, right) if stats['country_distribution']
+        ]
+        if pair_counts:
+            merged_pairs = pair_counts[0]
+            for counts in pair_counts[1:]:
+                merged_pairs = merged_pairs.add(counts, fill_value=0)
+            merged_pairs = merged_pairs[merged_pairs > 0].astype('int64')
+            country_distribution = merged_pairs.unstack().fillna(0).to_dict()
+        else:
+            country_distribution = {}
+        
+        label_counts = label_counts.sort_values(ascending=False, kind='stable')
+        unresolved = pd.Series(left.get('unresolved_countries', {}), dtype='int64').add(
+            pd.Series(right.get('unresolved_countries', {}), dtype='int64'), fill_value=0).astype('int64')
+        merged = {
+            'total_startups': left['total_startups'] + right['total_startups'],
+            'rocket_type_distribution': label_counts.to_dict(),
+            'percentages': (label_counts / label_counts.sum() * 100).round(2).to_dict() if len(label_counts) else {},
+            'country_distribution': country_distribution,
+            'unresolved_countries': unresolved.sort_values(ascending=False, kind='stable').to_dict()
         }
+        # Data-quality reports are counts as well and add up the same way
+        if 'quality' in left or 'quality' in right:
+            merged['quality'] = merge_reports(left.get('quality', {}), right.get('quality', {}))
+        return merged
+
+    @staticmethod
+    def map_bins(processed_df: pd.DataFrame, bin_degrees: float) -> pd.DataFrame:
+        """
+        Aggregate located startups into lat/lon grid cells of bin_degrees. Each cell is
+        placed at the mean position of its startups and carries a Total, a count per
+        rocket type and the Dominant type, so the map payload depends on the number of
+        cells rather than on the number of rows
+        """
+        located = processed_df['latitude'].notna() & processed_df['longitude'].notna()
+        points = pd.DataFrame({
+            'latitude': processed_df.loc[located, 'latitude'].to_numpy(dtype=float),
+            'longitude': processed_df.loc[located, 'longitude'].to_numpy(dtype=float)
+        })
+        points['cell_lat'] = np.floor(points['latitude'] / bin_degrees)
+        points['cell_lon'] = np.floor(points['longitude'] / bin_degrees)
+        cell = ['cell_lat', 'cell_lon']
+
+        grouped = points.groupby(cell)
+        bins = grouped[['latitude', 'longitude']].mean()
+        bins['Total'] = grouped.size()
+
+        if 'Final Label' in processed_df.columns:
+            points['Final Label'] = processed_df.loc[located, 'Final Label'].to_numpy()
+            label_counts = points.groupby(cell + ['Final Label'], observed=True).size().unstack(fill_value=0)
+            bins = bins.join(label_counts)
+            bins['Dominant'] = label_counts.idxmax(axis=1)
+        return bins.reset_index(drop=True).sort_values('Total', ascending=False, kind='stable')
+
+    @staticmethod
+    def merge_cubes(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+        """Add the counts of two cubes, so appending rows only needs a cube of the new rows."""
+        dimensions = [col for col in left.columns if col != 'count']
+        if not dimensions:
+            return pd.DataFrame({'count': [left['count'].sum() + right['count'].sum()]})
+        combined = pd.concat([left.astype({dim: object for dim in dimensions}),
+                              right.astype({dim: object for dim in dimensions})])
+        return combined.groupby(dimensions, dropna=False)['count'].sum().reset_index()
+
+    @staticmethod
+    def build_cube(processed_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Count startups per combination of the categorical dimensions in a single pass.
+        Missing values are kept as their own group so the counts always add up to the row count.
+        """
+        dimensions = [col for col in DataProcessor.CUBE_DIMENSIONS if col in processed_df.columns]
+        if not dimensions:
+            return pd.DataFrame({'count': [len(processed_df)]})
+        return processed_df.groupby(dimensions, dropna=False, observed=True).size().reset_index(name='count')
+
+    @staticmethod
+    def filter_cube(cube: pd.DataFrame, where: Optional[dict]) -> pd.DataFrame:
+        """Restrict the cube to the rows matching {column: allowed values}."""
+        if not where:
+            return cube
+        mask = np.ones(len(cube), dtype=bool)
+        for col, values in where.items():
+            mask &= cube[col].isin(values).to_numpy()
+        return cube[mask]
+
+    @staticmethod
+    def cube_counts(cube: pd.DataFrame, dims: List[str], where: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Roll the cube up to the given dimensions, equivalent to df.groupby(dims).size()
+        """
+        view = DataProcessor.filter_cube(cube, where)
+        return view.groupby(dims, observed=True)['count'].sum().reset_index()
+
+    @staticmethod
+    def cube_value_counts(cube: pd.DataFrame, dim: str, where: Optional[dict] = None) -> pd.Series:
+        """Equivalent to df[dim].value_counts(), read from the cube."""
+        view = DataProcessor.filter_cube(cube, where)
+        counts = view.groupby(dim, observed=True)['count'].sum()
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        return counts.rename('count')
+
+    @staticmethod
+    def compare_cubes(before: pd.DataFrame, after: pd.DataFrame, dim: str) -> pd.DataFrame:
+        """Counts per value of dim in two cubes side by side, with the change between them."""
+        comparison = pd.concat({
+            'before': DataProcessor.cube_value_counts(before, dim),
+            'after': DataProcessor.cube_value_counts(after, dim)
+        }, axis=1).fillna(0).astype(int)
+        comparison['change'] = comparison['after'] - comparison['before']
+        return comparison.sort_values('after', ascending=False, kind='stable')
+
+    @staticmethod
+    def project(df: pd.DataFrame, column_map: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """Select and rename columns ({source: display name}); the whole frame if no map is given."""
+        if column_map is None:
+            return df
+        return df[list(column_map)].rename(columns=column_map)
+
+    @staticmethod
+    def search_positions(df: pd.DataFrame, query: str, columns: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Row positions where any text column contains query (case-insensitive).
+        Categorical columns are matched on their categories, not row by row.
+        """
+        columns = list(df.columns) if columns is None else columns
+        if not query:
+            return np.arange(len(df))
+        match = np.zeros(len(df), dtype=bool)
+        for col in columns:
+            series = df[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                hits = series.cat.categories.astype(str).str.contains(query, case=False, regex=False)
+                match |= np.isin(series.cat.codes.to_numpy(), np.flatnonzero(hits))
+            elif pd.api.types.is_string_dtype(series.dtype) or series.dtype == object:
+                hits = series.astype('string').str.contains(query, case=False, regex=False)
+                match |= hits.to_numpy(dtype=bool, na_value=False)
+        return np.flatnonzero(match)
+
+    @staticmethod
+    def sort_positions(df: pd.DataFrame, positions: np.ndarray, sort_by: Optional[str], ascending: bool = True) -> np.ndarray:
+        """
+        Reorder row positions by a column (missing values last); unchanged if sort_by is None.
+        Categorical columns sort by value, as they would uncompacted, not in category order.
+        """
+        if sort_by is None:
+            return positions
+        values = df[sort_by].iloc[positions].reset_index(drop=True)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            ranks = values.cat.categories.argsort(kind='stable').argsort()
+            codes = values.cat.codes.to_numpy()
+            values = pd.Series(np.where(codes >= 0, ranks[codes], np.nan))
+        order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+        return positions[order]
+
+    @staticmethod
+    def available_input_formats() -> List[str]:
+        """Upload formats usable in this environment; Parquet needs pyarrow and Excel (.xlsx) needs openpyxl."""
+        return [fmt for fmt in DataProcessor.INPUT_FORMATS if fmt not in DataProcessor.INPUT_FORMAT_PACKAGES
+                or importlib.util.find_spec(DataProcessor.INPUT_FORMAT_PACKAGES[fmt][0]) is not None]
+
+    @staticmethod
+    def detect_format(source, name: Optional[str] = None) -> str:
+        """
+        Identify an upload from its leading bytes (Parquet, Excel and JSON Lines have telltale
+        starts), falling back to the file extension and then to CSV
+        """
+        if isinstance(source, (str, os.PathLike)):
+            name = name or os.fspath(source)
+            with open(source, 'rb') as f:
+                head = f.read(64)
+        else:
+            position = source.tell()
+            head = source.read(64)
+            source.seek(position)
+        
+        if head.startswith(b'PAR1'):
+            return 'parquet'
+        # xlsx files are zip archives; legacy xls files are OLE2 compound documents, which are not read
+        if head.startswith(b'PK\x03\x04'):
+            return 'excel'
+        if head.startswith(b'\xd0\xcf\x11\xe0'):
+            return 'xls'
+        if head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'{'):
+            return 'jsonl'
+        extension = os.path.splitext(name or '')[1].lstrip('.').lower()
+        for fmt, extensions in DataProcessor.INPUT_FORMATS.items():
+            if extension in extensions:
+                return fmt
+        return 'csv'
+
+    @staticmethod
+    def read_input(source, fmt: Optional[str] = None, name: Optional[str] = None) -> pd.DataFrame:
+        """
+        Load an upload (path or binary file object) in any supported format, detected when not given.
+        With pyarrow installed, CSV and JSON Lines are parsed by its multithreaded reader and come
+        back Arrow-backed, so the parsed buffers are used without conversion; Parquet only reads
+        the columns the pipeline uses.
+        """
+        fmt = fmt or DataProcessor.detect_format(source, name)
+        if fmt == 'xls':
+            raise ValueError("Legacy .xls workbooks are not supported; save the file as .xlsx or CSV")
+        if fmt not in DataProcessor.INPUT_FORMATS:
+            raise ValueError(f"Unsupported input format: {fmt}")
+        if fmt not in DataProcessor.available_input_formats():
+            package, extra = DataProcessor.INPUT_FORMAT_PACKAGES[fmt]
+            raise ValueError(f"Reading {fmt} files needs {package}, which is not installed "
+                             f"(install the '{extra}' extra)")
+        arrow = importlib.util.find_spec('pyarrow') is not None
+        backend = {'dtype_backend': 'pyarrow'} if arrow else {}
+        
+        if fmt == 'csv':
+            return pd.read_csv(source, engine='pyarrow' if arrow else 'c', **backend)
+        if fmt == 'jsonl':
+            return pd.read_json(source, lines=True, engine='pyarrow' if arrow else 'ujson', **backend)
+        if fmt == 'excel':
+            return pd.read_excel(source, **backend)
+        if fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            wanted = set(DataProcessor.INPUT_COLUMNS) | set(DataProcessor.load_rules().columns)
+            schema_columns = pq.ParquetFile(source).schema_arrow.names
+            if not isinstance(source, (str, os.PathLike)):
+                source.seek(0)
+            columns = [col for col in schema_columns if col in wanted]
+            table = pq.read_table(source, columns=columns or None)
+            # Arrow-backed like the other readers; dictionary-encoded columns would become Arrow
+            # dictionaries that groupby cannot sort, so those alone come back as categoricals
+            return table.to_pandas(types_mapper=lambda t: None if pa.types.is_dictionary(t) else pd.ArrowDtype(t))
+        raise ValueError(f"Unsupported input format: {fmt}")
+
+    @staticmethod
+    def available_export_formats() -> List[str]:
+        """Export formats usable in this environment; Parquet and Arrow need pyarrow."""
+        if importlib.util.find_spec('pyarrow') is None:
+            return ['csv']
+        return list(DataProcessor.EXPORT_FORMATS)
+
+    @staticmethod
+    def export_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+        """
+        Serialize a frame for download. Parquet and Arrow IPC are zstd-compressed,
+        which makes them far smaller and quicker to write than CSV.
+        """
+        if fmt == 'csv':
+            return df.to_csv(index=False).encode('utf-8')
+        if fmt == 'parquet':
+            buffer = io.BytesIO()
+            df.to_parquet(buffer, index=False, compression='zstd')
+            return buffer.getvalue()
+        if fmt == 'arrow':
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_file(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression='zstd')) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes()
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    @staticmethod
+    def iter_processed_chunks(source, chunksize: int = DEFAULT_CHUNKSIZE, profiler: Optional[StageProfiler] = None,
+                              progress: Optional[Callable[[int, int], None]] = None) -> Iterator[Tuple[pd.DataFrame, dict]]:
+        """
+        Stream a CSV in bounded chunks, yielding each processed chunk with its own stats.
+        progress(rows_read, chunks_done) is called after every chunk; raising from it stops the stream.
+        """
+        reader = iter(pd.read_csv(source, chunksize=chunksize, dtype=DataProcessor.text_input_dtypes()))
+        rows_read = 0
+        chunks_done = 0
+        while True:
+            # Parsing happens as each chunk is pulled, so the read is timed around next()
+            with profile_stage(profiler, 'read_csv') as record:
+                chunk = next(reader, None)
+                record['rows_out'] = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                return
+            # Each chunk is freshly parsed, so there is nothing to protect with a deep copy
+            processed_chunk, quality = DataProcessor.prepare_frame(chunk, copy=False, profiler=profiler)
+            with profile_stage(profiler, 'stats', len(processed_chunk)):
+                chunk_stats = DataProcessor.compute_stats(processed_chunk)
+            chunk_stats['quality'] = quality
+            rows_read += len(chunk)
+            chunks_done += 1
+            if progress is not None:
+                progress(rows_read, chunks_done)
+            yield processed_chunk, chunk_stats
+
+    @staticmethod
+    def process_csv_chunked(source, chunksize: int = DEFAULT_CHUNKSIZE, compact: bool = False,
+                            profiler: Optional[StageProfiler] = None,
+                            progress: Optional[Callable[[int, int], None]] = None) -> Tuple[pd.DataFrame, dict]:
+        """
+        Streaming counterpart of process_csv: the raw CSV is never held in memory in full,
+        only the filtered chunks are kept and the stats are merged as each chunk completes.
+        The processed rows are still concatenated in memory, so peak memory follows the
+        For Profit rows rather than the file; to handle output larger than RAM, write the
+        chunks of iter_processed_chunks out one at a time instead.
+        """
+        chunks = []
+        stats = DataProcessor.empty_stats()
+        bytes_before = 0
+        for processed_chunk, chunk_stats in DataProcessor.iter_processed_chunks(source, chunksize, profiler, progress):
+            if compact:
+                with profile_stage(profiler, 'compact', len(processed_chunk)) as record:
+                    bytes_before += DataProcessor.memory_usage_bytes(processed_chunk)
+                    processed_chunk = DataProcessor.compact_frame(processed_chunk)
+                    record['rows_out'] = len(processed_chunk)
+            chunks.append(processed_chunk)
+            stats = DataProcessor.merge_stats(stats, chunk_stats)
+        
+        if not chunks:
+            return pd.DataFrame(), stats
+        
+        # Chunks emptied by the filter are dropped so they cannot widen column dtypes
+        non_empty = [chunk for chunk in chunks if not chunk.empty] or chunks[:1]
+        with profile_stage(profiler, 'concat', sum(len(chunk) for chunk in non_empty)) as record:
+            processed_df = pd.concat(non_empty) if not compact else DataProcessor.concat_compact(non_empty)
+            record['rows_out'] = len(processed_df)
+        if not compact:
+            return processed_df, stats
+        
+        stats['memory'] = {'before_bytes': bytes_before, 'after_bytes': DataProcessor.memory_usage_bytes(processed_df)}
+        return processed_df, stats
+
+    @staticmethod
+    def record_keys(df: pd.DataFrame) -> np.ndarray:
+        """
+        Stable 64-bit hash per row of the record key columns, ignoring case and
+        surrounding whitespace, so the same startup uploaded twice gets the same key
+        """
+        key_columns = [col for col in DataProcessor.RECORD_KEY_COLUMNS if col in df.columns]
+        if not key_columns:
+            return pd.util.hash_pandas_object(df, index=False).to_numpy()
+        normalized = pd.DataFrame({
+            col: df[col].astype('string').str.strip().str.lower() for col in key_columns
+        })
+        return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+    @staticmethod
+    def sorted_record_keys(df: pd.DataFrame) -> np.ndarray:
+        """The distinct record keys of a frame, sorted for lookups with np.searchsorted."""
+        return np.unique(DataProcessor.record_keys(df))
+
+    @staticmethod
+    def append_processed(existing_df: pd.DataFrame, existing_stats: dict, new_df: pd.DataFrame,
+                         existing_keys: np.ndarray, compact: bool = False, profiler: Optional[StageProfiler] = None,
+                         progress: Optional[Callable[[str, float], None]] = None
+                         ) -> Tuple[pd.DataFrame, dict, pd.DataFrame, np.ndarray]:
+        """
+        Process only the new rows and add those not already present to an existing dataset.
+        Deduplication binary-searches the new keys in existing_keys (sorted, see
+        sorted_record_keys) and the stats are merged from the delta, so the processing work
+        depends on the size of the new batch. Returns the combined frame, the combined stats,
+        the rows that were appended and the sorted keys of the combined dataset;
+        existing_keys itself is left untouched. progress follows the processing of the new rows.
+        """
+        processed_new, new_stats = DataProcessor.process_csv(new_df, profiler=profiler, progress=progress)
+        
+        # Keep the first occurrence of every key that is not already in the dataset
+        with profile_stage(profiler, 'dedupe', len(processed_new)) as record:
+            keys = DataProcessor.record_keys(processed_new)
+            new_keys, first = np.unique(keys, return_index=True)
+            slots = np.searchsorted(existing_keys, new_keys)
+            known = slots < len(existing_keys)
+            known[known] = existing_keys[slots[known]] == new_keys[known]
+            keep = np.zeros(len(keys), dtype=bool)
+            keep[first[~known]] = True
+            appended = processed_new[keep]
+            # New keys are spliced into the sorted array in one pass, without re-sorting it
+            combined_keys = np.insert(existing_keys, slots[~known], new_keys[~known])
+            record['rows_out'] = len(appended)
+        
+        # The quality report covers every new row, duplicates included
+        appended_stats = DataProcessor.compute_stats(appended)
+        if 'quality' in new_stats:
+            appended_stats['quality'] = new_stats['quality']
+        stats = DataProcessor.merge_stats(existing_stats, appended_stats)
+        if appended.empty:
+            return existing_df, stats, appended, combined_keys
+        if existing_df.empty:
+            return appended, stats, appended, combined_keys
+        if compact:
+            appended = DataProcessor.compact_frame(appended)
+            return DataProcessor.concat_compact([existing_df, appended], ignore_index=True), stats, appended, combined_keys
+        return pd.concat([existing_df, appended], ignore_index=True), stats, appended, combined_keys
+
+    @staticmethod
+    def process_csv(df: pd.DataFrame, compact: bool = False, profiler: Optional[StageProfiler] = None,
+                    progress: Optional[Callable[[str, float], None]] = None) -> Tuple[pd.DataFrame, dict]:
+        """
+        Process the CSV data and classify startups according to the required format.
+        compact=True skips the defensive copies, stores low-cardinality columns as
+        categoricals and reports memory before and after in stats['memory'].
+        A profiler, when given, records every stage, and progress is passed to prepare_frame.
+        stats['quality'] holds the data-quality report of the normalized columns.
+        """
+        # Return empty stats if no data is provided
+        if df.empty:
+            return df, DataProcessor.empty_stats()
+        
+        # Use the uploaded data - no fallback to demo data
+        processed_df, quality = DataProcessor.prepare_frame(df, copy=not compact, profiler=profiler,
+                                                            progress=progress)
+        
+        # Calculate statistics before compaction so categorical dtypes cannot change them
+        with profile_stage(profiler, 'stats', len(processed_df)):
+            stats = DataProcessor.compute_stats(processed_df)
+        stats['quality'] = quality
+        
+        if compact:
+            with profile_stage(profiler, 'compact', len(processed_df)) as record:
+                bytes_before = DataProcessor.memory_usage_bytes(processed_df)
+                processed_df = DataProcessor.compact_frame(processed_df)
+                record['rows_out'] = len(processed_df)
+            stats['memory'] = {'before_bytes': bytes_before, 'after_bytes': DataProcessor.memory_usage_bytes(processed_df)}
         
-        return processed_df, stats
\ No newline at end of file
+        return processed_df, stats
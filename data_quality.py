@@ -0,0 +1,241 @@
+"""
+Normalization of categorical columns against canonical vocabularies, with a data-quality report.
+
+Every distinct value of a column is resolved once and falls in one of these classes:
+
+    valid         already a canonical value
+    normalized    a canonical value or synonym once case, accents, spacing and punctuation are
+                  folded, or an exact spelling such as a country code
+    matched       resolved by the vocabulary's resolver, or the closest canonical spelling by difflib
+    unrecognized  kept as it was
+    missing       null, nothing left after folding, or a placeholder such as 'N/A' or 'Unknown'
+
+Resolver and fuzzy results are kept in a persistent memo, so a dirty value seen in an
+earlier upload costs a dictionary lookup instead of another match.
+"""
+import difflib
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Counters of a column report, one per class above
+REPORT_COUNTS = ['rows', 'missing', 'valid', 'normalized', 'matched', 'unrecognized']
+
+
+def fold(value) -> str:
+    """Fold case, accents, spacing and punctuation so 'Pre-Seed' and 'pre seed ' compare equal."""
+    folded = unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^0-9a-z]', '', folded.lower())
+
+
+class NormalizationMemo:
+    """
+    Values resolved by matching, per vocabulary digest, shared by the process and persisted
+    as JSON at `path` (in memory only without one). Unresolvable values are remembered too.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Optional[str]]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Optional[str]]]:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, digest: str) -> Dict[str, Optional[str]]:
+        with self._lock:
+            return dict(self._entries.get(digest, {}))
+
+    def update(self, digest: str, resolved: Dict[str, Optional[str]]) -> None:
+        """Remember new results and write the memo through to disk."""
+        with self._lock:
+            self._entries.setdefault(digest, {}).update(resolved)
+            if not self.path:
+                return
+            # Written to a temporary file and swapped in, so a reader never sees a partial memo
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                # The memo is an optimization; an unwritable path only costs repeated matching
+                pass
+
+
+@functools.lru_cache(maxsize=4)
+def get_memo(path: Optional[str]) -> NormalizationMemo:
+    """The memo stored at path, loaded once per process."""
+    return NormalizationMemo(path)
+
+
+class Vocabulary:
+    """
+    Canonical values of a column and the spellings that fold onto them. Exact spellings
+    are only matched as written ('NO' is Norway, 'No' is not), and placeholders fold to
+    missing. Values that fold onto nothing go to the resolver (a batch callable returning
+    a canonical value or None per input), then to fuzzy matching when enabled.
+    """
+
+    # Minimum difflib similarity of folded spellings; 'Seris A' -> 'Series A' passes, 'Series C' -> 'Series A' does not
+    FUZZY_CUTOFF = 0.88
+
+    # Shorter folded values are too ambiguous to fuzzy-match
+    MIN_FUZZY_LENGTH = 4
+
+    def __init__(self, column: str, values: List[str], synonyms: Optional[Dict[str, str]] = None,
+                 fuzzy: bool = True, resolver: Optional[Callable[[List], List[Optional[str]]]] = None,
+                 missing: Optional[List[str]] = None, exact: Optional[Dict[str, str]] = None):
+        self.column = column
+        self.values = set(values)
+        self.fuzzy = fuzzy
+        self.resolver = resolver
+        self.missing = {fold(placeholder) for placeholder in missing or []}
+        self.exact = dict(exact or {})
+        # The first canonical value folding to a key wins, so 'Preseed' normalizes to 'Pre Seed'
+        self.lookup: Dict[str, str] = {}
+        for value in values:
+            self.lookup.setdefault(fold(value), value)
+        for synonym, value in (synonyms or {}).items():
+            self.lookup.setdefault(fold(synonym), value)
+        # Placeholders win over any spelling that folds the same way
+        for key in self.missing:
+            self.lookup.pop(key, None)
+        self._candidates = [key for key in self.lookup if len(key) >= self.MIN_FUZZY_LENGTH]
+
+        spec = json.dumps([column, sorted(self.lookup.items()), fuzzy, self.FUZZY_CUTOFF,
+                           getattr(resolver, '__qualname__', None), sorted(self.missing), sorted(self.exact.items())])
+        self.digest = hashlib.sha256(spec.encode()).hexdigest()
+
+    def is_missing(self, value) -> bool:
+        """Whether a value falls in the missing class: null, nothing left after folding, or a placeholder."""
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return True
+        key = fold(value)
+        return not key or key in self.missing
+
+    def resolve(self, values: List, memo: NormalizationMemo) -> Tuple[List, List[str]]:
+        """
+        Target value and class for each distinct value: the canonical value, the value
+        itself when unrecognized, or None when missing.
+        """
+        targets, kinds = [None] * len(values), ['missing'] * len(values)
+        pending: Dict[str, List[int]] = {}
+        known = memo.get(self.digest)
+        for position, value in enumerate(values):
+            if value is None or (not isinstance(value, str) and pd.isna(value)):
+                continue
+            if value in self.values:
+                targets[position], kinds[position] = value, 'valid'
+                continue
+            exact = self.exact.get(str(value).strip())
+            if exact is not None:
+                targets[position], kinds[position] = exact, 'normalized'
+                continue
+            key = fold(value)
+            if not key or key in self.missing:
+                continue
+            if key in self.lookup:
+                targets[position], kinds[position] = self.lookup[key], 'normalized'
+            elif key in known:
+                targets[position], kinds[position] = (known[key], 'matched') if known[key] else (value, 'unrecognized')
+            else:
+                pending.setdefault(key, []).append(position)
+
+        if pending:
+            resolved = self._match(pending, values)
+            memo.update(self.digest, resolved)
+            for key, positions in pending.items():
+                for position in positions:
+                    targets[position], kinds[position] = ((resolved[key], 'matched') if resolved[key]
+                                                          else (values[position], 'unrecognized'))
+        return targets, kinds
+
+    def _match(self, pending: Dict[str, List[int]], values: List) -> Dict[str, Optional[str]]:
+        """Resolver first, in one batch, then fuzzy matching for what it leaves."""
+        resolved = dict.fromkeys(pending)
+        if self.resolver is not None:
+            keys = list(pending)
+            for key, target in zip(keys, self.resolver([values[pending[key][0]] for key in keys])):
+                resolved[key] = target
+        if self.fuzzy:
+            for key in pending:
+                if resolved[key] is None and len(key) >= self.MIN_FUZZY_LENGTH:
+                    close = difflib.get_close_matches(key, self._candidates, n=1, cutoff=self.FUZZY_CUTOFF)
+                    if close:
+                        resolved[key] = self.lookup[close[0]]
+        return resolved
+
+
+def empty_report(rows: int = 0) -> dict:
+    """Report of a column with nothing resolved yet."""
+    return {**dict.fromkeys(REPORT_COUNTS, 0), 'rows': rows, 'corrections': {}, 'unrecognized_values': {}}
+
+
+def resolve_counts(vocabulary: Vocabulary, values: List, counts: List[int], missing: int,
+                   memo: NormalizationMemo) -> Tuple[List, dict]:
+    """Targets for distinct non-null values occurring counts times each, and the column report."""
+    targets, kinds = vocabulary.resolve(values, memo)
+    report = empty_report(int(sum(counts)) + missing)
+    report['missing'] = missing
+    for value, target, kind, count in zip(values, targets, kinds, counts):
+        report[kind] += int(count)
+        if kind == 'matched':
+            report['corrections'][str(value)] = target
+        elif kind == 'unrecognized':
+            report['unrecognized_values'][str(value)] = int(count)
+    return targets, report
+
+
+def normalize_series(series: pd.Series, vocabulary: Vocabulary, memo: NormalizationMemo) -> Tuple[pd.Series, dict]:
+    """Normalize a column through its distinct values; a column with nothing to change is returned as is."""
+    codes, uniques = pd.factorize(series)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    targets, report = resolve_counts(vocabulary, list(uniques), counts.tolist(), int((codes < 0).sum()), memo)
+    if report['normalized'] == 0 and report['matched'] == 0 and report['missing'] == series.isna().sum():
+        return series, report
+
+    # Missing values have code -1, which picks the trailing missing value
+    values = np.append(np.array(targets, dtype=object), None)[codes]
+    normalized = pd.Series(values, index=series.index, name=series.name)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        normalized = normalized.astype('category')
+    elif series.dtype != object and pd.api.types.is_string_dtype(series.dtype):
+        normalized = normalized.astype(series.dtype)
+    return normalized, report
+
+
+def merge_reports(left: dict, right: dict) -> dict:
+    """Combine the reports of two disjoint sets of rows, column by column."""
+    merged = {}
+    for column in list(left) + [column for column in right if column not in left]:
+        if column not in left or column not in right:
+            report = left.get(column) or right[column]
+            merged[column] = {**report, 'corrections': dict(report['corrections']),
+                              'unrecognized_values': dict(report['unrecognized_values'])}
+            continue
+        a, b = left[column], right[column]
+        unrecognized = dict(a['unrecognized_values'])
+        for value, count in b['unrecognized_values'].items():
+            unrecognized[value] = unrecognized.get(value, 0) + count
+        merged[column] = {
+            **{count: a[count] + b[count] for count in REPORT_COUNTS},
+            'corrections': {**a['corrections'], **b['corrections']},
+            'unrecognized_values': unrecognized
+        }
+    return merged
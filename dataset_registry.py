@@ -0,0 +1,370 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+class DatasetEntry:
+    """One processed dataset held for the sessions viewing it, in memory or spilled to disk."""
+
+    def __init__(self, dataset_key: str, processed_df: 'pd.DataFrame', stats: dict, cube: 'pd.DataFrame', size: int,
+                 record_keys: Optional['np.ndarray'] = None):
+        self.dataset_key = dataset_key
+        self.processed_df = processed_df
+        self.stats = stats
+        self.cube = cube
+        self.size = size
+        # Sorted record keys of the rows, kept once an append has computed them
+        self.record_keys = record_keys
+        # Values derived from the rows (filtered slices, exports, row orders), by name
+        self.derived = {}
+        self.sessions = set()
+        self.last_access = time.time()
+        self.spilled = False
+        # (processed_df, stats, cube) taken out for a spill still being written; usable until it is
+        self.pending: Optional[Tuple['pd.DataFrame', dict, 'pd.DataFrame']] = None
+
+    @property
+    def resident(self) -> bool:
+        return self.processed_df is not None
+
+
+class DatasetRegistry:
+    """
+    Processed datasets of every session of the app, held once per dataset key under a
+    host-wide memory budget. Sessions viewing the same dataset share one entry. When the
+    resident entries exceed the budget, the least recently used ones are spilled to disk
+    (or evicted without a spill directory) and reloaded when their session comes back.
+    Entries no session refers to any more are dropped, as are sessions idle past session_ttl.
+    Spill files are written and read outside the registry lock, so other sessions never wait on them.
+    Values derived from a dataset are held with it and count against the same budget; they
+    are the first to go when it is exceeded, as rebuilding one is cheaper than a reload.
+    """
+
+    def __init__(self, max_bytes: int = 2 * 1024 ** 3, spill_dir: Optional[str] = None,
+                 session_ttl: float = 12 * 3600):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.session_ttl = session_ttl
+        self.spills = 0
+        self.reloads = 0
+        self.evictions = 0
+        self._entries: Dict[str, DatasetEntry] = {}
+        # Session id -> (dataset key, last seen)
+        self._sessions: Dict[str, Tuple[str, float]] = {}
+        # (dataset key, name) -> bytes of every derived value, least recently used first
+        self._derived: 'OrderedDict[Tuple[str, Hashable], int]' = OrderedDict()
+        # Session id -> dataset key of the sessions released for idleness, most recent last
+        self._expired: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def entry_size(processed_df: 'pd.DataFrame', cube: 'pd.DataFrame', record_keys: Optional['np.ndarray'] = None) -> int:
+        """Approximate in-memory footprint of a dataset, its cube and its record keys."""
+        size = processed_df.memory_usage(deep=True).sum() + cube.memory_usage(deep=True).sum()
+        return int(size + (record_keys.nbytes if record_keys is not None else 0))
+
+    @staticmethod
+    def value_size(value: Any) -> int:
+        """Approximate in-memory footprint of a derived value: frames, arrays, bytes or tuples of them."""
+        if isinstance(value, tuple):
+            return sum(DatasetRegistry.value_size(item) for item in value)
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if hasattr(value, 'memory_usage'):
+            usage = value.memory_usage(deep=True)
+            return int(usage.sum() if hasattr(usage, 'sum') else usage)
+        return int(getattr(value, 'nbytes', 0))
+
+    # Idle sessions whose release is remembered for expired()
+    MAX_EXPIRED_SESSIONS = 1000
+
+    def put(self, session_id: str, dataset_key: str, processed_df: 'pd.DataFrame', stats: dict,
+            cube: 'pd.DataFrame', record_keys: Optional['np.ndarray'] = None) -> None:
+        """Make dataset_key the session's dataset; a dataset already held is shared, not stored again."""
+        size = self.entry_size(processed_df, cube, record_keys)
+        with self._lock:
+            entry = self._entries.get(dataset_key)
+            if entry is None:
+                entry = self._entries[dataset_key] = DatasetEntry(dataset_key, processed_df, stats, cube, size,
+                                                                  record_keys)
+            elif not entry.resident:
+                self._restore(entry, processed_df, stats, cube)
+            if record_keys is not None and entry.record_keys is None:
+                entry.record_keys = record_keys
+                entry.size += record_keys.nbytes
+            self._attach(session_id, entry)
+            spills = self._enforce_budget(keep=dataset_key)
+        self._spill(spills)
+
+    def get(self, session_id: str) -> Optional[Tuple['pd.DataFrame', dict, 'pd.DataFrame']]:
+        """
+        (processed_df, stats, cube) of the session's dataset, reloading it if it was spilled.
+        None if the session has no dataset, or it was evicted without a spill copy.
+        """
+        with self._lock:
+            attached = self._sessions.get(session_id)
+            if attached is None:
+                return None
+            entry = self._entries.get(attached[0])
+            if entry is None:
+                return None
+            now = time.time()
+            self._sessions[session_id] = (entry.dataset_key, now)
+            # A session may come back to an entry recreated after its dataset was evicted
+            entry.sessions.add(session_id)
+            entry.last_access = now
+            if entry.resident:
+                return entry.processed_df, entry.stats, entry.cube
+            if entry.pending is not None:
+                # Its spill is still being written, so the rows are still at hand
+                self._restore(entry, *entry.pending)
+                spills = self._enforce_budget(keep=entry.dataset_key)
+                result = entry.processed_df, entry.stats, entry.cube
+            else:
+                spills, result = [], None
+        if result is not None:
+            self._spill(spills)
+            return result
+
+        result = self._read_spill(entry.dataset_key)
+        if result is None:
+            return None
+        with self._lock:
+            if self._entries.get(entry.dataset_key) is not entry:
+                # Dropped while the spill was read; the session still gets its rows
+                return result
+            if not entry.resident:
+                self._restore(entry, *result)
+                self.reloads += 1
+            spills = self._enforce_budget(keep=entry.dataset_key)
+            result = entry.processed_df, entry.stats, entry.cube
+        self._spill(spills)
+        return result
+
+    def held(self, dataset_key: str) -> Optional[Tuple['pd.DataFrame', dict, 'pd.DataFrame']]:
+        """(processed_df, stats, cube) of a dataset already in memory, whichever session holds it."""
+        with self._lock:
+            entry = self._entries.get(dataset_key)
+            if entry is None or not entry.resident:
+                return None
+            entry.last_access = time.time()
+            return entry.processed_df, entry.stats, entry.cube
+
+    def derived(self, session_id: str, name: Hashable, build: Callable[[], Any]) -> Any:
+        """
+        Value derived from the session's dataset, built on first use and held with it under
+        the budget. Without a resident dataset it is built and not kept.
+        """
+        with self._lock:
+            attached = self._sessions.get(session_id)
+            entry = self._entries.get(attached[0]) if attached else None
+            if entry is not None and name in entry.derived:
+                self._derived.move_to_end((entry.dataset_key, name))
+                return entry.derived[name]
+
+        value = build()
+        size = self.value_size(value)
+        with self._lock:
+            # The dataset may have been replaced, spilled or dropped while the value was built
+            if (entry is None or self._entries.get(entry.dataset_key) is not entry or not entry.resident
+                    or name in entry.derived):
+                return value
+            entry.derived[name] = value
+            entry.size += size
+            self._derived[(entry.dataset_key, name)] = size
+            spills = self._enforce_budget(keep=entry.dataset_key)
+        self._spill(spills)
+        return value
+
+    def record_keys(self, session_id: str) -> Optional['np.ndarray']:
+        """Sorted record keys of the session's dataset, or None until an append has computed them."""
+        with self._lock:
+            attached = self._sessions.get(session_id)
+            entry = self._entries.get(attached[0]) if attached else None
+            return entry.record_keys if entry is not None and entry.resident else None
+
+    def dataset_key(self, session_id: str) -> Optional[str]:
+        """Key of the dataset the session refers to, whether or not it is still held."""
+        with self._lock:
+            attached = self._sessions.get(session_id)
+            return attached[0] if attached else None
+
+    def expired(self, session_id: str) -> Optional[str]:
+        """Key of the dataset of a session released for idleness, reported once; None otherwise."""
+        with self._lock:
+            return self._expired.pop(session_id, None)
+
+    def release(self, session_id: str) -> None:
+        """Forget a session; its dataset is dropped once no other session refers to it."""
+        with self._lock:
+            self._detach(session_id)
+
+    def usage(self) -> dict:
+        """Totals and per-session usage for monitoring; a shared dataset counts fully for each of its sessions."""
+        now = time.time()
+        with self._lock:
+            resident = [entry for entry in self._entries.values() if entry.resident]
+            sessions = {}
+            for session_id, (dataset_key, last_seen) in self._sessions.items():
+                entry = self._entries.get(dataset_key)
+                sessions[session_id] = {
+                    'dataset_key': dataset_key,
+                    'bytes': entry.size if entry is not None and entry.resident else 0,
+                    'state': 'evicted' if entry is None else 'resident' if entry.resident else 'spilled',
+                    'shared_with': len(entry.sessions) - 1 if entry is not None else 0,
+                    'idle_seconds': now - last_seen
+                }
+            return {
+                'bytes': sum(entry.size for entry in resident),
+                'derived_bytes': sum(self._derived.values()),
+                'max_bytes': self.max_bytes,
+                'datasets': len(self._entries),
+                'resident': len(resident),
+                'spilled': sum(entry.spilled and not entry.resident for entry in self._entries.values()),
+                'spills': self.spills,
+                'reloads': self.reloads,
+                'evictions': self.evictions,
+                'sessions': sessions
+            }
+
+    def _attach(self, session_id: str, entry: DatasetEntry) -> None:
+        previous = self._sessions.get(session_id)
+        if previous is not None and previous[0] != entry.dataset_key:
+            self._detach(session_id)
+        self._sessions[session_id] = (entry.dataset_key, time.time())
+        entry.sessions.add(session_id)
+        entry.last_access = time.time()
+
+    def _detach(self, session_id: str) -> None:
+        attached = self._sessions.pop(session_id, None)
+        if attached is None:
+            return
+        entry = self._entries.get(attached[0])
+        if entry is None:
+            return
+        entry.sessions.discard(session_id)
+        if not entry.sessions:
+            self._drop_derived(entry)
+            del self._entries[entry.dataset_key]
+            self._remove_spill(entry.dataset_key)
+
+    def _restore(self, entry: DatasetEntry, processed_df: 'pd.DataFrame', stats: dict, cube: 'pd.DataFrame') -> None:
+        entry.processed_df, entry.stats, entry.cube = processed_df, stats, cube
+        entry.pending = None
+
+    def _enforce_budget(self, keep: str) -> list:
+        """
+        Drop idle sessions, then derived values, then spill or evict the least recently used entries.
+        Entries to spill are taken out of memory here; the returned (entry, rows) pairs go to _spill
+        once the lock is released.
+        """
+        now = time.time()
+        for session_id, (dataset_key, last_seen) in list(self._sessions.items()):
+            if now - last_seen > self.session_ttl:
+                self._detach(session_id)
+                self._expired[session_id] = dataset_key
+                if len(self._expired) > self.MAX_EXPIRED_SESSIONS:
+                    self._expired.popitem(last=False)
+
+        total = sum(entry.size for entry in self._entries.values() if entry.resident)
+        # Derived values go first, least recently used first, whichever dataset they belong to
+        while total > self.max_bytes and self._derived:
+            (dataset_key, name), size = self._derived.popitem(last=False)
+            entry = self._entries[dataset_key]
+            del entry.derived[name]
+            entry.size -= size
+            total -= size
+
+        # The entry the caller is about to use stays in memory even if it alone exceeds the budget
+        candidates = sorted((entry for entry in self._entries.values() if entry.resident and entry.dataset_key != keep),
+                            key=lambda entry: entry.last_access)
+        spills = []
+        for entry in candidates:
+            if total <= self.max_bytes:
+                break
+            total -= entry.size
+            self._drop_derived(entry)
+            if not self.spill_dir:
+                # Sessions still pointing at an evicted dataset see it as gone and reload it
+                del self._entries[entry.dataset_key]
+                self.evictions += 1
+                continue
+            if entry.spilled:
+                # The spill file from last time still holds these rows
+                self.spills += 1
+            else:
+                entry.pending = (entry.processed_df, entry.stats, entry.cube)
+                spills.append((entry, entry.pending))
+            # Record keys are not spilled; the next append derives them from the rows again
+            if entry.record_keys is not None:
+                entry.size -= entry.record_keys.nbytes
+            entry.processed_df = entry.stats = entry.cube = entry.record_keys = None
+        return spills
+
+    def _spill(self, spills: list) -> None:
+        """Write the rows taken out by _enforce_budget, outside the lock; an entry whose write fails is evicted."""
+        for entry, rows in spills:
+            written = self._write_spill(entry.dataset_key, rows)
+            with self._lock:
+                current = self._entries.get(entry.dataset_key) is entry
+                if entry.pending is rows:
+                    entry.pending = None
+                    if current and not written:
+                        del self._entries[entry.dataset_key]
+                        self.evictions += 1
+                        continue
+                if written and current:
+                    entry.spilled = True
+                    self.spills += 1
+                elif written and entry.dataset_key not in self._entries:
+                    # Dropped while the file was written, which _detach could not remove yet
+                    self._remove_spill(entry.dataset_key)
+
+    def _drop_derived(self, entry: DatasetEntry) -> None:
+        for name in entry.derived:
+            entry.size -= self._derived.pop((entry.dataset_key, name))
+        entry.derived = {}
+
+    def _spill_path(self, dataset_key: str) -> str:
+        return os.path.join(self.spill_dir, f"{dataset_key}.pkl")
+
+    def _write_spill(self, dataset_key: str, rows: Tuple['pd.DataFrame', dict, 'pd.DataFrame']) -> bool:
+        # Write to a temporary file first so a reload never sees a partial spill
+        path = self._spill_path(dataset_key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return False
+        return True
+
+    def _read_spill(self, dataset_key: str) -> Optional[Tuple['pd.DataFrame', dict, 'pd.DataFrame']]:
+        if not self.spill_dir:
+            return None
+        try:
+            with open(self._spill_path(dataset_key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _remove_spill(self, dataset_key: str) -> None:
+        if self.spill_dir:
+            try:
+                os.remove(self._spill_path(dataset_key))
+            except OSError:
+                pass
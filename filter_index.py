@@ -0,0 +1,56 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    """
+    Dictionary-encoded dimension columns of a processed dataset, built once per dataset.
+    Each dimension is stored as compact integer codes plus its distinct values, so a
+    filter is a lookup-table gather per dimension and a boolean intersection across
+    dimensions, without touching the string columns again.
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensions: List[str]):
+        self.size = len(df)
+        self.dimensions = [dim for dim in dimensions if dim in df.columns]
+        self._codes = {}
+        self._values = {}
+        self._lookup = {}
+        for dim in self.dimensions:
+            try:
+                codes, values = pd.factorize(df[dim], sort=True)
+            except TypeError:
+                # Mixed value types cannot be sorted; keep first-seen order instead
+                codes, values = pd.factorize(df[dim])
+            self._codes[dim] = codes.astype(np.int32)
+            self._values[dim] = list(values)
+            self._lookup[dim] = {value: position for position, value in enumerate(self._values[dim])}
+
+    def options(self, dim: str) -> list:
+        """Distinct non-missing values of a dimension, sorted where possible."""
+        return self._values[dim]
+
+    def mask(self, selections: Dict[str, list]) -> np.ndarray:
+        """Boolean row mask for {dimension: allowed values}; empty selections do not filter."""
+        mask = np.ones(self.size, dtype=bool)
+        for dim, selected in selections.items():
+            if dim not in self._codes or not selected:
+                continue
+            # One slot per value plus a trailing False for missing values (code -1)
+            allowed = np.zeros(len(self._values[dim]) + 1, dtype=bool)
+            for value in selected:
+                position = self._lookup[dim].get(value)
+                if position is not None:
+                    allowed[position] = True
+            mask &= allowed[self._codes[dim]]
+        return mask
+
+    def positions(self, selections: Dict[str, list]) -> np.ndarray:
+        """Row positions matching every selection."""
+        return np.flatnonzero(self.mask(selections))
+
+    def memory_bytes(self) -> int:
+        """Size of the encoded code arrays."""
+        return sum(codes.nbytes for codes in self._codes.values())
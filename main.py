@@ -1,12 +1,755 @@
+import os
+import uuid
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from data_processor import DataProcessor
+from background import JobRunner, ProcessingJob
+from dataset_registry import DatasetRegistry
+from profiler import StageProfiler, configure_logging
+from result_cache import ResultCache
+from snapshot_store import SnapshotStore
 
 # We'll use the processed data for all visualizations instead of loading a separate dataset
 
+# pandas, plotly and DataProcessor are imported inside the functions that use them,
+# so the login page renders without loading the data stack
+
+# Define color scheme for rocket types
+COLOR_SCHEME = {
+    'W': '#8db3da',  # Soft blue
+    'X': '#f4b183',  # Soft orange
+    'Y': '#a8d5a7',  # Soft green
+    'Z': '#f8a0a0'   # Soft red
+}
+
+@st.cache_resource
+def get_result_cache():
+    """
+    Result cache shared by every session, on disk under COIQ_CACHE_DIR. It keeps nothing in
+    memory: results in memory are the datasets of the registry, counted once in its budget.
+    """
+    return ResultCache(max_bytes=0, disk_dir=os.environ.get('COIQ_CACHE_DIR') or None)
+
+@st.cache_resource
+def get_dataset_registry():
+    """
+    Processed datasets of every session, deduplicated and held under one memory budget
+    (COIQ_MEMORY_BUDGET bytes). Idle datasets over the budget spill to COIQ_SPILL_DIR,
+    or are evicted when it is not set.
+    """
+    return DatasetRegistry(max_bytes=int(os.environ.get('COIQ_MEMORY_BUDGET', 2 * 1024 ** 3)),
+                           spill_dir=os.environ.get('COIQ_SPILL_DIR') or None,
+                           session_ttl=float(os.environ.get('COIQ_SESSION_TTL', 12 * 3600)))
+
+def session_dataset():
+    """
+    Key, rows, stats and cube of this session's dataset, or None before the first upload.
+    A dataset evicted to free memory, or released after the session sat idle, is restored
+    from its snapshot when there is one.
+    """
+    registry = get_dataset_registry()
+    session_id = st.session_state.session_id
+    dataset_key = registry.dataset_key(session_id) or registry.expired(session_id)
+    if dataset_key is None:
+        return None
+    dataset = registry.get(session_id)
+    if dataset is None:
+        store = get_snapshot_store()
+        meta = store.find(dataset_key) if store is not None else None
+        if meta is None:
+            registry.release(session_id)
+            st.session_state.job_messages = [('warning', "Your dataset was unloaded to free memory; "
+                                                         "please process the file again")]
+            return None
+        dataset = store.load(meta['id'])
+        registry.put(session_id, dataset_key, *dataset)
+    return (dataset_key, *dataset)
+
+@st.cache_resource
+def setup_profile_logging():
+    """Route stage profiles to COIQ_PROFILE_LOG (a file path, or '-' for stderr) once per process."""
+    configure_logging(os.environ.get('COIQ_PROFILE_LOG'))
+
+def profile_table(summary):
+    """Stage summary as a table for the debug panel."""
+    import pandas as pd
+    table = pd.DataFrame(summary, columns=['stage', 'calls', 'seconds', 'rows_in', 'rows_out', 'process_rss_delta_bytes'])
+    table['ms'] = (table.pop('seconds') * 1000).round(1)
+    table['process_rss_delta_mb'] = (table.pop('process_rss_delta_bytes') / 1024 ** 2).round(2)
+    return table
+
+def render_debug_panel(profiler):
+    """Stage timings of the last processing run and of this render, for admins (COIQ_DEBUG_PANEL=1)."""
+    st.subheader("🛠️ Debug")
+    if st.toggle("View stage profile", key="show_debug_panel"):
+        with st.container(border=True):
+            st.markdown("**Last processing run**")
+            if st.session_state.get('processing_profile'):
+                st.dataframe(profile_table(st.session_state.processing_profile), use_container_width=True)
+            else:
+                st.caption("No file processed in this session yet")
+            st.markdown("**This render**")
+            st.dataframe(profile_table(profiler.summary()), use_container_width=True)
+            render_memory_usage()
+
+def quality_table(report):
+    """Per-column counts of a data-quality report as a table."""
+    import pandas as pd
+    return pd.DataFrame.from_dict({column: {count: counts[count] for count in
+                                            ['rows', 'valid', 'normalized', 'matched', 'unrecognized', 'missing']}
+                                   for column, counts in report.items()}, orient='index')
+
+def render_data_quality(stats):
+    """How the normalization pass cleaned the upload: counts per column, corrections and unrecognised values."""
+    import pandas as pd
+    report = stats.get('quality')
+    st.subheader("🧹 Data Quality")
+    if not report:
+        st.caption("No data-quality report for this dataset")
+        return
+    if not st.toggle("View Data Quality Report", key="show_data_quality"):
+        return
+    with st.container(border=True):
+        st.caption("Rows per outcome for the whole dataset; Type covers every uploaded row, "
+                   "the other columns the For Profit rows")
+        st.dataframe(quality_table(report), use_container_width=True)
+        corrections = [(column, value, target) for column, counts in report.items()
+                       for value, target in counts['corrections'].items()]
+        if corrections:
+            st.markdown("**Matched values**")
+            st.dataframe(pd.DataFrame(corrections, columns=['Column', 'Value', 'Matched to']),
+                         use_container_width=True, hide_index=True)
+        unrecognized = [(column, value, count) for column, counts in report.items()
+                        for value, count in counts['unrecognized_values'].items()]
+        if unrecognized:
+            st.markdown("**Unrecognised values** (kept as uploaded)")
+            st.dataframe(pd.DataFrame(unrecognized, columns=['Column', 'Value', 'Rows'])
+                         .sort_values('Rows', ascending=False), use_container_width=True, hide_index=True)
+
+def render_memory_usage():
+    """Shared dataset memory against its budget, with the footprint of every session."""
+    import pandas as pd
+    usage = get_dataset_registry().usage()
+    st.markdown(f"**Dataset memory**: {usage['bytes'] / 1024 ** 2:.1f} MB of {usage['max_bytes'] / 1024 ** 2:.0f} MB · "
+                f"{usage['resident']} resident, {usage['spilled']} spilled, "
+                f"{usage['derived_bytes'] / 1024 ** 2:.1f} MB of filtered views and exports · "
+                f"{usage['spills']} spills, {usage['reloads']} reloads, {usage['evictions']} evictions")
+    sessions = pd.DataFrame.from_dict(usage['sessions'], orient='index')
+    if not sessions.empty:
+        sessions['mb'] = (sessions.pop('bytes') / 1024 ** 2).round(1)
+        sessions['idle_seconds'] = sessions['idle_seconds'].round()
+        sessions['dataset_key'] = sessions['dataset_key'].str[:12]
+        sessions.index = [session_id[:8] + (' (this session)' if session_id == st.session_state.session_id else '')
+                          for session_id in sessions.index]
+        st.dataframe(sessions, use_container_width=True)
+
+@st.cache_resource
+def get_snapshot_store():
+    """
+    Snapshot store shared by every session, under COIQ_STORE_DIR (default ~/.coiq/snapshots),
+    keeping the newest COIQ_STORE_KEEP snapshots (default 20; 0 keeps all of them).
+    Setting COIQ_STORE_DIR to an empty value, or a missing pyarrow, turns snapshots off.
+    """
+    from data_processor import DataProcessor
+    root = os.environ.get('COIQ_STORE_DIR', os.path.join(os.path.expanduser('~'), '.coiq', 'snapshots'))
+    if not root or 'parquet' not in DataProcessor.available_export_formats():
+        return None
+    return SnapshotStore(root, keep=int(os.environ.get('COIQ_STORE_KEEP', 20)) or None)
+
+@st.cache_resource(max_entries=16)
+def load_snapshot_cube(snapshot_id, _store):
+    """Stored count cube of a snapshot, all a comparison needs."""
+    return _store.load_cube(snapshot_id)
+
+@st.cache_resource(max_entries=16)
+def build_snapshot_comparison(before_id, after_id, dim, _comparison):
+    """Grouped bar chart of two snapshots' counts per value of a dimension."""
+    import plotly.express as px
+    long = _comparison[['before', 'after']].reset_index(names=dim).melt(id_vars=dim, var_name='Snapshot', value_name='Count')
+    return px.bar(long, x=dim, y='Count', color='Snapshot', barmode='group', title=f"{dim} before and after")
+
+def render_snapshots(store):
+    """Load a saved snapshot into the session, or compare two snapshots through their stored cubes."""
+    from data_processor import DataProcessor
+    snapshots = store.list()
+    st.subheader("🗂️ Snapshots")
+    if not snapshots:
+        st.caption("Every processed dataset is saved here as a snapshot")
+        return
+    if not st.toggle("View Saved Snapshots", key="show_snapshots"):
+        return
+
+    # Newest first
+    labels = {meta['id']: f"v{meta['version']} · {meta['name']} · {meta['rows']:,} startups · {meta['created']}"
+              for meta in reversed(snapshots)}
+    with st.container(border=True):
+        select_col, button_col = st.columns([3, 1])
+        with select_col:
+            selected = st.selectbox("Snapshot", list(labels), format_func=labels.get, key="snapshot_selected")
+        with button_col:
+            if st.button("Load Snapshot", key="load_snapshot", use_container_width=True):
+                dataset_key = next(meta['dataset_key'] for meta in snapshots if meta['id'] == selected)
+                # Sessions loading the same snapshot share one copy; the stored cube feeds the charts directly
+                registry = get_dataset_registry()
+                if registry.dataset_key(st.session_state.session_id) != dataset_key:
+                    registry.put(st.session_state.session_id, dataset_key, *store.load(selected))
+                st.rerun()
+
+        if len(snapshots) > 1:
+            st.markdown("**Compare Snapshots**")
+            ids = list(labels)
+            before_col, after_col, dim_col = st.columns(3)
+            with before_col:
+                before_id = st.selectbox("Before", ids, index=1, format_func=labels.get, key="snapshot_before")
+            with after_col:
+                after_id = st.selectbox("After", ids, index=0, format_func=labels.get, key="snapshot_after")
+            before_cube = load_snapshot_cube(before_id, store)
+            after_cube = load_snapshot_cube(after_id, store)
+            dims = [dim for dim in DataProcessor.CUBE_DIMENSIONS if dim in before_cube.columns and dim in after_cube.columns]
+            if not dims:
+                st.warning("These snapshots have no dimension in common.")
+                return
+            with dim_col:
+                dim = st.selectbox("Compare by", dims, index=dims.index('Final Label') if 'Final Label' in dims else 0,
+                                   key="snapshot_dim")
+            comparison = DataProcessor.compare_cubes(before_cube, after_cube, dim)
+            st.plotly_chart(build_snapshot_comparison(before_id, after_id, dim, comparison), use_container_width=True)
+            st.dataframe(comparison, use_container_width=True)
+
+@st.cache_resource(max_entries=32)
+def get_filter_index(dataset_key, _processed_df):
+    """Encoded filter dimensions of a processed dataset, built once per dataset key."""
+    from data_processor import DataProcessor
+    from filter_index import FilterIndex
+    return FilterIndex(_processed_df, DataProcessor.FILTER_DIMENSIONS)
+
+def render_filters(dataset_key, processed_df):
+    """Sidebar multiselects for the filter dimensions; the selection is kept in the session."""
+    index = get_filter_index(dataset_key, processed_df)
+    filter_labels = {'Final Label': 'Rocket Type'}
+    st.sidebar.header("🔎 Filters")
+    selections = {}
+    for dim in index.dimensions:
+        key = f"filter_{dim}"
+        options = index.options(dim)
+        # Values missing from a newly loaded dataset are dropped from the selection
+        if key in st.session_state:
+            st.session_state[key] = [value for value in st.session_state[key] if value in options]
+        selected = st.sidebar.multiselect(filter_labels.get(dim, dim), options, key=key)
+        if selected:
+            selections[dim] = selected
+    st.session_state.filter_selections = selections
+
+def filtered_dataset(dataset_key, selections, processed_df, cube):
+    """
+    Rows and count cube matching the filter selection, sliced through the filter index.
+    The slice is held with the session's dataset, under the registry's memory budget.
+    """
+    from data_processor import DataProcessor
+
+    def build():
+        positions = get_filter_index(dataset_key, processed_df).positions(selections)
+        return processed_df.iloc[positions], DataProcessor.filter_cube(cube, selections)
+    return get_dataset_registry().derived(st.session_state.session_id,
+                                          ('filtered', repr(sorted(selections.items()))), build)
+
+@st.cache_resource
+def get_job_runner():
+    """Background worker pool shared by every session, sized by COIQ_WORKERS."""
+    return JobRunner(max_workers=int(os.environ.get('COIQ_WORKERS', 2)))
+
+def process_upload(job, data, file_name, dataset_key, compact, stream, result_cache, profiler, store=None, existing=None,
+                   registry=None):
+    """
+    Process an uploaded file on a background worker. This runs outside the script thread,
+    so it never touches the session: progress goes to the job and the result is returned
+    for the session to pick up. `existing` holds the current dataset when appending.
+    An upload some session already holds in the registry is taken from there.
+    With a snapshot store, the result is also saved as a new snapshot; the snapshot of an
+    append only writes the appended rows.
+    """
+    import io
+    from data_processor import DataProcessor
+    source = io.BytesIO(data)
+    fmt = DataProcessor.detect_format(source, file_name)
+
+    def report_chunk(rows, chunks):
+        job.report(rows=rows, chunks=chunks, bytes_read=source.tell())
+
+    def report_stage(stage, done):
+        job.report(stage=stage, done=done)
+
+    if existing is not None:
+        # Only the new rows are processed and merged into the existing dataset
+        job.report(stage="Reading file")
+        with profiler.stage('read_input', format=fmt) as record:
+            df = DataProcessor.read_input(source, fmt)
+            record['rows_out'] = len(df)
+        job.report(stage="Processing new rows", rows=len(df), bytes_read=len(data))
+        # The dataset's key index is only read here and replaced once the run completes,
+        # so a cancelled run leaves it intact
+        record_keys = existing['record_keys']
+        if record_keys is None:
+            record_keys = DataProcessor.sorted_record_keys(existing['processed_df'])
+        processed_df, stats, appended, record_keys = DataProcessor.append_processed(
+            existing['processed_df'], existing['stats'], df, record_keys, compact=compact, profiler=profiler,
+            progress=report_stage)
+        job.report(stage="Updating charts")
+        cube = DataProcessor.merge_cubes(existing['cube'], DataProcessor.build_cube(appended))
+        result = {'dataset_key': dataset_key, 'processed_df': processed_df, 'stats': stats, 'cube': cube,
+                  'record_keys': record_keys, 'appended': len(appended)}
+        return save_snapshot(job, store, file_name, result, profiler, base_key=existing['dataset_key'], delta=appended)
+
+    # Identical uploads are served from memory when a session holds them, else from the cache on disk
+    held = registry.held(dataset_key) if registry is not None else None
+    if held is not None:
+        result = dict(zip(('processed_df', 'stats', 'cube'), held), dataset_key=dataset_key)
+        return save_snapshot(job, store, file_name, result, profiler)
+    cached = result_cache.get(dataset_key)
+    if cached is not None:
+        processed_df, stats = cached
+    elif stream and fmt == 'csv':
+        job.report(stage="Processing chunks")
+        processed_df, stats = DataProcessor.process_csv_chunked(source, compact=compact, profiler=profiler,
+                                                                progress=report_chunk)
+        result_cache.put(dataset_key, processed_df, stats)
+    else:
+        job.report(stage="Reading file")
+        with profiler.stage('read_input', format=fmt) as record:
+            df = DataProcessor.read_input(source, fmt)
+            record['rows_out'] = len(df)
+        job.report(stage="Processing", rows=len(df), bytes_read=len(data))
+        processed_df, stats = DataProcessor.process_csv(df, compact=compact, profiler=profiler,
+                                                        progress=report_stage)
+        result_cache.put(dataset_key, processed_df, stats)
+    job.report(stage="Updating charts")
+    with profiler.stage('cube', len(processed_df)):
+        cube = DataProcessor.build_cube(processed_df)
+    result = {'dataset_key': dataset_key, 'processed_df': processed_df, 'stats': stats, 'cube': cube}
+    return save_snapshot(job, store, file_name, result, profiler)
+
+def save_snapshot(job, store, name, result, profiler, base_key=None, delta=None):
+    """
+    Persist a finished result as a snapshot; a failed save is reported but keeps the result.
+    Appends pass the key of the dataset they extend and the appended rows (delta).
+    """
+    from data_processor import DataProcessor
+    if store is not None:
+        job.report(stage="Saving snapshot")
+        try:
+            with profiler.stage('snapshot', len(result['processed_df']) if delta is None else len(delta)):
+                result['snapshot'] = store.save(name, result['dataset_key'], result['processed_df'], result['stats'],
+                                                result['cube'], DataProcessor.classifier_version(),
+                                                base_key=base_key, delta=delta)
+        except (OSError, ValueError) as e:
+            result['snapshot_error'] = str(e)
+    job.report(stage="Done")
+    result['profile'] = profiler.summary()
+    return result
+
+def apply_finished_job():
+    """
+    Move the result of a finished background run into the session. Until then the
+    previous dataset stays in place and keeps rendering.
+    """
+    job = st.session_state.get('processing_job')
+    if job is None or not job.finished:
+        return
+    del st.session_state['processing_job']
+    if job.status == 'cancelled':
+        st.session_state.job_messages = [('info', "Processing cancelled; the previous dataset is unchanged")]
+        return
+    if job.status == 'failed':
+        st.session_state.job_messages = [('error', f"Error processing the file: {job.error}"),
+                                         ('warning', "Please make sure your file has the required format.")]
+        return
+
+    result = job.result
+    # The worker already built the cube, incrementally for appends, so it is registered with the rows;
+    # appends also carry the key index of the combined dataset, which is kept with it
+    get_dataset_registry().put(st.session_state.session_id, result['dataset_key'], result['processed_df'],
+                               result['stats'], result['cube'], result.get('record_keys'))
+    st.session_state.processing_profile = result['profile']
+    if 'appended' in result:
+        messages = [('success', f"✅ Added {result['appended']:,} new startups to the dataset")]
+    else:
+        messages = [('success', "✅ Your data has been processed successfully!")]
+
+    # Encode the filter dimensions with the dataset, ahead of the first filter change
+    get_filter_index(result['dataset_key'], result['processed_df'])
+    stats = result['stats']
+    if 'memory' in stats:
+        messages.append(('caption', f"Memory: {stats['memory']['before_bytes'] / 1024 ** 2:.1f} MB → "
+                                    f"{stats['memory']['after_bytes'] / 1024 ** 2:.1f} MB"))
+    if stats.get('quality'):
+        cleaned = sum(counts['normalized'] + counts['matched'] for counts in stats['quality'].values())
+        unrecognized = sum(counts['unrecognized'] for counts in stats['quality'].values())
+        messages.append(('caption', f"Data quality: {cleaned:,} values cleaned, {unrecognized:,} unrecognised"))
+    cache_stats = get_result_cache().stats()
+    messages.append(('caption', f"Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses"))
+    if 'snapshot' in result:
+        messages.append(('caption', f"Saved as snapshot v{result['snapshot']['version']}"))
+    elif 'snapshot_error' in result:
+        messages.append(('warning', f"Could not save a snapshot: {result['snapshot_error']}"))
+    st.session_state.job_messages = messages
+
+@st.fragment(run_every=1.0)
+def render_job_progress():
+    """Progress and cancel button of the background run, refreshed without rerunning the page."""
+    job = st.session_state.get('processing_job')
+    if job is None:
+        return
+    if job.finished:
+        # A full rerun picks up the result
+        st.rerun()
+    fraction = job.fraction
+    details = f"{job.rows:,} rows" + (f" in {job.chunks:,} chunks" if job.chunks else "")
+    st.progress(fraction or 0.0, text=f"🔄 {job.description}: {job.stage} ({details})")
+    if st.button("Cancel", key=f"cancel_job_{job.id}", use_container_width=True):
+        job.cancel()
+        st.caption("Cancelling after the current step…")
+
+def current_view(dataset_key, processed_df, cube):
+    """Key, rows and count cube of this session's dataset after the sidebar filters."""
+    selections = st.session_state.get('filter_selections') or {}
+    # The unfiltered dataset is not memoized, so only the registry holds on to it
+    if not selections:
+        return dataset_key, processed_df, cube
+    df, cube = filtered_dataset(dataset_key, selections, processed_df, cube)
+    # Outputs memoized per key must not mix filtered and unfiltered results
+    return ResultCache.make_key(repr(sorted(selections.items())).encode(), dataset_key), df, cube
+
+def build_export(dataset_key, view, fmt, df, column_map=None):
+    """Serialized download for one view of a dataset, generated only when requested and held with the dataset."""
+    from data_processor import DataProcessor
+    return get_dataset_registry().derived(st.session_state.session_id, ('export', dataset_key, view, fmt),
+                                          lambda: DataProcessor.export_bytes(DataProcessor.project(df, column_map), fmt))
+
+def render_export(dataset_key, df, view, file_stem, label, column_map=None):
+    """Format picker and download button; the file is built on request and cached per dataset."""
+    from data_processor import DataProcessor
+    export_labels = {'csv': 'CSV', 'parquet': 'Parquet (zstd)', 'arrow': 'Arrow IPC (zstd)'}
+    export_col, button_col = st.columns([1, 1])
+    with export_col:
+        fmt = st.selectbox("Export format", DataProcessor.available_export_formats(),
+                           format_func=export_labels.get, key=f"export_format_{view}")
+    
+    request_key = f"export_requested_{view}"
+    with button_col:
+        if st.button(f"Prepare {label} export", key=f"prepare_export_{view}", use_container_width=True):
+            st.session_state[request_key] = (dataset_key, fmt)
+        
+        if st.session_state.get(request_key) == (dataset_key, fmt):
+            extension, mime = DataProcessor.EXPORT_FORMATS[fmt]
+            st.download_button(label=f"📥 Download {label} {export_labels[fmt]}",
+                               data=build_export(dataset_key, view, fmt, df, column_map),
+                               file_name=f"{file_stem}.{extension}",
+                               mime=mime,
+                               use_container_width=True)
+
+# Columns of the cleaned view, in display order
+CLEANED_COLUMNS = ['Name', 'Country', 'Gender', 'Region', 'Sector', 'MVP?', '<2 years?', 'Have Traction?', 'Stage', 'Fund level', 'Type', 'rocket_type']
+
+def cleaned_column_map(df):
+    """Cleaned view as a column projection: {source column: display name}."""
+    column_map = {col: col for col in CLEANED_COLUMNS if col in df.columns}
+    
+    # If 'Final Label' exists but 'rocket_type' doesn't, show it as rocket_type
+    if column_map and 'Final Label' in df.columns and 'rocket_type' not in column_map:
+        column_map['Final Label'] = 'rocket_type'
+    return column_map
+
+def dataset_row_order(dataset_key, view, query, sort_by, ascending, df, columns):
+    """Positions of the rows matching the search, in display order, held with the dataset per query and sort."""
+    from data_processor import DataProcessor
+
+    def build():
+        return DataProcessor.sort_positions(df, DataProcessor.search_positions(df, query, columns), sort_by, ascending)
+    return get_dataset_registry().derived(st.session_state.session_id,
+                                          ('row_order', dataset_key, view, query, sort_by, ascending), build)
+
+def render_dataset_viewer(dataset_key, df, view, column_map=None):
+    """
+    Paginated table with server-side search and sorting. Only the visible page is
+    sliced out and sent to the browser.
+    """
+    from data_processor import DataProcessor
+    column_map = column_map or {col: col for col in df.columns}
+    display_to_source = {display: source for source, display in column_map.items()}
+    
+    search_col, sort_col, order_col, size_col = st.columns([2, 2, 1, 1])
+    with search_col:
+        query = st.text_input("Search", key=f"viewer_search_{view}", placeholder="Filter rows containing…").strip()
+    with sort_col:
+        sort_display = st.selectbox("Sort by", ["(original order)"] + list(display_to_source), key=f"viewer_sort_{view}")
+    with order_col:
+        ascending = st.radio("Order", ["Ascending", "Descending"], key=f"viewer_order_{view}") == "Ascending"
+    with size_col:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1, key=f"viewer_page_size_{view}")
+    
+    sort_by = display_to_source.get(sort_display)
+    order = dataset_row_order(dataset_key, view, query, sort_by, ascending, df, list(column_map))
+    
+    page_count = max(1, -(-len(order) // page_size))
+    page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key=f"viewer_page_{view}")
+    start = (min(page, page_count) - 1) * page_size
+    page_positions = order[start:start + page_size]
+    
+    st.dataframe(DataProcessor.project(df.iloc[page_positions], column_map), use_container_width=True)
+    st.caption(f"Rows {start + 1 if len(order) else 0:,}–{start + len(page_positions):,} of {len(order):,}"
+               + (f" matching “{query}”" if query else "") + f" ({len(df):,} total)")
+
+# Figures are memoized per dataset key, so a rerun triggered by an unrelated widget reuses them
+
+@st.cache_resource(max_entries=32)
+def build_distribution_figures(dataset_key, _cube):
+    """Overall rocket type bar and pie charts."""
+    import plotly.express as px
+    from data_processor import DataProcessor
+    label_counts = DataProcessor.cube_value_counts(_cube, 'Final Label')
+    df_counts = label_counts.reset_index()
+    df_counts.columns = ['Rocket Type', 'Count']
+
+    bar_fig = px.bar(df_counts,
+                     x='Rocket Type',
+                     y='Count',
+                     title="Overall Rocket Type Distribution",
+                     color='Rocket Type',
+                     color_discrete_map=COLOR_SCHEME)
+
+    pie_fig = px.pie(
+        values=label_counts,
+        names=label_counts.index,
+        title="Rocket Type Breakdown",
+        color=label_counts.index,
+        color_discrete_map=COLOR_SCHEME)
+    return bar_fig, pie_fig
+
+# Grid cell size in degrees for each map detail level
+MAP_BIN_DEGREES = {'Coarse': 10.0, 'Medium': 2.0, 'Fine': 0.5}
+
+# Above this many cells the map switches from markers to a density layer
+MAP_POINT_LIMIT = 1500
+
+@st.cache_resource(max_entries=32)
+def build_map_figure(dataset_key, detail, _processed_df):
+    """Global distribution map, aggregated on the server into grid cells."""
+    import plotly.express as px
+    from data_processor import DataProcessor
+    # Count startups per grid cell, broken down by rocket type
+    bins = DataProcessor.map_bins(_processed_df, MAP_BIN_DEGREES[detail])
+    label_columns = [col for col in bins.columns if col not in ('latitude', 'longitude', 'Total', 'Dominant')]
+
+    if len(bins) > MAP_POINT_LIMIT:
+        fig = px.density_mapbox(
+            bins,
+            lat='latitude',
+            lon='longitude',
+            z='Total',
+            hover_data=label_columns,
+            radius=20,
+            zoom=1.5,
+            title="Startup Density"
+        )
+    else:
+        fig = px.scatter_mapbox(
+            bins,
+            lat='latitude',
+            lon='longitude',
+            size='Total',
+            color='Dominant' if 'Dominant' in bins.columns else None,
+            color_discrete_map=COLOR_SCHEME,
+            color_discrete_sequence=['red'],
+            hover_data=label_columns,
+            size_max=40,
+            zoom=1.5,
+            title="Startup Distribution"
+        )
+    
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        mapbox=dict(
+            center=dict(lat=20, lon=0),
+            zoom=1.5
+        ),
+        legend_title="Dominant Rocket Type"
+    )
+    return fig
+
+@st.cache_resource(max_entries=32)
+def build_country_section(dataset_key, _cube):
+    """Stacked bar chart and frequency table of rocket types by country."""
+    import plotly.express as px
+    from data_processor import DataProcessor
+    # Create a pivot table for country and rocket type
+    country_counts = DataProcessor.cube_counts(_cube, ['Country', 'Final Label']).rename(columns={'count': 'Count'})
+    
+    # Sort countries by total count to show most frequent first
+    country_totals = country_counts.groupby('Country', observed=True)['Count'].sum().sort_values(ascending=False)
+    top_countries = country_totals.head(15).index.tolist()
+    
+    # Filter for top countries only to keep chart readable
+    filtered_counts = country_counts[country_counts['Country'].isin(top_countries)]
+    
+    # Create stacked bar chart
+    fig = px.bar(
+        filtered_counts,
+        x='Country',
+        y='Count',
+        color='Final Label',
+        title="Rocket Type Distribution by Country (Top 15)",
+        color_discrete_map=COLOR_SCHEME,
+        category_orders={"Country": top_countries}
+    )
+    
+    fig.update_layout(
+        xaxis_title="Country",
+        yaxis_title="Number of Startups",
+        legend_title="Rocket Type"
+    )
+    
+    # Create the frequency table
+    pivot_table = country_counts.pivot_table(
+        index='Country', 
+        columns='Final Label', 
+        values='Count',
+        aggfunc='sum', 
+        fill_value=0,
+        observed=True
+    ).reset_index()
+    
+    # Add total column
+    if 'W' in pivot_table.columns:
+        pivot_table['Total'] = pivot_table['W']
+        if 'X' in pivot_table.columns:
+            pivot_table['Total'] += pivot_table['X']
+        if 'Y' in pivot_table.columns:
+            pivot_table['Total'] += pivot_table['Y']
+        if 'Z' in pivot_table.columns:
+            pivot_table['Total'] += pivot_table['Z']
+    
+    # Sort by total
+    pivot_table = pivot_table.sort_values('Total', ascending=False)
+    return fig, pivot_table
+
+@st.cache_resource(max_entries=32)
+def build_insight_figures(dataset_key, _cube):
+    """Figures for the Additional Insights section, keyed by chart."""
+    import plotly.express as px
+    from data_processor import DataProcessor
+    figures = {}
+    columns = _cube.columns
+
+    if 'Sector' in columns:
+        # Sector distribution
+        figures['sector'] = px.bar(
+            DataProcessor.cube_value_counts(_cube, 'Sector').head(10),
+            title="Top 10 Sectors"
+        )
+
+        # Rocket Type distribution by Sector
+        if 'Final Label' in columns:
+            # Get top sectors
+            top_sectors = DataProcessor.cube_value_counts(_cube, 'Sector').head(5).index.tolist()
+            # Counts for top sectors only
+            sector_data = DataProcessor.cube_counts(_cube, ['Sector', 'Final Label'], where={'Sector': top_sectors})
+            # Create grouped bar chart
+            figures['sector_rocket_top'] = px.bar(
+                sector_data,
+                x='Sector', 
+                y='count',
+                color='Final Label',
+                color_discrete_map=COLOR_SCHEME,
+                title="Rocket Type Distribution by Top Sectors"
+            )
+
+    # Funding distribution
+    if 'Fund level' in columns:
+        fund_counts = DataProcessor.cube_value_counts(_cube, 'Fund level')
+        figures['funding'] = px.pie(
+            values=fund_counts,
+            names=fund_counts.index,
+            title="Distribution of Funding Levels"
+        )
+
+    # Gender distribution
+    if 'Gender' in columns:
+        gender_counts = DataProcessor.cube_value_counts(_cube, 'Gender')
+        figures['gender'] = px.pie(
+            values=gender_counts,
+            names=gender_counts.index,
+            title="Gender Distribution"
+        )
+
+    # Rocket Type by Region if available
+    if 'Region' in columns and 'Final Label' in columns:
+        # Rocket Type Distribution by Region
+        figures['region'] = px.bar(
+            DataProcessor.cube_counts(_cube, ['Region', 'Final Label']),
+            x='Region',
+            y='count',
+            color='Final Label',
+            color_discrete_map=COLOR_SCHEME,
+            title="Rocket Type Distribution by Region"
+        )
+
+        if 'Sector' in columns:
+            # Rocket Type and Sector Distribution by Region, limited to top sectors to keep it readable
+            top_sectors = DataProcessor.cube_value_counts(_cube, 'Sector').head(5).index.tolist()
+            figures['sector_region'] = px.bar(
+                DataProcessor.cube_counts(_cube, ['Region', 'Sector'], where={'Sector': top_sectors}),
+                x='Region',
+                y='count',
+                color='Sector',
+                title="Top Sectors Distribution by Region"
+            )
+
+            # Get top sectors
+            top_sectors = DataProcessor.cube_value_counts(_cube, 'Sector').head(10).index.tolist()
+            # Roll the top sectors up by region once; each region chart below is a slice of it
+            region_sector_counts = DataProcessor.cube_counts(_cube, ['Region', 'Sector', 'Final Label'], where={'Sector': top_sectors})
+            
+            # Create grouped bar chart with Sectors on x-axis, counts as y-axis, and rocket types as colors
+            figures['sector_rocket'] = px.bar(
+                DataProcessor.cube_counts(region_sector_counts, ['Sector', 'Final Label']),
+                x='Sector',
+                y='count',
+                color='Final Label',
+                color_discrete_map=COLOR_SCHEME,
+                title="Rocket Type Distribution by Sector",
+                labels={'count': 'Number of Startups', 'Sector': 'Sector', 'Final Label': 'Rocket Type'},
+                category_orders={"Sector": top_sectors}
+            )
+            
+            # Improve layout
+            figures['sector_rocket'].update_layout(
+                legend_title="Rocket Type",
+                xaxis_tickangle=-45,  # Angle the x-axis labels for better readability
+                height=500
+            )
+            
+            # One chart per region with sectors on x-axis
+            figures['regions'] = []
+            for region, region_counts in region_sector_counts.groupby('Region', sort=False, observed=True):
+                if len(region_counts) > 0:
+                    fig_region = px.bar(
+                        region_counts.drop(columns='Region'),
+                        x='Sector',
+                        y='count',
+                        color='Final Label',
+                        color_discrete_map=COLOR_SCHEME,
+                        title=f"Rocket Type Distribution in {region}",
+                        labels={'count': 'Number of Startups', 'Sector': 'Sector'},
+                        category_orders={"Sector": top_sectors}
+                    )
+                    
+                    fig_region.update_layout(
+                        legend_title="Rocket Type",
+                        xaxis_tickangle=-45,
+                        height=400
+                    )
+                    figures['regions'].append(fig_region)
+
+    return figures
+
 def main():
     st.set_page_config(page_title="COIQ",
                        page_icon="🚀",
@@ -59,6 +802,13 @@ def main():
         return  # Stop execution until authenticated
         
     # Continue with the main app only if authenticated
+    from data_processor import DataProcessor
+
+    # Every stage of this run is profiled; records carry the session so logs can be aggregated
+    setup_profile_logging()
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    profiler = StageProfiler(session=st.session_state.session_id)
 
     # Custom CSS for styling
     st.markdown("""
@@ -94,37 +844,48 @@ def main():
     st.markdown("<h1 class='main-header' style='text-align: center;'>C O I Q</h1>", unsafe_allow_html=True)
     st.markdown('###')
 
-    # Define color scheme for rocket types
-    color_scheme = {
-        'W': '#8db3da',  # Soft blue
-        'X': '#f4b183',  # Soft orange
-        'Y': '#a8d5a7',  # Soft green
-        'Z': '#f8a0a0'   # Soft red
-    }
-
     # Simple header with minimal instructions
     st.markdown("### Please upload your data file below to begin analysis")
     
+    # A finished background run replaces the dataset before anything is rendered
+    apply_finished_job()
+    dataset = session_dataset()
+
+    # Sidebar filters re-slice the stats and every chart below
+    if dataset is not None:
+        render_filters(*dataset[:2])
+
     # Create three columns for the top section
     upload_col, process_col, stats_col = st.columns([1, 1, 1])
 
     # File Upload Section (Left)
     with upload_col:
         st.subheader("📤 Upload Data")
-        uploaded_file = st.file_uploader("Choose a CSV file", type="csv", 
+        # Every extension is offered; formats missing an optional package fail with a clear error
+        uploaded_file = st.file_uploader("Choose a data file", type=[ext for exts in DataProcessor.INPUT_FORMATS.values() for ext in exts],
                                         help="File should have columns: Name, Country, Gender, Region, Sector, 'MVP?', '<2 years?', Stage, 'Fund level', 'Have Traction?', Type, and 'rocket_type' (or 'Final Label')")
         
         # Provide information about the expected file format
-        st.caption("Your file should contain columns for: Name, Country, Gender, Region, Sector, etc.")
+        st.caption("Your file should contain columns for: Name, Country, Gender, Region, Sector, etc. "
+                   "CSV, Parquet, Excel (.xlsx) and JSON Lines files are accepted.")
+        
+        # Streaming keeps peak memory bounded for very large uploads
+        stream_upload = st.checkbox("Process large file in chunks", value=False,
+                                    help=f"Reads CSV files {DataProcessor.DEFAULT_CHUNKSIZE:,} rows at a time")
+        compact_mode = st.checkbox("Compact memory mode", value=False,
+                                   help="Stores repeated values such as Country and Sector as categories to cut memory use")
+        append_mode = dataset is not None and st.checkbox(
+            "Append to current dataset", value=False,
+            help="Processes only the new file and adds startups not already present (matched by Name and Country)")
 
     # Stats Summary Section (Right)
     with stats_col:
         st.subheader("📊 Key Stats")
-        if 'processed_data' in st.session_state:
-            df = st.session_state.processed_data
+        if dataset is not None:
+            _, df, cube = current_view(dataset[0], dataset[1], dataset[3])
             st.metric("Total Startups", len(df))
             if 'Final Label' in df.columns:
-                rocket_counts = df['Final Label'].value_counts().reindex(['W', 'X', 'Y', 'Z']).fillna(0).astype(int)
+                rocket_counts = DataProcessor.cube_value_counts(cube, 'Final Label').reindex(['W', 'X', 'Y', 'Z']).fillna(0).astype(int)
 
                 # Display rocket types in pairs
                 col1, col2 = st.columns(2)
@@ -144,367 +905,205 @@ def main():
     # Process Button (Center)
     with process_col:
         st.subheader("🚀 Process Data")
+        job = st.session_state.get('processing_job')
         if uploaded_file is not None:
-            if st.button("Process Uploaded File", use_container_width=True):
-                with st.spinner("🔄 Processing your data..."):
-                    # Load and process the uploaded data
-                    try:
-                        df = pd.read_csv(uploaded_file)
-                        processed_df, stats = DataProcessor.process_csv(df)
-
-                        # Store in session state
-                        st.session_state.processed_data = processed_df
-                        st.session_state.stats = stats
-                        st.success("✅ Your data has been processed successfully!")
-                    except Exception as e:
-                        st.error(f"Error processing the file: {e}")
-                        st.warning("Please make sure your file has the required format.")
+            if st.button("Process Uploaded File", use_container_width=True, disabled=job is not None):
+                data = uploaded_file.getvalue()
+                # Compact results have different dtypes, so they are cached separately
+                cache_version = f"{DataProcessor.classifier_version()}{':compact' if compact_mode else ''}"
+                dataset_key = ResultCache.make_key(data, cache_version)
+                existing = None
+                if append_mode:
+                    # Appends get a key of their own, derived from the dataset they extend
+                    current_key, current_df, current_stats, current_cube = dataset
+                    dataset_key = ResultCache.make_key(f"{current_key}:{dataset_key}".encode(), cache_version)
+                    # The key index is never modified in place, so the worker can read it as it is
+                    existing = {'dataset_key': current_key, 'processed_df': current_df, 'stats': current_stats,
+                                'cube': current_cube,
+                                'record_keys': get_dataset_registry().record_keys(st.session_state.session_id)}
+                # Processing runs on the shared worker pool; this session keeps rendering meanwhile
+                job = ProcessingJob(f"Processing {uploaded_file.name}", bytes_total=len(data))
+                job_profiler = StageProfiler(session=st.session_state.session_id, dataset=dataset_key)
+                st.session_state.processing_job = get_job_runner().submit(
+                    job, process_upload, data, uploaded_file.name, dataset_key, compact_mode, stream_upload,
+                    get_result_cache(), job_profiler, get_snapshot_store(), existing, get_dataset_registry())
         else:
             # No initial data loading - wait for user upload
-            if 'processed_data' not in st.session_state:
+            if dataset is None and job is None:
                 # Show guidance message
-                st.info("Please upload a CSV file to begin analysis")
+                st.info("Please upload a data file to begin analysis")
+        
+        if job is not None:
+            render_job_progress()
+        for kind, message in st.session_state.pop('job_messages', []):
+            getattr(st, kind)(message)
+
+    # Saved snapshots can be reloaded or compared without reprocessing
+    store = get_snapshot_store()
+    if store is not None:
+        render_snapshots(store)
 
     # Visualization Section
-    if 'processed_data' in st.session_state:
+    if dataset is not None:
+        # Every chart below is a slice of the pre-aggregated count cube, narrowed by the filters
+        with profiler.stage('filter_view', len(dataset[1])) as record:
+            dataset_key, df, cube = current_view(dataset[0], dataset[1], dataset[3])
+            record['rows_out'] = len(df)
+        profiler.context['dataset'] = dataset_key
+        
         st.markdown("<div class='section-container'>", unsafe_allow_html=True)
         st.subheader("📈 Rocket Type Distribution")
         viz_col1, viz_col2 = st.columns([2, 1])
 
-        with viz_col1:
-            if 'Final Label' in st.session_state.processed_data.columns:
-                # Create bar chart with consistent colors
-                df_counts = st.session_state.processed_data['Final Label'].value_counts().reset_index()
-                df_counts.columns = ['Rocket Type', 'Count']
-
-                fig = px.bar(df_counts,
-                              x='Rocket Type',
-                              y='Count',
-                              title="Overall Rocket Type Distribution",
-                              color='Rocket Type',
-                              color_discrete_map=color_scheme)
-                st.plotly_chart(fig, use_container_width=True)
-
-        with viz_col2:
-            if 'Final Label' in st.session_state.processed_data.columns:
-                # Create pie chart with the same color scheme
-                fig = px.pie(
-                    values=st.session_state.processed_data['Final Label'].value_counts(),
-                    names=st.session_state.processed_data['Final Label'].value_counts().index,
-                    title="Rocket Type Breakdown",
-                    color=st.session_state.processed_data['Final Label'].value_counts().index,
-                    color_discrete_map=color_scheme)
-                st.plotly_chart(fig, use_container_width=True)
+        if 'Final Label' in df.columns:
+            with profiler.stage('chart:distribution', len(cube)):
+                bar_fig, pie_fig = build_distribution_figures(dataset_key, cube)
+            with viz_col1:
+                st.plotly_chart(bar_fig, use_container_width=True)
+            with viz_col2:
+                st.plotly_chart(pie_fig, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
         # Global Map Visualization - Show this first
         st.subheader("🌍 Global Distribution")
-        df = st.session_state.processed_data
+        map_detail = st.select_slider("Map detail", options=list(MAP_BIN_DEGREES), value='Medium',
+                                      help="Size of the grid cells startups are grouped into on the map")
+        with profiler.stage('chart:map', len(df)):
+            map_fig = build_map_figure(dataset_key, map_detail, df)
+        st.plotly_chart(map_fig, use_container_width=True)
         
-        # Count startups per location
-        location_counts = df.groupby(['latitude', 'longitude']).size().reset_index(name='count')
+        # Countries the geocoder could not resolve are left off the map rather than placed at (0, 0)
+        unresolved = dataset[2].get('unresolved_countries', {})
+        if unresolved:
+            st.caption(f"Not shown on the map ({sum(unresolved.values())} startups, unrecognised country): "
+                       + ", ".join(str(name) for name in unresolved))
 
-        fig = px.scatter_mapbox(
-            location_counts,
-            lat='latitude',
-            lon='longitude',
-            size='count',
-            color_discrete_sequence=['red'],
-            size_max=40,
-            zoom=1.5,
-            title="Startup Distribution"
-        )
-        
-        fig.update_layout(
-            mapbox_style="carto-positron",
-            mapbox=dict(
-                center=dict(lat=20, lon=0),
-                zoom=1.5
-            )
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        # Collapsible sections are only built once opened, through a toggle rather than
+        # st.expander, whose content would otherwise be computed on every rerun
 
         # Country Distribution (Stacked Bar Chart) - Collapsed under the map
         st.subheader("📊 Country Analysis")
-        with st.expander("View Country Distribution Chart & Table", expanded=False):
-            # Check if required columns exist before creating visualizations
-            if 'Country' in df.columns and 'Final Label' in df.columns:
-                # Create a pivot table for country and rocket type
-                country_counts = df.groupby(['Country', 'Final Label']).size().reset_index(name='Count')
-                
-                # Sort countries by total count to show most frequent first
-                country_totals = country_counts.groupby('Country')['Count'].sum().sort_values(ascending=False)
-                top_countries = country_totals.head(15).index.tolist()
-                
-                # Filter for top countries only to keep chart readable
-                filtered_counts = country_counts[country_counts['Country'].isin(top_countries)]
-                
-                # Create stacked bar chart
-                fig = px.bar(
-                    filtered_counts,
-                    x='Country',
-                    y='Count',
-                    color='Final Label',
-                    title="Rocket Type Distribution by Country (Top 15)",
-                    color_discrete_map=color_scheme,
-                    category_orders={"Country": top_countries}
-                )
-                
-                fig.update_layout(
-                    xaxis_title="Country",
-                    yaxis_title="Number of Startups",
-                    legend_title="Rocket Type"
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Country Distribution Table
-                st.subheader("📋 Frequency Table of Rockets by Country")
-                
-                # Create the frequency table
-                pivot_table = df.pivot_table(
-                    index='Country', 
-                    columns='Final Label', 
-                    aggfunc='size', 
-                    fill_value=0
-                ).reset_index()
-                
-                # Add total column
-                if 'W' in pivot_table.columns:
-                    pivot_table['Total'] = pivot_table['W']
-                    if 'X' in pivot_table.columns:
-                        pivot_table['Total'] += pivot_table['X']
-                    if 'Y' in pivot_table.columns:
-                        pivot_table['Total'] += pivot_table['Y']
-                    if 'Z' in pivot_table.columns:
-                        pivot_table['Total'] += pivot_table['Z']
-                
-                # Sort by total
-                pivot_table = pivot_table.sort_values('Total', ascending=False)
-                
-                # Display the table
-                st.dataframe(pivot_table, use_container_width=True)
-            else:
-                st.warning("Required columns 'Country' and 'Final Label' not found in the data.")
+        if st.toggle("View Country Distribution Chart & Table", key="show_country_analysis"):
+            with st.container(border=True):
+                # Check if required columns exist before creating visualizations
+                if 'Country' in df.columns and 'Final Label' in df.columns:
+                    with profiler.stage('chart:country', len(cube)):
+                        fig, pivot_table = build_country_section(dataset_key, cube)
+                    st.plotly_chart(fig, use_container_width=True)
+                    
+                    # Country Distribution Table
+                    st.subheader("📋 Frequency Table of Rockets by Country")
+                    st.dataframe(pivot_table, use_container_width=True)
+                else:
+                    st.warning("Required columns 'Country' and 'Final Label' not found in the data.")
 
         # Labeled Dataset View (Bottom)
+        render_data_quality(dataset[2])
+
         st.subheader("🔍 Detailed Results")
-        with st.expander("View Processed Dataset", expanded=False):
-            # Create tabs for different views of the data
-            tab1, tab2 = st.tabs(["Full Dataset", "Cleaned Data"])
-            
-            with tab1:
-                st.dataframe(st.session_state.processed_data,
-                              use_container_width=True)
-
-                # Download button for processed data
-                csv = st.session_state.processed_data.to_csv(index=False)
-                st.download_button(label="📥 Download Full Dataset CSV",
-                                    data=csv,
-                                    file_name="processed_startups.csv",
-                                    mime="text/csv",
-                                    use_container_width=True)
-            
-            with tab2:
-                # Define the columns to show in the cleaned version
-                cleaned_columns = ['Name', 'Country', 'Gender', 'Region', 'Sector', 'MVP?', '<2 years?', 'Have Traction?', 'Stage', 'Fund level', 'Type', 'rocket_type']
+        if st.toggle("View Processed Dataset", key="show_detailed_results"):
+            with st.container(border=True):
+                # Create tabs for different views of the data
+                tab1, tab2 = st.tabs(["Full Dataset", "Cleaned Data"])
                 
-                # Create cleaned dataframe with only the specified columns that exist in the data
-                available_columns = [col for col in cleaned_columns if col in st.session_state.processed_data.columns]
+                with tab1:
+                    render_dataset_viewer(dataset_key, df, "full")
+
+                    # Download for processed data
+                    render_export(dataset_key, df, "full", "processed_startups", "Full Dataset")
                 
-                if available_columns:
-                    cleaned_df = st.session_state.processed_data[available_columns].copy()
+                with tab2:
+                    # The cleaned view is a projection of the processed data, not a copy
+                    column_map = cleaned_column_map(df)
                     
-                    # If 'Final Label' exists but 'rocket_type' doesn't, add rocket_type column
-                    if 'Final Label' in st.session_state.processed_data.columns and 'rocket_type' not in cleaned_df.columns:
-                        cleaned_df['rocket_type'] = st.session_state.processed_data['Final Label']
-                    
-                    st.dataframe(cleaned_df, use_container_width=True)
-                    
-                    # Download button for cleaned data
-                    cleaned_csv = cleaned_df.to_csv(index=False)
-                    st.download_button(label="📥 Download Cleaned Data CSV",
-                                        data=cleaned_csv,
-                                        file_name="cleaned_startups.csv",
-                                        mime="text/csv",
-                                        use_container_width=True)
-                else:
-                    st.warning("No matching columns found for the cleaned data view.")
+                    if column_map:
+                        render_dataset_viewer(dataset_key, df, "cleaned", column_map)
+                        
+                        # Download for cleaned data
+                        render_export(dataset_key, df, "cleaned", "cleaned_startups", "Cleaned Data", column_map)
+                    else:
+                        st.warning("No matching columns found for the cleaned data view.")
                                 
         # Additional Visualizations section
         st.subheader("📊 Additional Insights")
-        with st.expander("View Additional Visualizations", expanded=False):
-            # Use the same processed data
-            df = st.session_state.processed_data
-            
-            # Overall statistics
-            st.subheader("Overall Statistics")
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("Total Organizations", len(df))
-            with col2:
-                st.metric("Countries", df['Country'].nunique())
-            with col3:
-                st.metric("Sectors", df['Sector'].nunique() if 'Sector' in df.columns else "N/A")
-            with col4:
-                st.metric("MVPs", len(df[df['MVP?'] == 'Yes']) if 'MVP?' in df.columns else "N/A")
-            
-            # If the data has the necessary columns, show the additional visualizations
-            if 'Sector' in df.columns:
-                # Sector distribution
-                st.subheader("Sector Analysis")
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    # Sector distribution
-                    fig_sector = px.bar(
-                        df['Sector'].value_counts().head(10),
-                        title="Top 10 Sectors"
-                    )
-                    st.plotly_chart(fig_sector, use_container_width=True)
-                
-                with col2:
-                    # Rocket Type distribution by Sector
-                    if 'Final Label' in df.columns:
-                        # Get top sectors
-                        top_sectors = df['Sector'].value_counts().head(5).index.tolist()
-                        # Filter for top sectors
-                        sector_data = df[df['Sector'].isin(top_sectors)]
-                        # Create grouped bar chart
-                        fig_sector_rocket = px.histogram(
-                            sector_data,
-                            x='Sector', 
-                            color='Final Label',
-                            color_discrete_map=color_scheme,
-                            title="Rocket Type Distribution by Top Sectors"
-                        )
-                        st.plotly_chart(fig_sector_rocket, use_container_width=True)
-            
-            # Funding and Gender Analysis
-            if any(col in df.columns for col in ['Fund level', 'Gender']):
-                st.subheader("Funding & Gender Analysis")
-                col1, col2 = st.columns(2)
+        if st.toggle("View Additional Visualizations", key="show_additional_insights"):
+            with st.container(border=True):
+                with profiler.stage('chart:insights', len(cube)):
+                    figures = build_insight_figures(dataset_key, cube)
                 
+                # Overall statistics
+                st.subheader("Overall Statistics")
+                col1, col2, col3, col4 = st.columns(4)
                 with col1:
-                    # Funding distribution
-                    if 'Fund level' in df.columns:
-                        fig_funding = px.pie(
-                            df,
-                            names='Fund level',
-                            title="Distribution of Funding Levels"
-                        )
-                        st.plotly_chart(fig_funding, use_container_width=True)
-                    else:
-                        st.info("Funding level data not available")
-                
+                    st.metric("Total Organizations", len(df))
                 with col2:
-                    # Gender distribution
-                    if 'Gender' in df.columns:
-                        fig_gender = px.pie(
-                            df,
-                            names='Gender',
-                            title="Gender Distribution"
-                        )
-                        st.plotly_chart(fig_gender, use_container_width=True)
-                    else:
-                        st.info("Gender data not available")
-                
-            # Rocket Type by Region if available
-            if 'Region' in df.columns and 'Final Label' in df.columns:
-                st.subheader("Regional Analysis")
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    # Rocket Type Distribution by Region
-                    fig_region = px.bar(
-                        df.groupby(['Region', 'Final Label']).size().reset_index(name='count'),
-                        x='Region',
-                        y='count',
-                        color='Final Label',
-                        color_discrete_map=color_scheme,
-                        title="Rocket Type Distribution by Region"
-                    )
-                    st.plotly_chart(fig_region, use_container_width=True)
-                
-                with col2:
-                    # Rocket Type and Sector Distribution by Region
-                    if 'Sector' in df.columns:
-                        # Get top sectors to keep visualization readable
-                        top_sectors = df['Sector'].value_counts().head(5).index.tolist()
-                        # Filter data for top sectors
-                        filtered_df = df[df['Sector'].isin(top_sectors)]
-                        
-                        fig_sector_region = px.bar(
-                            filtered_df.groupby(['Region', 'Sector']).size().reset_index(name='count'),
-                            x='Region',
-                            y='count',
-                            color='Sector',
-                            title="Top Sectors Distribution by Region"
-                        )
-                        st.plotly_chart(fig_sector_region, use_container_width=True)
+                    st.metric("Countries", len(DataProcessor.cube_value_counts(cube, 'Country')))
+                with col3:
+                    st.metric("Sectors", len(DataProcessor.cube_value_counts(cube, 'Sector')) if 'Sector' in df.columns else "N/A")
+                with col4:
+                    st.metric("MVPs", int(DataProcessor.cube_value_counts(cube, 'MVP?').get('Yes', 0)) if 'MVP?' in df.columns else "N/A")
                 
-                # New visualization: Sector distribution by Rocket Type
+                # If the data has the necessary columns, show the additional visualizations
                 if 'Sector' in df.columns:
-                    st.subheader("Sector & Rocket Type Analysis")
+                    # Sector distribution
+                    st.subheader("Sector Analysis")
+                    col1, col2 = st.columns(2)
                     
-                    # Get top sectors
-                    top_sectors = df['Sector'].value_counts().head(10).index.tolist()
-                    # Filter data for top sectors
-                    filtered_df = df[df['Sector'].isin(top_sectors)]
+                    with col1:
+                        st.plotly_chart(figures['sector'], use_container_width=True)
                     
-                    # Create grouped bar chart with Sectors on x-axis, counts as y-axis, and rocket types as colors
-                    fig_sector_rocket = px.bar(
-                        filtered_df.groupby(['Sector', 'Final Label']).size().reset_index(name='count'),
-                        x='Sector',
-                        y='count',
-                        color='Final Label',
-                        color_discrete_map=color_scheme,
-                        title="Rocket Type Distribution by Sector",
-                        labels={'count': 'Number of Startups', 'Sector': 'Sector', 'Final Label': 'Rocket Type'},
-                        category_orders={"Sector": top_sectors}
-                    )
+                    with col2:
+                        # Rocket Type distribution by Sector
+                        if 'sector_rocket_top' in figures:
+                            st.plotly_chart(figures['sector_rocket_top'], use_container_width=True)
+                
+                # Funding and Gender Analysis
+                if any(col in df.columns for col in ['Fund level', 'Gender']):
+                    st.subheader("Funding & Gender Analysis")
+                    col1, col2 = st.columns(2)
                     
-                    # Improve layout
-                    fig_sector_rocket.update_layout(
-                        legend_title="Rocket Type",
-                        xaxis_tickangle=-45,  # Angle the x-axis labels for better readability
-                        height=500
-                    )
+                    with col1:
+                        # Funding distribution
+                        if 'funding' in figures:
+                            st.plotly_chart(figures['funding'], use_container_width=True)
+                        else:
+                            st.info("Funding level data not available")
+                    
+                    with col2:
+                        # Gender distribution
+                        if 'gender' in figures:
+                            st.plotly_chart(figures['gender'], use_container_width=True)
+                        else:
+                            st.info("Gender data not available")
                     
-                    st.plotly_chart(fig_sector_rocket, use_container_width=True)
+                # Rocket Type by Region if available
+                if 'region' in figures:
+                    st.subheader("Regional Analysis")
+                    col1, col2 = st.columns(2)
                     
-                    # Add a second visualization showing sectors by region and rocket type
-                    st.subheader("Sector Analysis by Region")
+                    with col1:
+                        st.plotly_chart(figures['region'], use_container_width=True)
                     
-                    # Create a faceted chart with sectors on x-axis, grouped by region
-                    regions = df['Region'].unique()
-                    for region in regions:
-                        region_df = filtered_df[filtered_df['Region'] == region]
+                    with col2:
+                        if 'sector_region' in figures:
+                            st.plotly_chart(figures['sector_region'], use_container_width=True)
+                    
+                    # Sector distribution by Rocket Type
+                    if 'sector_rocket' in figures:
+                        st.subheader("Sector & Rocket Type Analysis")
+                        st.plotly_chart(figures['sector_rocket'], use_container_width=True)
                         
-                        if len(region_df) > 0:
-                            fig_region = px.bar(
-                                region_df.groupby(['Sector', 'Final Label']).size().reset_index(name='count'),
-                                x='Sector',
-                                y='count',
-                                color='Final Label',
-                                color_discrete_map=color_scheme,
-                                title=f"Rocket Type Distribution in {region}",
-                                labels={'count': 'Number of Startups', 'Sector': 'Sector'},
-                                category_orders={"Sector": top_sectors}
-                            )
-                            
-                            fig_region.update_layout(
-                                legend_title="Rocket Type",
-                                xaxis_tickangle=-45,
-                                height=400
-                            )
-                            
+                        # Sectors by region and rocket type
+                        st.subheader("Sector Analysis by Region")
+                        for fig_region in figures['regions']:
                             st.plotly_chart(fig_region, use_container_width=True)
 
     else:
         # Show placeholder when no file is uploaded
-        st.info("👆 Please upload a CSV file to begin")
+        st.info("👆 Please upload a data file to begin")
+
+    if os.environ.get('COIQ_DEBUG_PANEL'):
+        render_debug_panel(profiler)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import contextlib
+import json
+import logging
+import os
+import time
+from typing import Iterator, List, Optional
+
+# Structured records go to this logger as one JSON object per line
+LOGGER_NAME = 'coiq.profile'
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident memory of this process, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StageProfiler:
+    """
+    Records duration, rows in and out and the change in process RSS for named stages of
+    the pipeline and the dashboard. RSS covers the whole process, so the stages of other
+    sessions running meanwhile show up in it too. Each finished stage is kept in `records` and
+    logged as JSON to the coiq.profile logger, tagged with the profiler's context
+    (such as the session and dataset) so logs can be aggregated across sessions.
+    """
+
+    def __init__(self, **context):
+        self.context = context
+        self.records: List[dict] = []
+        self.logger = logging.getLogger(LOGGER_NAME)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None, **fields) -> Iterator[dict]:
+        """
+        Time the enclosed block. The yielded record can be updated inside the block,
+        typically with rows_out once the stage's output is known.
+        """
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None, **fields}
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            rss_after = current_rss_bytes()
+            record['process_rss_delta_bytes'] = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            self.records.append(record)
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info(json.dumps({'ts': time.time(), **self.context, **record}, default=str))
+
+    def summary(self) -> List[dict]:
+        """Records combined per stage name, in first-seen order; chunked stages add up."""
+        combined = {}
+        for record in self.records:
+            entry = combined.setdefault(record['stage'], {
+                'stage': record['stage'], 'calls': 0, 'seconds': 0.0,
+                'rows_in': None, 'rows_out': None, 'process_rss_delta_bytes': None
+            })
+            entry['calls'] += 1
+            entry['seconds'] += record['seconds']
+            for field in ('rows_in', 'rows_out', 'process_rss_delta_bytes'):
+                if record.get(field) is not None:
+                    entry[field] = (entry[field] or 0) + record[field]
+        return list(combined.values())
+
+
+def profile_stage(profiler: Optional[StageProfiler], name: str, rows_in: Optional[int] = None, **fields):
+    """profiler.stage(...) when profiling is on, otherwise a no-op context yielding a scratch record."""
+    if profiler is None:
+        return contextlib.nullcontext({})
+    return profiler.stage(name, rows_in, **fields)
+
+
+def configure_logging(destination: Optional[str]) -> None:
+    """
+    Send profile records to a file path, or to stderr for '-'. Nothing is logged
+    unless a destination is configured.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    if not destination or logger.handlers:
+        return
+    handler = logging.StreamHandler() if destination == '-' else logging.FileHandler(destination)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class ResultCache:
+    """
+    Content-addressed cache of process_csv results, shared by every session of the app.
+    Entries are keyed by the hash of the uploaded bytes plus the classifier version,
+    kept in memory under an LRU byte budget and optionally written through to disk.
+    With max_bytes=0 the cache is disk-only.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 ** 2, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data: bytes, classifier_version: str) -> str:
+        """Hash the raw upload together with the classifier version."""
+        digest = hashlib.sha256(data)
+        digest.update(classifier_version.encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def entry_size(processed_df: 'pd.DataFrame') -> int:
+        """Approximate in-memory footprint of a cached result."""
+        return int(processed_df.memory_usage(deep=True).sum())
+
+    def get(self, key: str) -> Optional[Tuple['pd.DataFrame', dict]]:
+        """Return the cached (processed_df, stats) for key, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        # Fall back to the disk tier and promote the entry back into memory
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._put_memory(key, result)
+        return result
+
+    def put(self, key: str, processed_df: 'pd.DataFrame', stats: dict) -> None:
+        """Store a result in memory and, if configured, on disk."""
+        result = (processed_df, stats)
+        self._put_memory(key, result)
+        self._write_disk(key, result)
+
+    def stats(self) -> dict:
+        """Counters for monitoring the cache."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def clear(self) -> None:
+        """Drop every in-memory entry; the disk tier is left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def _put_memory(self, key: str, result: Tuple['pd.DataFrame', dict]) -> None:
+        if self.max_bytes <= 0:
+            return
+        size = self.entry_size(result[0])
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+
+            # Results larger than the whole budget are only kept on disk
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = result
+            self._sizes[key] = size
+            self._total_bytes += size
+
+            # Evict least recently used entries until we are back under the cap
+            while self._total_bytes > self.max_bytes:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(evicted_key)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _read_disk(self, key: str) -> Optional[Tuple['pd.DataFrame', dict]]:
+        if not self.disk_dir or not os.path.exists(self._disk_path(key)):
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _write_disk(self, key: str, result: Tuple['pd.DataFrame', dict]) -> None:
+        if not self.disk_dir:
+            return
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            # A full or unwritable disk only costs reprocessing the upload next time
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
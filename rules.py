@@ -0,0 +1,125 @@
+"""
+Rocket type rules, declared in a JSON file and compiled to vectorized masks.
+
+    {
+      "default": "Unknown",
+      "rules": [
+        {"label": "W", "when": {"Fund level": ["Pre Seed", "No Funding"]}},
+        {"label": "X", "when": {"Fund level": ["Seed"], "MVP?": ["Yes"], "Have Traction?": {"not": ["No"]}}}
+      ]
+    }
+
+Rules are tried in order and the first one whose conditions all hold gives the label.
+A condition lists the allowed values of a column, or {"not": [...]} for excluded ones;
+null stands for a missing value. Values are compared after stripping and title-casing
+(normalize_value), so 'series a ' matches "Series A".
+"""
+import functools
+import hashlib
+import json
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_value(value):
+    """Normalized form used on both sides of a comparison; missing values become None."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return str(value).strip().title()
+
+
+class RuleSet:
+    """
+    A compiled rules file. Evaluation factorizes each referenced column once and resolves
+    the rules over the distinct value combinations only; each row then picks its label
+    with a single gather, so no Python code runs per row and extra rules add no per-row work.
+    """
+
+    # Above this many value combinations, rules are evaluated on the rows directly
+    MAX_COMBINATIONS = 1 << 20
+
+    def __init__(self, spec: dict, digest: str):
+        self.digest = digest
+        self.default = spec.get('default', 'Unknown')
+        self.labels: List[str] = []
+        # Per rule: (column, allowed normalized values, negated)
+        self.conditions: List[List[Tuple[str, frozenset, bool]]] = []
+
+        rules = spec.get('rules')
+        if not isinstance(rules, list) or not rules:
+            raise ValueError("Rules file must contain a non-empty 'rules' list")
+        for position, rule in enumerate(rules):
+            if 'label' not in rule or not isinstance(rule.get('when'), dict) or not rule['when']:
+                raise ValueError(f"Rule {position} needs a 'label' and a non-empty 'when' mapping")
+            conditions = []
+            for column, allowed in rule['when'].items():
+                negated = isinstance(allowed, dict)
+                values = allowed.get('not') if negated else allowed
+                if not isinstance(values, list):
+                    raise ValueError(f"Rule {position}: values for {column!r} must be a list or {{'not': [...]}}")
+                conditions.append((column, frozenset(normalize_value(value) for value in values), negated))
+            self.labels.append(str(rule['label']))
+            self.conditions.append(conditions)
+
+        self.columns = sorted({column for conditions in self.conditions for column, _, _ in conditions})
+
+    @staticmethod
+    def from_file(path: str) -> 'RuleSet':
+        """Load a rules file; compilation is cached by the hash of its contents."""
+        with open(path, 'rb') as f:
+            content = f.read()
+        return _compile(hashlib.sha256(content).hexdigest(), content)
+
+    def evaluate(self, df: pd.DataFrame) -> pd.Series:
+        """Label every row of df; rules on columns the frame lacks never match."""
+        present = [column for column in self.columns if column in df.columns]
+        codes, values = [], {}
+        for column in present:
+            column_codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            codes.append(column_codes)
+            values[column] = [normalize_value(value) for value in uniques]
+
+        sizes = [len(values[column]) for column in present]
+        combinations = int(np.prod(sizes, dtype=np.int64))
+        if combinations <= min(self.MAX_COMBINATIONS, max(len(df), 1)):
+            # Label every combination of distinct values, then broadcast through the mixed-radix row code
+            positions = dict(zip(present, np.unravel_index(np.arange(combinations), sizes))) if present else {}
+            table = self._choose(positions, values, combinations)
+            row_code = np.zeros(len(df), dtype=np.int64)
+            for column_codes, size in zip(codes, sizes):
+                row_code = row_code * size + column_codes
+            labels = table[row_code]
+        else:
+            labels = self._choose(dict(zip(present, codes)), values, len(df))
+        return pd.Series(labels, index=df.index)
+
+    def _choose(self, positions: Dict[str, np.ndarray], values: Dict[str, list], size: int) -> np.ndarray:
+        """
+        Label for each of `size` entries, where positions[column] holds each entry's index
+        into values[column]. The first rule whose conditions all hold wins.
+        """
+        masks = []
+        for conditions in self.conditions:
+            mask = np.ones(size, dtype=bool)
+            for column, allowed, negated in conditions:
+                if column not in positions:
+                    mask[:] = False
+                    break
+                lookup = np.array([(value in allowed) != negated for value in values[column]], dtype=bool)
+                mask &= lookup[positions[column]]
+            masks.append(mask)
+
+        # Rule positions (or the default slot) picked per entry, then mapped to labels
+        choice = np.select(masks, np.arange(len(masks)), default=len(masks))
+        return np.array(self.labels + [self.default], dtype=object)[choice]
+
+
+@functools.lru_cache(maxsize=8)
+def _compile(digest: str, content: bytes) -> RuleSet:
+    try:
+        spec = json.loads(content)
+    except ValueError as e:
+        raise ValueError(f"Rules file is not valid JSON: {e}") from e
+    return RuleSet(spec, digest)
@@ -0,0 +1,202 @@
+import contextlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are only serialized within one process
+    fcntl = None
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+
+class SnapshotStore:
+    """
+    Processed datasets kept on disk as versioned snapshots. Each snapshot is a directory
+    holding the processed rows as a partitioned zstd Parquet dataset, their count cube as
+    Parquet and the stats as JSON, so loading one reads precomputed aggregates instead of
+    reprocessing the upload. The snapshot of an append reuses the partitions of the one it
+    extends (hard-linked, so either can be deleted alone) and writes only the new rows.
+    A manifest lists every snapshot with its version number, newest last; beyond `keep`
+    snapshots the oldest are deleted. Changes to the manifest hold a lock file, so several
+    processes (dashboard servers, the stats API) can share one store.
+    """
+
+    MANIFEST = 'snapshots.json'
+
+    # Directory of the row partitions inside a snapshot
+    DATA_DIR = 'data'
+
+    def __init__(self, root: str, keep: Optional[int] = 20):
+        self.root = root
+        self.keep = keep
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _read_manifest(self) -> List[dict]:
+        try:
+            with open(os.path.join(self.root, self.MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    @contextlib.contextmanager
+    def _manifest_lock(self) -> Iterator[None]:
+        """Exclusive right to read, change and write the manifest, across threads and processes."""
+        with self._lock, open(os.path.join(self.root, f"{self.MANIFEST}.lock"), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_manifest(self, snapshots: List[dict]) -> None:
+        # Written to a temporary file and swapped in, so readers never see a partial manifest
+        path = os.path.join(self.root, self.MANIFEST)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(snapshots, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def _path(self, snapshot_id: str, name: str) -> str:
+        return os.path.join(self.root, snapshot_id, name)
+
+    def _data_path(self, snapshot_id: str) -> str:
+        return self._path(snapshot_id, self.DATA_DIR)
+
+    def list(self) -> List[dict]:
+        """Metadata of every snapshot, oldest first."""
+        return self._read_manifest()
+
+    def find(self, dataset_key: str) -> Optional[dict]:
+        """The snapshot of a dataset key, if it was saved before."""
+        return next((meta for meta in self._read_manifest() if meta['dataset_key'] == dataset_key), None)
+
+    def save(self, name: str, dataset_key: str, processed_df: 'pd.DataFrame', stats: dict,
+             cube: 'pd.DataFrame', classifier_version: str, base_key: Optional[str] = None,
+             delta: Optional['pd.DataFrame'] = None) -> dict:
+        """
+        Store a processed dataset as the next version; a dataset saved before is not stored twice.
+        For an append, base_key names the dataset it extends and delta holds the appended rows:
+        when the base is stored, only delta is written, as a new partition after the base's.
+        """
+        with self._manifest_lock():
+            snapshots = self._read_manifest()
+            existing = next((meta for meta in snapshots if meta['dataset_key'] == dataset_key), None)
+            if existing is not None:
+                return existing
+            base = next((meta for meta in snapshots if meta['dataset_key'] == base_key), None) if base_key else None
+
+            snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{dataset_key[:12]}"
+            # Written under a temporary name and renamed, so a failed save leaves no partial snapshot
+            tmp_dir = os.path.join(self.root, f".{snapshot_id}.tmp")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(os.path.join(tmp_dir, self.DATA_DIR))
+            try:
+                parts = self._write_rows(tmp_dir, processed_df, base, delta)
+                cube.to_parquet(os.path.join(tmp_dir, 'cube.parquet'), index=False, compression='zstd')
+                with open(os.path.join(tmp_dir, 'stats.json'), 'w') as f:
+                    json.dump(stats, f, default=str)
+                os.replace(tmp_dir, os.path.join(self.root, snapshot_id))
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+
+            meta = {
+                'id': snapshot_id,
+                'version': max((snapshot['version'] for snapshot in snapshots), default=0) + 1,
+                'name': name,
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'dataset_key': dataset_key,
+                'rows': len(processed_df),
+                'parts': parts,
+                'classifier_version': classifier_version
+            }
+            if base is not None and delta is not None:
+                meta['base'] = base['id']
+            snapshots.append(meta)
+            expired = snapshots[:-self.keep] if self.keep else []
+            self._write_manifest(snapshots[len(expired):])
+        for old in expired:
+            shutil.rmtree(os.path.join(self.root, old['id']), ignore_errors=True)
+        return meta
+
+    def _write_rows(self, directory: str, processed_df: 'pd.DataFrame', base: Optional[dict],
+                    delta: Optional['pd.DataFrame']) -> int:
+        """Row partitions of a new snapshot; returns how many there are."""
+        data_dir = os.path.join(directory, self.DATA_DIR)
+        base_dir = self._path(base['id'], self.DATA_DIR) if base is not None else None
+        if delta is None or base_dir is None or not os.path.isdir(base_dir):
+            processed_df.to_parquet(os.path.join(data_dir, self._part_name(0)), index=False, compression='zstd')
+            return 1
+
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+        base_parts = sorted(os.listdir(base_dir))
+        schema = ds.dataset(base_dir, format='parquet').schema
+        try:
+            # The new partition follows the base's schema, so the dataset reads back as one table
+            table = pa.Table.from_pandas(delta, preserve_index=False).select(schema.names).cast(schema)
+        except (KeyError, ValueError, pa.ArrowException):
+            # Columns changed since the base was saved: the rows are written in full instead
+            processed_df.to_parquet(os.path.join(data_dir, self._part_name(0)), index=False, compression='zstd')
+            return 1
+        for part in base_parts:
+            try:
+                os.link(os.path.join(base_dir, part), os.path.join(data_dir, part))
+            except OSError:
+                shutil.copyfile(os.path.join(base_dir, part), os.path.join(data_dir, part))
+        pq.write_table(table, os.path.join(data_dir, self._part_name(len(base_parts))), compression='zstd')
+        return len(base_parts) + 1
+
+    @staticmethod
+    def _part_name(position: int) -> str:
+        # Zero-padded so the partitions list, and read, in append order
+        return f"part-{position:05d}.parquet"
+
+    def load_cube(self, snapshot_id: str) -> 'pd.DataFrame':
+        """The stored count cube; enough for every chart without touching the rows."""
+        import pandas as pd
+        return pd.read_parquet(self._path(snapshot_id, 'cube.parquet'))
+
+    def load_stats(self, snapshot_id: str) -> dict:
+        with open(self._path(snapshot_id, 'stats.json')) as f:
+            return json.load(f)
+
+    def load(self, snapshot_id: str) -> Tuple['pd.DataFrame', dict, 'pd.DataFrame']:
+        """Rows, stats and cube of a snapshot, with compact categorical columns restored."""
+        import pandas as pd
+        processed_df = pd.read_parquet(self._data_path(snapshot_id))
+        return processed_df, self.load_stats(snapshot_id), self.load_cube(snapshot_id)
+
+    def schema(self, snapshot_id: str) -> 'pa.Schema':
+        """Arrow schema of the stored rows, read from the Parquet metadata alone."""
+        import pyarrow.dataset as ds
+        return ds.dataset(self._data_path(snapshot_id), format='parquet').schema
+
+    def load_page(self, snapshot_id: str, where: Optional[dict], offset: int, limit: int) -> Tuple['pd.DataFrame', int]:
+        """
+        Rows offset to offset+limit of those matching {column: allowed values}, and how many match.
+        The scan stops once the page is filled; without filters the count comes from the Parquet metadata.
+        """
+        import pyarrow.dataset as ds
+        dataset = ds.dataset(self._data_path(snapshot_id), format='parquet')
+        expression = None
+        for column, values in (where or {}).items():
+            condition = ds.field(column).isin(list(values))
+            expression = condition if expression is None else expression & condition
+        page = dataset.head(offset + limit, filter=expression).slice(offset)
+        return page.to_pandas(), dataset.count_rows(filter=expression)
+
+    def delete(self, snapshot_id: str) -> None:
+        with self._manifest_lock():
+            self._write_manifest([meta for meta in self._read_manifest() if meta['id'] != snapshot_id])
+        shutil.rmtree(os.path.join(self.root, snapshot_id), ignore_errors=True)
@@ -0,0 +1,286 @@
+"""
+Read-only HTTP/JSON API over the processed datasets saved as snapshots, so other tools can
+read the dashboard's numbers without going through Streamlit.
+
+    GET /datasets                      every snapshot, oldest first
+    GET /datasets/<ref>                metadata of one snapshot
+    GET /datasets/<ref>/stats          the stats computed by process_csv
+    GET /datasets/<ref>/cube           the count cube, one record per combination
+    GET /datasets/<ref>/slice?dims=Sector&Country=Nigeria&Final+Label=W
+                                       startups matching the filters, counted by dims
+    GET /datasets/<ref>/rows?Country=Nigeria&limit=100&offset=0
+                                       processed rows matching the filters
+
+<ref> is a snapshot id, a dataset key (or a prefix of at least 12 characters of one), or
+'latest'. Any other query parameter filters a column; repeat it to allow several values.
+Filters on /rows are cast to the column's type, so latitude=10 matches 10.0.
+
+Dataset responses carry an ETag derived from the dataset key and the request, so a client
+returning it in If-None-Match gets a 304 before anything is read from disk. Bodies are
+gzip-compressed for clients that accept it.
+
+    python stats_api.py --port 8502
+    python stats_api.py --store /srv/coiq/snapshots --host 0.0.0.0
+"""
+import argparse
+import functools
+import gzip
+import hashlib
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from snapshot_store import SnapshotStore
+
+
+class APIError(Exception):
+    """A request the API refuses, with the HTTP status to answer with."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def to_json(data) -> bytes:
+    """Compact JSON; numpy scalars become plain numbers."""
+    return json.dumps(data, separators=(',', ':'),
+                      default=lambda value: value.item() if hasattr(value, 'item') else str(value)).encode()
+
+
+def frame_records(frame) -> List[dict]:
+    """A frame as JSON-ready records, with missing values as null."""
+    return json.loads(frame.to_json(orient='records'))
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag, as RFC 9110 asks for GET."""
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in tags)
+
+
+class StatsAPI:
+    """
+    Routes requests to snapshot data. Every dataset route is answered with an ETag computed
+    from the dataset key and the normalized query alone, and a renderer producing the body;
+    rendered bodies are memoized, as a snapshot never changes once saved.
+    """
+
+    RESOURCES = ('stats', 'cube', 'slice', 'rows')
+
+    # Rows returned by /rows when the request gives no limit, and the most it may ask for
+    DEFAULT_ROW_LIMIT = 100
+    MAX_ROW_LIMIT = 10_000
+
+    def __init__(self, store: SnapshotStore, cache_entries: int = 64):
+        self.store = store
+        self.render = functools.lru_cache(maxsize=cache_entries)(self._render)
+        self.load_cube = functools.lru_cache(maxsize=16)(store.load_cube)
+
+    def resolve(self, ref: str) -> dict:
+        """Manifest entry of a snapshot id, dataset key or key prefix, or 'latest'."""
+        snapshots = self.store.list()
+        if ref == 'latest' and snapshots:
+            return snapshots[-1]
+        for meta in snapshots:
+            if ref in (meta['id'], meta['dataset_key']):
+                return meta
+        matches = [meta for meta in snapshots if len(ref) >= 12 and meta['dataset_key'].startswith(ref)]
+        if len(matches) == 1:
+            return matches[0]
+        raise APIError(404, f"No snapshot matches {ref!r}")
+
+    def route(self, path: str, query: Dict[str, List[str]]) -> Tuple[str, Callable[[], bytes]]:
+        """ETag and body renderer for a GET request; raises APIError for anything else."""
+        parts = [part for part in path.split('/') if part]
+        if parts == ['datasets']:
+            snapshots = self.store.list()
+            body = to_json(snapshots)
+            return f'W/"{hashlib.sha256(body).hexdigest()[:32]}"', lambda: body
+        if not parts or parts[0] != 'datasets' or len(parts) > 3:
+            raise APIError(404, f"Unknown path {path!r}")
+
+        meta = self.resolve(parts[1])
+        resource = parts[2] if len(parts) == 3 else 'meta'
+        if resource != 'meta' and resource not in self.RESOURCES:
+            raise APIError(404, f"Unknown resource {resource!r}; expected one of {', '.join(self.RESOURCES)}")
+        # Query values keep their order, which matters for dims
+        params = tuple(sorted((key, tuple(values)) for key, values in query.items()))
+        tag = hashlib.sha256(repr((meta['dataset_key'], resource, params)).encode()).hexdigest()[:32]
+        return f'W/"{tag}"', lambda: self.render(meta['id'], resource, params)
+
+    def _render(self, snapshot_id: str, resource: str, params: tuple) -> bytes:
+        meta = next((meta for meta in self.store.list() if meta['id'] == snapshot_id), None)
+        if meta is None:
+            raise APIError(404, f"Snapshot {snapshot_id} was deleted")
+        if resource == 'meta':
+            return to_json(meta)
+        if resource == 'stats':
+            return to_json(self.store.load_stats(snapshot_id))
+
+        query = dict(params)
+        if resource == 'cube':
+            return to_json(frame_records(self.load_cube(snapshot_id)))
+        if resource == 'slice':
+            return to_json(self.slice(snapshot_id, query))
+        return to_json(self.rows(snapshot_id, query))
+
+    def filters(self, query: dict, reserved: Tuple[str, ...], columns) -> dict:
+        """{column: allowed values} from the query parameters that are not options."""
+        where = {column: list(values) for column, values in query.items() if column not in reserved}
+        unknown = [column for column in where if column not in columns]
+        if unknown:
+            raise APIError(400, f"Cannot filter on {', '.join(unknown)}; available: {', '.join(map(str, columns))}")
+        return where
+
+    @staticmethod
+    def typed(where: dict, schema) -> dict:
+        """Filter values cast from query strings to the Arrow type of their column."""
+        import pyarrow as pa
+        typed = {}
+        for column, values in where.items():
+            field_type = schema.field(column).type
+            if pa.types.is_dictionary(field_type):
+                field_type = field_type.value_type
+            if pa.types.is_string(field_type) or pa.types.is_large_string(field_type):
+                typed[column] = values
+                continue
+            try:
+                typed[column] = pa.array(values, pa.string()).cast(field_type).to_pylist()
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                raise APIError(400, f"{column} holds {field_type} values; cannot filter it on "
+                                    f"{', '.join(map(repr, values))}") from None
+        return typed
+
+    def slice(self, snapshot_id: str, query: dict) -> dict:
+        """Count of startups matching the filters, rolled up to the requested dims through the cube."""
+        from data_processor import DataProcessor
+        cube = self.load_cube(snapshot_id)
+        dimensions = [col for col in cube.columns if col != 'count']
+        dims = [dim for values in query.get('dims', ()) for dim in values.split(',') if dim]
+        unknown = [dim for dim in dims if dim not in dimensions]
+        if unknown:
+            raise APIError(400, f"Cannot group by {', '.join(unknown)}; available: {', '.join(dimensions)}")
+        where = self.filters(query, ('dims',), dimensions)
+        view = DataProcessor.filter_cube(cube, where)
+        return {
+            'where': where,
+            'dims': dims,
+            'total': int(view['count'].sum()),
+            'counts': frame_records(DataProcessor.cube_counts(view, dims)) if dims else []
+        }
+
+    def rows(self, snapshot_id: str, query: dict) -> dict:
+        """One page of the processed rows matching the filters."""
+        try:
+            limit = int(query.get('limit', (self.DEFAULT_ROW_LIMIT,))[0])
+            offset = int(query.get('offset', (0,))[0])
+        except ValueError:
+            raise APIError(400, "limit and offset must be integers") from None
+        if not 0 < limit <= self.MAX_ROW_LIMIT or offset < 0:
+            raise APIError(400, f"limit must be between 1 and {self.MAX_ROW_LIMIT}, offset at least 0")
+        schema = self.store.schema(snapshot_id)
+        where = self.typed(self.filters(query, ('limit', 'offset'), schema.names), schema)
+        page, total = self.store.load_page(snapshot_id, where, offset, limit)
+        return {
+            'where': where,
+            'total': total,
+            'offset': offset,
+            'rows': frame_records(page)
+        }
+
+
+class StatsAPIHandler(BaseHTTPRequestHandler):
+    """HTTP side of StatsAPI: conditional requests, gzip and JSON errors."""
+
+    server_version = 'COIQStatsAPI/1'
+
+    # Bodies smaller than this are sent as they are; compressing them saves nothing
+    GZIP_MIN_BYTES = 1024
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def reject_write(self):
+        self.send_json(405, {'error': "The stats API is read-only"}, extra_headers={'Allow': 'GET, HEAD'})
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = reject_write
+
+    def respond(self, send_body: bool) -> None:
+        url = urlsplit(self.path)
+        try:
+            etag, render = self.server.api.route(url.path, parse_qs(url.query))
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                return
+            body = render()
+        except APIError as e:
+            self.send_json(e.status, {'error': str(e)}, send_body=send_body)
+            return
+        except Exception as e:
+            # Anything unexpected still gets a JSON answer instead of a dropped connection
+            self.log_error("Error answering %s: %r", self.path, e)
+            self.send_json(500, {'error': "Internal error"}, send_body=send_body)
+            return
+        self.send_json(200, body, send_body=send_body, extra_headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
+    def accepts_gzip(self) -> bool:
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = coding.strip().partition(';')
+            if name.strip() == 'gzip':
+                return params.replace(' ', '') not in ('q=0', 'q=0.0')
+        return False
+
+    def send_json(self, status: int, body, send_body: bool = True, extra_headers: Optional[dict] = None) -> None:
+        if not isinstance(body, bytes):
+            body = to_json(body)
+        headers = {'Content-Type': 'application/json', 'Vary': 'Accept-Encoding', **(extra_headers or {})}
+        if len(body) >= self.GZIP_MIN_BYTES and self.accepts_gzip():
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        headers['Content-Length'] = str(len(body))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+
+def make_server(store: SnapshotStore, host: str = '127.0.0.1', port: int = 8502) -> ThreadingHTTPServer:
+    """A threaded server answering with StatsAPI over the given store; call serve_forever() to run it."""
+    server = ThreadingHTTPServer((host, port), StatsAPIHandler)
+    server.api = StatsAPI(store)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=os.environ.get('COIQ_STORE_DIR') or
+                        os.path.join(os.path.expanduser('~'), '.coiq', 'snapshots'),
+                        help="snapshot directory shared with the dashboard (default: COIQ_STORE_DIR or ~/.coiq/snapshots)")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on (default: localhost only)")
+    parser.add_argument('--port', type=int, default=8502)
+    args = parser.parse_args()
+
+    server = make_server(SnapshotStore(args.store), args.host, args.port)
+    print(f"Serving snapshots from {args.store} on http://{args.host}:{args.port}/datasets")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
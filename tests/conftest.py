@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the normalization memo in memory so tests never write to the home directory
+os.environ.setdefault('COIQ_NORMALIZATION_MEMO', '')
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('duckdb')
+pytest.importorskip('pyarrow')
+
+from backends import get_backend  # noqa: E402
+
+
+def plain(df):
+    """Values only, missing as None, so engines with different text dtypes compare equal."""
+    return df.astype(object).where(df.notna(), None)
+
+
+@pytest.fixture
+def upload(tmp_path):
+    rows = 60
+    df = pd.DataFrame({
+        'Name': [f'Startup {i}' for i in range(rows)],
+        'Country': ['Kenya', 'nigeria ', 'N/A', 'NO', 'Atlantis', None] * (rows // 6),
+        'Fund level': ['Seed', 'series a', 'Preseed', None, 'Angel', 'Bridge'] * (rows // 6),
+        'MVP?': ['Yes', 'y', 'No', None, 'maybe', 'TRUE'] * (rows // 6),
+        'Type': ['For Profit', 'for-profit', 'Non Profit', None, 'Hybrid', 'FOR PROFIT'] * (rows // 6)
+    })
+    path = tmp_path / 'upload.csv'
+    df.to_csv(path, index=False)
+    return path
+
+
+def test_duckdb_matches_pandas(upload):
+    expected, expected_stats = get_backend('pandas').process(str(upload))
+    processed, stats = get_backend('duckdb').process(str(upload))
+    assert stats == expected_stats
+    assert list(processed.index) == list(expected.index)
+    pd.testing.assert_frame_equal(plain(processed), plain(expected))
+
+
+def test_duckdb_writes_the_same_rows_under_a_memory_limit(upload, tmp_path):
+    expected, expected_stats = get_backend('pandas').process(str(upload))
+    path = tmp_path / 'processed.parquet'
+    backend = get_backend('duckdb', memory_limit='64MB', temp_directory=str(tmp_path / 'spill'))
+    assert backend.process_to_parquet(str(upload), str(path)) == expected_stats
+    pd.testing.assert_frame_equal(plain(pd.read_parquet(path)), plain(expected.reset_index(drop=True)))
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pandas as pd
+
+from background import JobRunner, ProcessingJob
+from data_processor import DataProcessor
+
+
+def upload(rows: int = 20) -> pd.DataFrame:
+    return pd.DataFrame({'Name': [f'Startup {i}' for i in range(rows)], 'Country': ['Kenya', 'Nigeria'] * (rows // 2),
+                         'Fund level': 'Seed', 'Type': 'For Profit'})
+
+
+def wait(job: ProcessingJob, timeout: float = 10.0) -> ProcessingJob:
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.finished
+    return job
+
+
+def process(job, df):
+    return DataProcessor.process_csv(df, progress=lambda stage, done: job.report(stage=stage, done=done))
+
+
+def test_stage_progress_reaches_the_job():
+    seen = []
+    job = ProcessingJob('upload', bytes_total=100)
+    original = job.report
+
+    def report(**kwargs):
+        seen.append((kwargs.get('stage'), job.fraction))
+        original(**kwargs)
+    job.report = report
+
+    wait(JobRunner(max_workers=1).submit(job, process, upload()))
+    assert job.status == 'done' and job.result[1]['total_startups'] == 20
+    assert job.fraction == 1.0 and job.stage == 'Computing stats'
+    fractions = [fraction for _, fraction in seen[1:]]
+    assert fractions == sorted(fractions) and len(seen) == 6
+
+
+def test_cancel_stops_the_run_at_the_next_stage():
+    started, release = threading.Event(), threading.Event()
+    job = ProcessingJob('upload')
+
+    def blocked(stage, done):
+        job.report(stage=stage, done=done)
+        if stage == 'Classifying':
+            started.set()
+            release.wait(5)
+
+    JobRunner(max_workers=1).submit(job, lambda job: DataProcessor.process_csv(upload(), progress=blocked))
+    assert started.wait(5)
+    job.cancel()
+    release.set()
+    assert wait(job).status == 'cancelled'
+    assert job.stage == 'Geocoding' and job.result is None
+
+
+def test_a_cancelled_queued_job_never_runs():
+    runner = JobRunner(max_workers=1)
+    release = threading.Event()
+    first = runner.submit(ProcessingJob('first'), lambda job: release.wait(5))
+    queued = ProcessingJob('queued')
+    queued.cancel()
+    calls = []
+    runner.submit(queued, lambda job: calls.append(job))
+    release.set()
+    wait(first)
+    assert wait(queued).status == 'cancelled' and not calls
+
+
+def test_worker_errors_fail_the_job():
+    def broken(job):
+        job.report(stage='Reading file')
+        raise ValueError('not a CSV')
+
+    job = wait(JobRunner(max_workers=1).submit(ProcessingJob('upload'), broken))
+    assert job.status == 'failed' and job.error == 'not a CSV' and job.stage == 'Reading file'
@@ -0,0 +1,228 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_startups
+from data_processor import DataProcessor
+
+
+@pytest.fixture(scope='module')
+def cohort():
+    """A processed synthetic cohort, with the missing values and dirty spellings of real uploads."""
+    return DataProcessor.process_csv(generate_startups(3000, seed=7))[0]
+
+
+def test_chunked_processing_matches_whole_file_when_a_chunk_is_blank(tmp_path):
+    rows = 40
+    df = pd.DataFrame({
+        'Name': [f'Startup {i}' for i in range(rows)],
+        'Country': ['Nigeria', 'India'] * (rows // 2),
+        'Fund level': ['Seed', 'Series A'] * (rows // 2),
+        'Type': ['For Profit'] * (rows // 2) + [np.nan] * (rows // 2)
+    })
+    # The second half leaves Country and Fund level blank too, so that chunk has no text to infer from
+    df.loc[rows // 2:, ['Country', 'Fund level']] = np.nan
+    path = tmp_path / 'upload.csv'
+    df.to_csv(path, index=False)
+
+    whole, whole_stats = DataProcessor.process_csv(pd.read_csv(path))
+    chunked, chunked_stats = DataProcessor.process_csv_chunked(str(path), chunksize=rows // 2)
+    pd.testing.assert_frame_equal(chunked, whole)
+    assert chunked_stats['rocket_type_distribution'] == whole_stats['rocket_type_distribution']
+
+
+def test_placeholders_and_lowercase_codes_do_not_resolve_to_countries():
+    resolved = DataProcessor.resolve_countries(['N/A', 'NA', 'n/a', 'No', 'None', 'Unknown', 'Remote'])
+    assert resolved == dict.fromkeys(resolved)
+
+
+def test_country_placeholders_are_reported_missing_and_codes_normalize_exactly():
+    df = pd.DataFrame({'Country': ['n/a', 'Unknown', 'Remote', 'NO', 'No', 'Kenya', None]}, dtype=object)
+    normalized, report = DataProcessor.normalize_frame(df, ['Country'])
+    assert normalized['Country'].fillna('-').tolist() == ['-', '-', '-', 'Norway', 'No', 'Kenya', '-']
+    assert (report['Country']['missing'], report['Country']['normalized'], report['Country']['valid']) == (4, 1, 1)
+    assert report['Country']['unrecognized_values'] == {'No': 1}
+
+
+def test_codes_match_exactly_and_names_after_folding():
+    resolved = DataProcessor.resolve_countries(['NA', 'NO', 'USA', 'UK', 'united states', 'Namibia', 'Brunei'],
+                                               convert=False)
+    assert resolved == {'NA': None, 'NO': 'NOR', 'USA': 'USA', 'UK': 'GBR', 'united states': 'USA',
+                        'Namibia': 'NAM', 'Brunei': 'BRN'}
+
+
+def test_geocode_aliases_are_trimmed():
+    _, aliases, codes = DataProcessor.load_geocode_table()
+    assert 'theabodeofpeace' not in aliases
+    assert aliases['nationofbruneitheabodeofpeace'] == 'BRN'
+    assert all(code == code.strip() for code in codes)
+
+
+def test_append_processed_skips_known_and_repeated_startups():
+    first = pd.DataFrame({'Name': ['Alpha', 'Beta'], 'Country': ['Nigeria', 'India'],
+                          'Fund level': ['Seed', 'Series A'], 'Type': ['For Profit', 'For Profit']})
+    existing_df, existing_stats = DataProcessor.process_csv(first)
+    existing_keys = DataProcessor.sorted_record_keys(existing_df)
+    batch = pd.DataFrame({'Name': [' alpha ', 'Gamma', 'Gamma', 'Delta'], 'Country': ['Nigeria', 'Kenya', 'Kenya', 'Ghana'],
+                          'Fund level': ['Seed', 'Series B', 'Seed', 'Pre Seed'], 'Type': ['For Profit'] * 4})
+
+    combined, stats, appended, keys = DataProcessor.append_processed(existing_df, existing_stats, batch, existing_keys)
+    assert appended['Name'].tolist() == ['Gamma', 'Delta']
+    assert combined['Name'].tolist() == ['Alpha', 'Beta', 'Gamma', 'Delta']
+    assert stats['total_startups'] == 4
+    np.testing.assert_array_equal(keys, DataProcessor.sorted_record_keys(combined))
+    assert len(existing_keys) == 2
+
+    _, _, appended_again, keys_again = DataProcessor.append_processed(combined, stats, batch, keys)
+    assert appended_again.empty
+    np.testing.assert_array_equal(keys_again, keys)
+
+
+def test_legacy_xls_is_rejected_with_a_clear_error():
+    workbook = io.BytesIO(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + bytes(56))
+    assert DataProcessor.detect_format(workbook, 'cohort.xls') == 'xls'
+    with pytest.raises(ValueError, match='xlsx'):
+        DataProcessor.read_input(workbook, name='cohort.xls')
+    assert 'xls' not in DataProcessor.INPUT_FORMATS['excel']
+
+
+def test_parquet_input_is_arrow_backed_and_matches_csv_input():
+    pytest.importorskip('pyarrow')
+    df = pd.DataFrame({'Name': ['Alpha', 'Beta', 'Gamma', 'Delta'], 'Country': ['Nigeria', 'Atlantis', 'Kenya', 'India'],
+                       'Fund level': ['Seed', 'Series A', None, 'Pre Seed'], 'Type': ['For Profit'] * 4,
+                       'Notes': ['unused'] * 4})
+    parquet = io.BytesIO()
+    df.astype({'Country': 'category'}).to_parquet(parquet)
+    parquet.seek(0)
+
+    frame = DataProcessor.read_input(parquet, 'parquet')
+    assert 'Notes' not in frame.columns
+    assert isinstance(frame['Country'].dtype, pd.CategoricalDtype)
+    assert isinstance(frame['Name'].dtype, pd.ArrowDtype)
+
+    _, parquet_stats = DataProcessor.process_csv(frame)
+    _, csv_stats = DataProcessor.process_csv(DataProcessor.read_input(io.BytesIO(df.to_csv(index=False).encode()), 'csv'))
+    parquet_stats.pop('memory', None)
+    csv_stats.pop('memory', None)
+    assert parquet_stats == csv_stats
+
+
+def test_search_and_sort_give_the_same_positions_on_compact_frames():
+    df = pd.DataFrame({'Name': ['Beta', 'alpha', 'Gamma', None, 'delta', 'Alpha Two'],
+                       'Country': ['Kenya', 'Nigeria', None, 'Kenya', 'Ghana', 'nigeria'],
+                       'latitude': [1.0, np.nan, 3.0, 2.0, 1.0, 0.5]})
+    compact = df.astype({'Name': 'string', 'Country': pd.CategoricalDtype(['Nigeria', 'nigeria', 'Kenya', 'Ghana'])})
+
+    for query in ('ALPHA', 'nig', 'ken', 'zzz', ''):
+        expected = [i for i, row in enumerate(df.itertuples())
+                    if any(isinstance(value, str) and query.lower() in value.lower() for value in (row.Name, row.Country))]
+        assert DataProcessor.search_positions(df, query).tolist() == expected
+        assert DataProcessor.search_positions(compact, query).tolist() == expected
+    assert DataProcessor.search_positions(df, 'nig', ['Name']).tolist() == []
+
+    positions = np.array([5, 4, 3, 2, 1, 0])
+    for column in ('Name', 'Country', 'latitude'):
+        for ascending in (True, False):
+            expected = df[column].iloc[positions].reset_index(drop=True).sort_values(
+                ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+            assert DataProcessor.sort_positions(df, positions, column, ascending).tolist() == positions[expected].tolist()
+            assert DataProcessor.sort_positions(compact, positions, column, ascending).tolist() == positions[expected].tolist()
+    assert DataProcessor.sort_positions(df, positions, None) is positions
+
+
+def test_cube_counts_match_groupby_counts(cohort):
+    dims = [dim for dim in DataProcessor.CUBE_DIMENSIONS if dim in cohort.columns]
+    cube = DataProcessor.build_cube(cohort)
+    assert cube['count'].sum() == len(cohort)
+    expected = cohort.groupby(dims, dropna=False).size().rename('count')
+    pd.testing.assert_series_equal(cube.set_index(dims)['count'].sort_index(), expected.sort_index(), check_dtype=False)
+
+    for group in (['Final Label'], ['Country', 'Final Label'], ['Region', 'Sector']):
+        counts = DataProcessor.cube_counts(cube, group).set_index(group)['count']
+        pd.testing.assert_series_equal(counts, cohort.groupby(group).size().rename('count'), check_dtype=False)
+
+    where = {'Final Label': ['W', 'X'], 'Region': ['Africa', 'Asia']}
+    rows = cohort[cohort['Final Label'].isin(where['Final Label']) & cohort['Region'].isin(where['Region'])]
+    filtered = DataProcessor.filter_cube(cube, where)
+    assert filtered['count'].sum() == len(rows)
+    counts = DataProcessor.cube_counts(cube, ['Country'], where).set_index('Country')['count']
+    pd.testing.assert_series_equal(counts, rows.groupby('Country').size().rename('count'), check_dtype=False)
+    assert DataProcessor.cube_value_counts(cube, 'Sector', where).to_dict() == rows['Sector'].value_counts().to_dict()
+
+
+def plain(df: pd.DataFrame) -> pd.DataFrame:
+    """Values only, missing as None, so frames read back with other dtypes compare equal."""
+    df = df.reset_index(drop=True).astype(object)
+    return df.where(df.notna(), None)
+
+
+@pytest.mark.parametrize('fmt', list(DataProcessor.EXPORT_FORMATS))
+@pytest.mark.parametrize('compact', [False, True])
+def test_exports_read_back_to_the_same_rows(cohort, fmt, compact):
+    if fmt not in DataProcessor.available_export_formats():
+        pytest.skip(f"{fmt} export needs pyarrow")
+    df = DataProcessor.compact_frame(cohort) if compact else cohort
+    data = DataProcessor.export_bytes(df, fmt)
+    if fmt == 'csv':
+        restored = pd.read_csv(io.BytesIO(data))
+    elif fmt == 'parquet':
+        restored = pd.read_parquet(io.BytesIO(data))
+    else:
+        import pyarrow as pa
+        restored = pa.ipc.open_file(pa.BufferReader(data)).read_pandas()
+    assert restored.columns.tolist() == df.columns.tolist()
+    pd.testing.assert_frame_equal(plain(restored), plain(df))
+
+
+def test_excel_uploads_read_back_to_the_same_rows(cohort):
+    pytest.importorskip('openpyxl')
+    workbook = io.BytesIO()
+    cohort.to_excel(workbook, index=False)
+    workbook.seek(0)
+    assert DataProcessor.detect_format(workbook, 'cohort.xlsx') == 'excel'
+    restored = DataProcessor.read_input(workbook, name='cohort.xlsx')
+    pd.testing.assert_frame_equal(plain(restored), plain(cohort))
+
+
+def test_compact_mode_gives_the_same_stats_and_rows(tmp_path):
+    raw = generate_startups(3000, seed=7)
+    default, default_stats = DataProcessor.process_csv(raw)
+    compact, compact_stats = DataProcessor.process_csv(raw, compact=True)
+    memory = compact_stats.pop('memory')
+    assert memory['after_bytes'] < memory['before_bytes'] and 'memory' not in default_stats
+    assert compact_stats == default_stats
+    assert isinstance(compact['Country'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(plain(compact), plain(default))
+
+    path = tmp_path / 'upload.csv'
+    raw.to_csv(path, index=False)
+    chunked, chunked_stats = DataProcessor.process_csv_chunked(str(path), chunksize=700, compact=True)
+    chunked_stats.pop('memory', None)
+    whole, whole_stats = DataProcessor.process_csv(pd.read_csv(path))
+    assert chunked_stats['rocket_type_distribution'] == whole_stats['rocket_type_distribution']
+    pd.testing.assert_frame_equal(plain(chunked), plain(whole))
+
+
+@pytest.mark.parametrize('bin_degrees', [10.0, 2.0, 0.5])
+def test_map_bins_count_every_located_startup(cohort, bin_degrees):
+    bins = DataProcessor.map_bins(cohort, bin_degrees)
+    located = cohort['latitude'].notna() & cohort['longitude'].notna()
+    assert bins['Total'].sum() == located.sum() > 0
+    labels = [label for label in cohort['Final Label'].unique() if label in bins.columns]
+    assert (bins[labels].sum(axis=1) == bins['Total']).all()
+    assert (bins['Dominant'] == bins[labels].idxmax(axis=1)).all()
+    assert bins['Total'].is_monotonic_decreasing
+
+
+def test_map_bins_put_points_on_a_cell_edge_in_the_cell_above():
+    df = pd.DataFrame({'latitude': [20.0, 29.9, 19.99, -10.0, -0.01, -10.01, 90.0, None],
+                       'longitude': [0.0, 0.0, 0.0, -10.0, -0.01, -10.0, 180.0, 5.0],
+                       'Final Label': ['W', 'X', 'W', 'Y', 'Y', 'Z', 'W', 'W']})
+    bins = DataProcessor.map_bins(df, 10.0)
+    cells = {(round(row.latitude, 3), round(row.longitude, 3)): row.Total for row in bins.itertuples()}
+    assert cells == {(24.95, 0.0): 2, (19.99, 0.0): 1, (-5.005, -5.005): 2, (-10.01, -10.0): 1, (90.0, 180.0): 1}
+
+    fine = DataProcessor.map_bins(df.assign(latitude=[0.5, 0.75, 0.49, 1.0, 1.25, 0.0, -0.5, None], longitude=0.0), 0.5)
+    assert fine.set_index('latitude')['Total'].to_dict() == {0.625: 2, 0.245: 2, 1.125: 2, -0.5: 1}
@@ -0,0 +1,100 @@
+import pandas as pd
+
+from dataset_registry import DatasetRegistry
+
+
+def frame(rows):
+    return pd.DataFrame({'Name': [f"startup {i}" for i in range(rows)]})
+
+
+def test_derived_values_are_held_once_and_counted_in_the_budget():
+    registry = DatasetRegistry()
+    registry.put('session', 'dataset', frame(100), {}, frame(1))
+    base = registry.usage()['bytes']
+    built = []
+
+    def build():
+        built.append(1)
+        return b'x' * 1000
+
+    assert registry.derived('session', 'export', build) == registry.derived('session', 'export', build)
+    assert len(built) == 1
+    usage = registry.usage()
+    assert usage['derived_bytes'] == 1000 and usage['bytes'] == base + 1000
+
+
+def test_derived_values_are_dropped_before_datasets():
+    df = frame(100)
+    registry = DatasetRegistry()
+    size = registry.entry_size(df, frame(1))
+    registry = DatasetRegistry(max_bytes=size + 1500)
+    registry.put('session', 'dataset', df, {}, frame(1))
+    registry.derived('session', 'first', lambda: b'x' * 1000)
+    registry.derived('session', 'second', lambda: b'y' * 1000)
+
+    usage = registry.usage()
+    assert usage['resident'] == 1 and usage['derived_bytes'] == 1000
+    built = []
+    registry.derived('session', 'first', lambda: built.append(1) or b'x' * 1000)
+    assert built == [1]
+
+
+def test_derived_values_go_with_their_dataset():
+    registry = DatasetRegistry()
+    registry.put('session', 'dataset', frame(10), {}, frame(1))
+    registry.derived('session', 'export', lambda: b'x' * 1000)
+    registry.release('session')
+    assert registry.usage()['derived_bytes'] == 0
+    assert registry.derived('session', 'export', lambda: b'y') == b'y'
+    assert registry.usage()['derived_bytes'] == 0
+
+
+def test_spills_are_written_and_read_outside_the_lock(tmp_path):
+    size = DatasetRegistry.entry_size(frame(100), frame(1))
+    registry = DatasetRegistry(max_bytes=size + size // 2, spill_dir=str(tmp_path))
+    write_spill, read_spill = registry._write_spill, registry._read_spill
+    unlocked = []
+
+    def check(io):
+        def wrapped(*args):
+            unlocked.append(registry._lock.acquire(blocking=False))
+            if unlocked[-1]:
+                registry._lock.release()
+            return io(*args)
+        return wrapped
+    registry._write_spill, registry._read_spill = check(write_spill), check(read_spill)
+
+    registry.put('first', 'one', frame(100), {'n': 1}, frame(1))
+    registry.put('second', 'two', frame(100), {'n': 2}, frame(1))
+    assert registry.usage()['sessions']['first']['state'] == 'spilled'
+    processed_df, stats, _ = registry.get('first')
+    pd.testing.assert_frame_equal(processed_df, frame(100))
+    assert stats == {'n': 1} and registry.usage()['reloads'] == 1
+    assert registry.usage()['sessions']['second']['state'] == 'spilled'
+    assert len(unlocked) == 3 and all(unlocked)
+
+
+def test_rows_being_spilled_are_served_without_reading_the_file(tmp_path):
+    registry = DatasetRegistry(spill_dir=str(tmp_path))
+    registry.put('first', 'one', frame(100), {'n': 1}, frame(1))
+    registry.max_bytes = 0
+    with registry._lock:
+        spills = registry._enforce_budget(keep=None)
+    registry.max_bytes = DatasetRegistry().max_bytes
+    assert [entry.dataset_key for entry, _ in spills] == ['one']
+
+    assert registry.get('first')[1] == {'n': 1}
+    registry._spill(spills)
+    assert registry.usage()['sessions']['first']['state'] == 'resident'
+    assert registry.usage()['reloads'] == 0
+
+
+def test_idle_sessions_are_released_and_reported_once():
+    registry = DatasetRegistry(session_ttl=60)
+    registry.put('idle', 'one', frame(10), {}, frame(1))
+    registry._sessions['idle'] = ('one', 0.0)
+    registry.put('active', 'two', frame(10), {}, frame(1))
+
+    assert registry.dataset_key('idle') is None and registry.get('idle') is None
+    assert registry.expired('idle') == 'one'
+    assert registry.expired('idle') is None and registry.expired('active') is None
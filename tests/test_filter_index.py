@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from filter_index import FilterIndex
+
+DIMENSIONS = ['Country', 'Region', 'Final Label', 'Score']
+
+
+def frame() -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    rows = 500
+    return pd.DataFrame({
+        'Country': rng.choice(np.array(['Kenya', 'Nigeria', 'India', None], dtype=object), rows),
+        'Region': rng.choice(np.array(['Africa', 'Asia', np.nan], dtype=object), rows),
+        'Final Label': rng.choice(np.array(['W', 'X', 'Y', 'Z']), rows),
+        'Score': rng.choice(np.array([1.0, 2.5, np.nan]), rows),
+        'Name': [f'Startup {i}' for i in range(rows)]
+    })
+
+
+def isin_mask(df: pd.DataFrame, selections: dict) -> np.ndarray:
+    mask = np.ones(len(df), dtype=bool)
+    for dim, selected in selections.items():
+        if selected:
+            mask &= df[dim].isin([value for value in selected if pd.notna(value)]).to_numpy()
+    return mask
+
+
+def test_masks_match_isin_masks():
+    df = frame()
+    selection_sets = [
+        {},
+        {'Country': ['Kenya']},
+        {'Country': ['Kenya', 'India'], 'Region': ['Africa']},
+        {'Country': ['Nigeria', None], 'Final Label': ['W', 'Z'], 'Score': [2.5, np.nan]},
+        {'Region': [], 'Final Label': ['X']},
+        {'Country': ['Atlantis']},
+        {'Name': ['Startup 1']}
+    ]
+    for index in (FilterIndex(df, DIMENSIONS), FilterIndex(df.astype({'Country': 'category', 'Region': 'category'}),
+                                                            DIMENSIONS)):
+        for selections in selection_sets:
+            expected = isin_mask(df, {dim: values for dim, values in selections.items() if dim in DIMENSIONS})
+            np.testing.assert_array_equal(index.mask(selections), expected)
+            np.testing.assert_array_equal(index.positions(selections), np.flatnonzero(expected))
+
+
+def test_options_leave_out_missing_values():
+    index = FilterIndex(frame(), DIMENSIONS + ['Missing column'])
+    assert index.dimensions == DIMENSIONS
+    assert index.options('Country') == ['India', 'Kenya', 'Nigeria']
+    assert index.options('Score') == [1.0, 2.5]
+    assert index.memory_bytes() == 4 * 500 * 4
@@ -0,0 +1,52 @@
+import io
+import json
+import logging
+
+import pytest
+
+from profiler import LOGGER_NAME, StageProfiler, profile_stage
+
+
+@pytest.fixture
+def log_lines():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger(LOGGER_NAME)
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield lambda: [json.loads(line) for line in stream.getvalue().splitlines()]
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def test_every_stage_is_logged_as_one_json_object(log_lines):
+    profiler = StageProfiler(session='s1', dataset='d1')
+    with profiler.stage('read_input', format='csv') as record:
+        record['rows_out'] = 10
+    with profiler.stage('filter', 10) as record:
+        record['rows_out'] = 7
+
+    first, second = log_lines()
+    assert set(first) == {'ts', 'session', 'dataset', 'stage', 'rows_in', 'rows_out', 'format', 'seconds',
+                          'process_rss_delta_bytes'}
+    assert (first['session'], first['dataset'], first['stage'], first['format']) == ('s1', 'd1', 'read_input', 'csv')
+    assert (first['rows_in'], first['rows_out'], second['rows_in'], second['rows_out']) == (None, 10, 10, 7)
+    assert isinstance(first['ts'], float) and first['seconds'] >= 0
+    assert first['process_rss_delta_bytes'] is None or isinstance(first['process_rss_delta_bytes'], int)
+    assert profiler.records == [{key: value for key, value in line.items() if key not in ('ts', 'session', 'dataset')}
+                                for line in (first, second)]
+
+
+def test_summary_adds_up_repeated_stages_and_disabled_profiling_logs_nothing(log_lines):
+    profiler = StageProfiler()
+    for rows in (5, 7):
+        with profiler.stage('chunk', rows) as record:
+            record['rows_out'] = rows - 1
+    with profile_stage(None, 'ignored', 3) as record:
+        record['rows_out'] = 3
+
+    summary, = profiler.summary()
+    assert (summary['stage'], summary['calls'], summary['rows_in'], summary['rows_out']) == ('chunk', 2, 12, 10)
+    assert [line['stage'] for line in log_lines()] == ['chunk', 'chunk']
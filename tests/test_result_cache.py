@@ -0,0 +1,52 @@
+import pandas as pd
+
+from result_cache import ResultCache
+
+
+def frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({'Name': [f'Startup {i}' for i in range(rows)], 'Final Label': ['W'] * rows})
+
+
+def test_keys_depend_on_the_bytes_and_the_classifier_version():
+    key = ResultCache.make_key(b'Name,Country\na,Kenya\n', 'v1')
+    assert key == ResultCache.make_key(b'Name,Country\na,Kenya\n', 'v1')
+    assert key != ResultCache.make_key(b'Name,Country\na,Kenya\n', 'v2')
+    assert key != ResultCache.make_key(b'Name,Country\nb,Kenya\n', 'v1')
+
+
+def test_least_recently_used_entries_are_evicted_under_the_byte_cap():
+    size = ResultCache.entry_size(frame(100))
+    cache = ResultCache(max_bytes=int(size * 2.5))
+    for key in ('a', 'b'):
+        cache.put(key, frame(100), {'key': key})
+    assert cache.get('a') is not None
+    cache.put('c', frame(100), {'key': 'c'})
+
+    assert cache.get('b') is None
+    assert cache.get('a')[1] == {'key': 'a'} and cache.get('c')[1] == {'key': 'c'}
+    assert cache.stats()['entries'] == 2 and cache.stats()['bytes'] <= cache.max_bytes
+
+    cache.put('huge', frame(1000), {})
+    assert cache.get('huge') is None and cache.stats()['entries'] == 2
+
+
+def test_results_round_trip_through_the_disk_tier(tmp_path):
+    processed_df, stats = frame(10), {'total_startups': 10}
+    ResultCache(max_bytes=0, disk_dir=str(tmp_path)).put('key', processed_df, stats)
+
+    cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path))
+    cached_df, cached_stats = cache.get('key')
+    pd.testing.assert_frame_equal(cached_df, processed_df)
+    assert cached_stats == stats
+    assert cache.stats()['entries'] == 0 and cache.stats()['hits'] == 1
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_a_failed_disk_write_is_skipped_and_cleaned_up(tmp_path, monkeypatch):
+    def full_disk(source, target):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr('result_cache.os.replace', full_disk)
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put('key', frame(10), {})
+    assert cache.get('key') is not None
+    assert not list(tmp_path.iterdir())
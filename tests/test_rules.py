@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from data_processor import DataProcessor
+from rules import RuleSet, normalize_value
+
+
+def classify_row(rules: RuleSet, row: dict) -> str:
+    """Per-row reference: the first rule whose conditions all hold, or the default."""
+    for label, conditions in zip(rules.labels, rules.conditions):
+        if all(column in row and (normalize_value(row[column]) in allowed) != negated
+               for column, allowed, negated in conditions):
+            return label
+    return rules.default
+
+
+# Fund-level classification as the app shipped it before rules.json, kept as the reference
+BASELINE_FUND_LEVEL_MAPPING = {
+    "Pre Seed": "W",
+    "Preseed": "W",
+    "No Funding": "W",
+    "No Investment": "W",
+    "Seed": "X",
+    "Seed & Bridge": "X",
+    "Bridge": "X",
+    "Series A": "Y",
+    "Series B": "Z"
+}
+
+
+def baseline_classify_stage(fund_level) -> str:
+    return BASELINE_FUND_LEVEL_MAPPING.get(str(fund_level).strip().title(), "Unknown")
+
+
+def rules_from(spec: dict, tmp_path) -> RuleSet:
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps(spec))
+    return RuleSet.from_file(str(path))
+
+
+def test_bundled_rules_match_per_row_classification():
+    rules = DataProcessor.load_rules()
+    df = pd.DataFrame({'Fund level': ['Pre Seed', ' seed ', 'SERIES A', 'series b', 'Preseed', 'Seed & Bridge', 'Bridge',
+                                      'No Funding', 'no investment', 'Unknown', 'Series C', '', '   ', np.nan, None, 3,
+                                      2.5, True, 'Seed']},
+                      index=range(100, 119))
+    expected = pd.Series([classify_row(rules, row) for row in df.to_dict('records')], index=df.index)
+    pd.testing.assert_series_equal(rules.evaluate(df), expected)
+    assert rules.evaluate(df).loc[[101, 102, 103, 109, 113]].tolist() == ['X', 'Y', 'Z', 'Unknown', 'Unknown']
+
+
+def test_bundled_rules_match_the_baseline_fund_level_mapping():
+    fund_levels = pd.Series(['Pre Seed', ' seed ', 'SERIES A', 'series b', 'Preseed', 'Seed & Bridge', 'Bridge',
+                             'No Funding', 'no investment', 'Unknown', 'Series C', '', '   ', np.nan, None, 3, 2.5,
+                             True, 'Seed'], index=range(100, 119), name='Fund level')
+    expected = fund_levels.apply(baseline_classify_stage)
+    pd.testing.assert_series_equal(DataProcessor.load_rules().evaluate(fund_levels.to_frame()), expected,
+                                   check_names=False)
+
+
+def test_multi_column_rules_match_per_row_classification(tmp_path):
+    rules = rules_from({'default': 'Unknown', 'rules': [
+        {'label': 'W', 'when': {'Fund level': ['Pre Seed', None]}},
+        {'label': 'X', 'when': {'Fund level': ['Seed'], 'MVP?': ['Yes'], 'Have Traction?': {'not': ['No']}}},
+        {'label': 'Y', 'when': {'Stage': ['Growth']}}
+    ]}, tmp_path)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Fund level': rng.choice(np.array(['Pre Seed', 'seed', 'Seed ', 'Series A', None], dtype=object), 500),
+        'MVP?': rng.choice(np.array(['Yes', 'no', None], dtype=object), 500),
+        'Have Traction?': rng.choice(np.array(['Yes', 'No', None], dtype=object), 500)
+    })
+    expected = pd.Series([classify_row(rules, row) for row in df.to_dict('records')], index=df.index)
+    pd.testing.assert_series_equal(rules.evaluate(df), expected)
+
+
+def test_row_wise_evaluation_matches_combination_table(tmp_path, monkeypatch):
+    rules = rules_from({'rules': [{'label': 'A', 'when': {'Name': {'not': ['b']}, 'Fund level': ['Seed']}}]}, tmp_path)
+    df = pd.DataFrame({'Name': ['a', 'b', 'c'] * 20, 'Fund level': ['Seed', 'Bridge', 'Seed', None] * 15})
+    expected = pd.Series([classify_row(rules, row) for row in df.to_dict('records')], index=df.index)
+    pd.testing.assert_series_equal(rules.evaluate(df), expected)
+    # Too many combinations to tabulate: the rules are evaluated on the rows instead
+    monkeypatch.setattr(rules, 'MAX_COMBINATIONS', 1)
+    pd.testing.assert_series_equal(rules.evaluate(df), expected)
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from data_processor import DataProcessor  # noqa: E402
+import snapshot_store  # noqa: E402
+from snapshot_store import SnapshotStore  # noqa: E402
+
+
+def processed(names, country='Nigeria'):
+    df = pd.DataFrame({'Name': names, 'Country': country, 'Fund level': 'Seed', 'Type': 'For Profit'})
+    processed_df, stats = DataProcessor.process_csv(df)
+    return processed_df, stats, DataProcessor.build_cube(processed_df)
+
+
+def test_append_snapshot_writes_only_the_delta(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    base_df, base_stats, base_cube = processed(['a', 'b'])
+    base = store.save('base', 'base-key', base_df, base_stats, base_cube, 'v')
+
+    delta, _, _ = processed(['c'], country='Kenya')
+    combined = pd.concat([base_df, delta], ignore_index=True)
+    stats = DataProcessor.compute_stats(combined)
+    appended = store.save('append', 'append-key', combined, stats, DataProcessor.build_cube(combined), 'v',
+                          base_key='base-key', delta=delta)
+
+    assert appended['parts'] == 2 and appended['base'] == base['id']
+    first_part = os.path.join(str(tmp_path), appended['id'], 'data', 'part-00000.parquet')
+    assert os.path.samefile(first_part, os.path.join(str(tmp_path), base['id'], 'data', 'part-00000.parquet'))
+    rows, loaded_stats, _ = store.load(appended['id'])
+    assert rows['Name'].tolist() == ['a', 'b', 'c']
+    assert loaded_stats['total_startups'] == 3
+    page, total = store.load_page(appended['id'], {'Country': ['Kenya']}, 0, 10)
+    assert total == len(page) == 1
+
+
+def test_saving_a_stored_dataset_returns_the_existing_snapshot(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    df, stats, cube = processed(['a'])
+    first = store.save('one', 'same-key', df, stats, cube, 'v')
+    assert store.save('two', 'same-key', df, stats, cube, 'v') == first
+    assert len(store.list()) == 1
+
+
+def test_oldest_snapshots_beyond_keep_are_deleted(tmp_path):
+    store = SnapshotStore(str(tmp_path), keep=2)
+    df, stats, cube = processed(['a'])
+    saved = [store.save(f'v{i}', f'key-{i}', df, stats, cube, 'v') for i in range(3)]
+    assert [meta['id'] for meta in store.list()] == [meta['id'] for meta in saved[1:]]
+    assert not os.path.exists(os.path.join(str(tmp_path), saved[0]['id']))
+
+
+def save_many(root, worker):
+    store = SnapshotStore(root, keep=None)
+    for i in range(5):
+        store.save('upload', f'key-{worker}-{i}', *processed([f'{worker}-{i}']), 'v')
+
+
+@pytest.mark.skipif(snapshot_store.fcntl is None, reason="manifest locking across processes needs fcntl")
+def test_processes_saving_to_one_store_lose_no_snapshots(tmp_path):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=save_many, args=(str(tmp_path), worker)) for worker in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    snapshots = SnapshotStore(str(tmp_path)).list()
+    assert len(snapshots) == 15
+    assert sorted(meta['version'] for meta in snapshots) == list(range(1, 16))
@@ -0,0 +1,115 @@
+import gzip
+import http.client
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from data_processor import DataProcessor  # noqa: E402
+from snapshot_store import SnapshotStore  # noqa: E402
+from stats_api import APIError, StatsAPI, StatsAPIHandler, make_server  # noqa: E402
+
+
+@pytest.fixture
+def api(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    df = pd.DataFrame({'Name': ['a', 'b', 'c'] * 10, 'Country': ['Kenya', 'Nigeria', 'Kenya'] * 10,
+                       'Fund level': 'Seed', 'Type': 'For Profit'})
+    processed_df, stats = DataProcessor.process_csv(df)
+    store.save('upload', 'key', processed_df, stats, DataProcessor.build_cube(processed_df), 'v')
+    return StatsAPI(store)
+
+
+def get(api, path, **query):
+    _, render = api.route(path, {key: list(values) for key, values in query.items()})
+    return json.loads(render())
+
+
+def test_row_filters_are_cast_to_the_column_type(api):
+    latitude = get(api, '/datasets/latest/rows', Country=['Kenya'])['rows'][0]['latitude']
+    body = get(api, '/datasets/latest/rows', latitude=[str(latitude)])
+    assert body['total'] == 20 and body['where'] == {'latitude': [latitude]}
+
+
+def test_row_filters_that_do_not_parse_are_rejected(api):
+    with pytest.raises(APIError) as error:
+        get(api, '/datasets/latest/rows', latitude=['north'])
+    assert error.value.status == 400
+
+
+def test_rows_are_paged_across_partitions(api):
+    store = api.store
+    processed_df, stats = DataProcessor.process_csv(pd.DataFrame({'Name': ['d', 'e'], 'Country': ['Kenya', 'Ghana'],
+                                                                  'Fund level': 'Seed', 'Type': 'For Profit'}))
+    combined = pd.concat([store.load(store.list()[-1]['id'])[0], processed_df], ignore_index=True)
+    store.save('append', 'key2', combined, stats, DataProcessor.build_cube(combined), 'v', base_key='key', delta=processed_df)
+
+    body = get(api, '/datasets/latest/rows', Country=['Kenya'], offset=['19'], limit=['5'])
+    assert body['total'] == 21 and [row['Name'] for row in body['rows']] == ['c', 'd']
+    assert get(api, '/datasets/latest/rows', limit=['1'])['total'] == 32
+
+
+@pytest.fixture
+def server(api):
+    server = make_server(api.store, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        connection.request(method, path, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+    finally:
+        connection.close()
+
+
+def test_matching_if_none_match_gets_a_304(server):
+    response, body = request(server, 'GET', '/datasets/latest/stats')
+    etag = response.getheader('ETag')
+    assert response.status == 200 and etag and json.loads(body)['total_startups'] == 30
+
+    response, body = request(server, 'GET', '/datasets/latest/stats', {'If-None-Match': etag})
+    assert response.status == 304 and response.getheader('ETag') == etag and body == b''
+    response, _ = request(server, 'GET', '/datasets/latest/stats', {'If-None-Match': 'W/"other"'})
+    assert response.status == 200
+
+
+def test_only_large_bodies_are_gzipped_and_only_when_accepted(server):
+    response, body = request(server, 'GET', '/datasets/latest/rows?limit=30', {'Accept-Encoding': 'gzip'})
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert len(gzip.decompress(body)) >= StatsAPIHandler.GZIP_MIN_BYTES
+    assert len(json.loads(gzip.decompress(body))['rows']) == 30
+
+    for headers in ({}, {'Accept-Encoding': 'gzip;q=0'}, {'Accept-Encoding': 'br'}):
+        response, body = request(server, 'GET', '/datasets/latest/rows?limit=30', headers)
+        assert response.getheader('Content-Encoding') is None and len(json.loads(body)['rows']) == 30
+
+    response, body = request(server, 'GET', '/datasets/latest', {'Accept-Encoding': 'gzip'})
+    assert len(body) < StatsAPIHandler.GZIP_MIN_BYTES
+    assert response.getheader('Content-Encoding') is None and json.loads(body)['dataset_key'] == 'key'
+
+
+@pytest.mark.parametrize('method', ['POST', 'PUT', 'PATCH', 'DELETE'])
+def test_writes_are_rejected_with_405(server, method):
+    response, body = request(server, method, '/datasets/latest')
+    assert response.status == 405 and response.getheader('Allow') == 'GET, HEAD'
+    assert 'error' in json.loads(body)
+
+
+def test_unexpected_errors_are_answered_with_json_500(server, monkeypatch):
+    def broken(snapshot_id):
+        raise RuntimeError('disk gone')
+    monkeypatch.setattr(server.api.store, 'load_stats', broken)
+    monkeypatch.setattr(StatsAPIHandler, 'log_error', lambda *args: None)
+    response, body = request(server, 'GET', '/datasets/latest/stats')
+    assert response.status == 500 and response.getheader('Content-Type') == 'application/json'
+    assert json.loads(body) == {'error': 'Internal error'}